@@ -1,1335 +1,1530 @@
-import streamlit as st
-import sqlite3
-import os
-import uuid
-import hashlib
-from datetime import datetime, timedelta
-from pathlib import Path
-import time
-
-# ======================
-# הגדרות בסיסיות
-# ======================
-st.set_page_config(
-    page_title="Kozy Review",
-    page_icon="https://i.postimg.cc/7LMZ1dLJ/קוזי.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-# נתיבים
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-DB_PATH = "kozy_review.db"
-
-# תמונות
-LOGO_URL = "https://i.postimg.cc/7LMZ1dLJ/קוזי.png"
-MASCOT_URL = "https://i.postimg.cc/fbjR7pb0/רועי.png"
-BG_IMAGE_URL = "https://i.postimg.cc/pTGtWyzv/Whats-App-Image-2026-01-21-at-01-16-53.jpg"
-
-# ======================
-# עיצוב - Design System
-# ======================
-
-# צבעים - פלטה מינימליסטית ומקצועית
-COLORS = {
-    # Primary - כחול-סגול עמוק ומקצועי
-    "primary": "#6C5CE7",
-    "primary_light": "#A29BFE",
-    "primary_dark": "#5541D7",
-    
-    # Neutral - גווני אפור
-    "bg_dark": "#0D0D12",
-    "bg_card": "#16161D",
-    "bg_elevated": "#1E1E28",
-    "border": "#2A2A36",
-    "text_primary": "#FFFFFF",
-    "text_secondary": "#9CA3AF",
-    "text_muted": "#6B7280",
-    
-    # Accent
-    "success": "#10B981",
-    "warning": "#F59E0B",
-    "error": "#EF4444",
-    "info": "#3B82F6",
-}
-
-# קטגוריות - צבעים מותאמים
-CATEGORIES = {
-    "video": {"label": "וידאו", "icon": "🎬", "color": "#818CF8"},
-    "image": {"label": "תמונה", "icon": "🖼️", "color": "#C084FC"},
-    "effect": {"label": "אפקט", "icon": "✨", "color": "#FBBF24"},
-    "subtitles": {"label": "כתוביות", "icon": "💬", "color": "#34D399"},
-    "transition": {"label": "מעבר", "icon": "🔄", "color": "#FB923C"},
-    "music": {"label": "מוזיקה", "icon": "🎵", "color": "#F472B6"},
-    "sound": {"label": "סאונד", "icon": "🔊", "color": "#60A5FA"},
-    "ai": {"label": "AI", "icon": "🤖", "color": "#22D3EE"},
-    "bug": {"label": "באג", "icon": "🐛", "color": "#F87171"},
-}
-
-PRIORITIES = {
-    "low": {"label": "נמוכה", "color": "#10B981", "bg": "rgba(16, 185, 129, 0.15)"},
-    "medium": {"label": "בינונית", "color": "#F59E0B", "bg": "rgba(245, 158, 11, 0.15)"},
-    "high": {"label": "גבוהה", "color": "#EF4444", "bg": "rgba(239, 68, 68, 0.15)"},
-}
-
-# ======================
-# CSS מקצועי - Design System
-# ======================
-def load_css():
-    st.markdown(f"""
-<style>
-    /* ===== RESET & BASE ===== */
-    @import url('https://fonts.googleapis.com/css2?family=Heebo:wght@300;400;500;600;700;800;900&display=swap');
-    
-    * {{
-        font-family: 'Heebo', -apple-system, BlinkMacSystemFont, sans-serif !important;
-        box-sizing: border-box;
-    }}
-    
-    /* Main app container with background */
-    .stApp {{
-        direction: rtl;
-        background-color: #0a0a0f;
-        background-image: url('{BG_IMAGE_URL}');
-        background-size: cover;
-        background-position: center;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-    }}
-    
-    /* Dark overlay for 45% opacity effect */
-    .stApp > div:first-child {{
-        background: rgba(10, 10, 15, 0.55);
-        min-height: 100vh;
-    }}
-    
-    [data-testid="stAppViewContainer"] {{
-        background: rgba(10, 10, 15, 0.55);
-    }}
-    
-    [data-testid="stHeader"] {{
-        background: transparent;
-    }}
-    
-    /* Hide Streamlit branding */
-    #MainMenu, footer, header {{visibility: hidden;}}
-    .stDeployButton {{display: none;}}
-    
-    /* ===== TYPOGRAPHY ===== */
-    h1 {{
-        font-size: 2.5rem !important;
-        font-weight: 800 !important;
-        color: #FFFFFF !important;
-        letter-spacing: -0.02em !important;
-        margin-bottom: 0.5rem !important;
-        text-shadow: 0 2px 10px rgba(0,0,0,0.5);
-    }}
-    
-    h2 {{
-        font-size: 1.5rem !important;
-        font-weight: 700 !important;
-        color: #FFFFFF !important;
-        letter-spacing: -0.01em !important;
-        text-shadow: 0 2px 8px rgba(0,0,0,0.4);
-    }}
-    
-    h3 {{
-        font-size: 1.125rem !important;
-        font-weight: 600 !important;
-        color: #FFFFFF !important;
-        text-shadow: 0 1px 6px rgba(0,0,0,0.3);
-    }}
-    
-    p, span, div {{
-        color: rgba(255,255,255,0.85);
-        line-height: 1.6;
-    }}
-    
-    /* ===== LAYOUT ===== */
-    .block-container {{
-        padding: 2rem 3rem !important;
-        max-width: 1400px !important;
-    }}
-    
-    /* ===== HEADER ===== */
-    .kozy-header {{
-        display: flex;
-        align-items: center;
-        justify-content: space-between;
-        padding: 1.25rem 2rem;
-        background: rgba(15, 15, 25, 0.85);
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border: 1px solid rgba(255,255,255,0.1);
-        border-radius: 16px;
-        margin-bottom: 2rem;
-        box-shadow: 0 8px 32px rgba(0,0,0,0.3);
-    }}
-    
-    .kozy-logo {{
-        display: flex;
-        align-items: center;
-        gap: 1rem;
-    }}
-    
-    .kozy-logo img {{
-        height: 48px;
-        object-fit: contain;
-    }}
-    
-    .kozy-logo-text {{
-        font-size: 1.5rem;
-        font-weight: 800;
-        color: #FFFFFF;
-        letter-spacing: -0.02em;
-        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
-    }}
-    
-    /* ===== HERO SECTION ===== */
-    .hero {{
-        text-align: center;
-        padding: 4rem 2rem;
-        margin-bottom: 2rem;
-        background: rgba(15, 15, 25, 0.6);
-        backdrop-filter: blur(10px);
-        -webkit-backdrop-filter: blur(10px);
-        border-radius: 24px;
-        border: 1px solid rgba(255,255,255,0.08);
-    }}
-    
-    .hero-title {{
-        font-size: 3rem;
-        font-weight: 900;
-        color: #FFFFFF;
-        margin-bottom: 1rem;
-        letter-spacing: -0.03em;
-        text-shadow: 0 4px 20px rgba(0,0,0,0.5);
-    }}
-    
-    .hero-subtitle {{
-        font-size: 1.25rem;
-        color: rgba(255,255,255,0.75);
-        max-width: 500px;
-        margin: 0 auto;
-        line-height: 1.7;
-    }}
-    
-    /* ===== CARDS - Glass Morphism ===== */
-    .card {{
-        background: rgba(15, 15, 25, 0.75);
-        backdrop-filter: blur(16px);
-        -webkit-backdrop-filter: blur(16px);
-        border: 1px solid rgba(255,255,255,0.1);
-        border-radius: 16px;
-        padding: 1.5rem;
-        transition: all 0.3s ease;
-        box-shadow: 0 8px 32px rgba(0,0,0,0.2);
-    }}
-    
-    .card:hover {{
-        border-color: rgba(108, 92, 231, 0.5);
-        box-shadow: 0 12px 40px rgba(108, 92, 231, 0.15);
-        transform: translateY(-2px);
-    }}
-    
-    .card-elevated {{
-        background: rgba(20, 20, 35, 0.8);
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border: 1px solid rgba(255,255,255,0.1);
-        border-radius: 20px;
-        padding: 2rem;
-        box-shadow: 0 12px 40px rgba(0,0,0,0.25);
-    }}
-    
-    /* ===== VIDEO CONTAINER ===== */
-    .video-wrapper {{
-        background: #000;
-        border-radius: 16px;
-        overflow: hidden;
-        box-shadow: 0 25px 60px -12px rgba(0, 0, 0, 0.6);
-        margin-bottom: 1.5rem;
-        border: 1px solid rgba(255,255,255,0.1);
-    }}
-    
-    .video-wrapper video {{
-        width: 100%;
-        display: block;
-    }}
-    
-    /* ===== TIMER ===== */
-    .timer {{
-        background: rgba(20, 20, 35, 0.85);
-        backdrop-filter: blur(16px);
-        -webkit-backdrop-filter: blur(16px);
-        border: 1px solid rgba(255,255,255,0.1);
-        border-radius: 16px;
-        padding: 1.5rem;
-        text-align: center;
-        box-shadow: 0 8px 32px rgba(0,0,0,0.2);
-    }}
-    
-    .timer-label {{
-        font-size: 0.75rem;
-        font-weight: 600;
-        color: rgba(255,255,255,0.5);
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-        margin-bottom: 0.5rem;
-    }}
-    
-    .timer-value {{
-        font-size: 1.75rem;
-        font-weight: 800;
-        color: {COLORS['warning']};
-        text-shadow: 0 2px 10px rgba(245, 158, 11, 0.3);
-    }}
-    
-    .timer-urgent .timer-value {{
-        color: {COLORS['error']};
-        animation: pulse 1.5s ease-in-out infinite;
-        text-shadow: 0 2px 10px rgba(239, 68, 68, 0.4);
-    }}
-    
-    @keyframes pulse {{
-        0%, 100% {{ opacity: 1; }}
-        50% {{ opacity: 0.6; }}
-    }}
-    
-    /* ===== STATS ===== */
-    .stat-grid {{
-        display: grid;
-        grid-template-columns: repeat(3, 1fr);
-        gap: 1rem;
-        margin-bottom: 1.5rem;
-    }}
-    
-    .stat-item {{
-        background: rgba(20, 20, 35, 0.8);
-        backdrop-filter: blur(12px);
-        -webkit-backdrop-filter: blur(12px);
-        border: 1px solid rgba(255,255,255,0.1);
-        border-radius: 12px;
-        padding: 1rem;
-        text-align: center;
-        box-shadow: 0 4px 16px rgba(0,0,0,0.15);
-    }}
-    
-    .stat-value {{
-        font-size: 2rem;
-        font-weight: 800;
-        color: #FFFFFF;
-        line-height: 1;
-        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
-    }}
-    
-    .stat-label {{
-        font-size: 0.75rem;
-        font-weight: 500;
-        color: rgba(255,255,255,0.5);
-        margin-top: 0.25rem;
-    }}
-    
-    /* ===== LINK BOX ===== */
-    .link-box {{
-        background: rgba(108, 92, 231, 0.15);
-        backdrop-filter: blur(12px);
-        -webkit-backdrop-filter: blur(12px);
-        border: 1px dashed rgba(108, 92, 231, 0.5);
-        border-radius: 12px;
-        padding: 1.25rem;
-        text-align: center;
-    }}
-    
-    .link-box-label {{
-        font-size: 0.75rem;
-        font-weight: 600;
-        color: rgba(255,255,255,0.6);
-        margin-bottom: 0.75rem;
-    }}
-    
-    .link-box-url {{
-        background: rgba(0,0,0,0.4);
-        color: {COLORS['primary_light']};
-        padding: 0.75rem 1rem;
-        border-radius: 8px;
-        font-size: 0.875rem;
-        font-family: 'Monaco', monospace !important;
-        word-break: break-all;
-        display: block;
-    }}
-    
-    /* ===== COMMENTS ===== */
-    .comment {{
-        background: rgba(20, 20, 35, 0.75);
-        backdrop-filter: blur(12px);
-        -webkit-backdrop-filter: blur(12px);
-        border: 1px solid rgba(255,255,255,0.08);
-        border-radius: 12px;
-        padding: 1.25rem;
-        margin-bottom: 1rem;
-        border-right: 3px solid {COLORS['primary']};
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 20px rgba(0,0,0,0.15);
-    }}
-    
-    .comment:hover {{
-        background: rgba(25, 25, 45, 0.85);
-        border-color: rgba(255,255,255,0.15);
-        transform: translateX(-4px);
-    }}
-    
-    .comment.resolved {{
-        opacity: 0.5;
-        border-right-color: rgba(255,255,255,0.2);
-    }}
-    
-    .comment-header {{
-        display: flex;
-        align-items: center;
-        gap: 0.75rem;
-        flex-wrap: wrap;
-        margin-bottom: 0.75rem;
-    }}
-    
-    .comment-time {{
-        background: linear-gradient(135deg, {COLORS['primary']} 0%, {COLORS['primary_dark']} 100%);
-        color: white;
-        padding: 0.25rem 0.75rem;
-        border-radius: 6px;
-        font-size: 0.8125rem;
-        font-weight: 600;
-        font-family: 'Monaco', monospace !important;
-        box-shadow: 0 2px 8px rgba(108, 92, 231, 0.3);
-    }}
-    
-    .comment-tag {{
-        padding: 0.25rem 0.625rem;
-        border-radius: 6px;
-        font-size: 0.75rem;
-        font-weight: 600;
-        backdrop-filter: blur(8px);
-    }}
-    
-    .comment-text {{
-        color: #FFFFFF;
-        font-size: 0.9375rem;
-        line-height: 1.6;
-        margin-bottom: 0.75rem;
-    }}
-    
-    .comment-meta {{
-        font-size: 0.75rem;
-        color: rgba(255,255,255,0.5);
-    }}
-    
-    /* ===== WELCOME BOX (Client) ===== */
-    .welcome {{
-        background: rgba(108, 92, 231, 0.12);
-        backdrop-filter: blur(16px);
-        -webkit-backdrop-filter: blur(16px);
-        border: 1px solid rgba(108, 92, 231, 0.25);
-        border-radius: 16px;
-        padding: 1.5rem 2rem;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 8px 32px rgba(108, 92, 231, 0.1);
-    }}
-    
-    .welcome-text {{
-        font-size: 1.125rem;
-        font-weight: 600;
-        color: #FFFFFF;
-        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
-    }}
-    
-    .welcome-subtext {{
-        font-size: 0.875rem;
-        color: rgba(255,255,255,0.7);
-        margin-top: 0.5rem;
-    }}
-    
-    /* ===== FORM INPUTS ===== */
-    .stTextInput > div > div > input,
-    .stTextArea > div > div > textarea {{
-        background: rgba(20, 20, 35, 0.8) !important;
-        backdrop-filter: blur(12px) !important;
-        border: 1px solid rgba(255,255,255,0.12) !important;
-        border-radius: 10px !important;
-        color: #FFFFFF !important;
-        font-size: 0.9375rem !important;
-        padding: 0.75rem 1rem !important;
-    }}
-    
-    .stTextInput > div > div > input:focus,
-    .stTextArea > div > div > textarea:focus {{
-        border-color: {COLORS['primary']} !important;
-        box-shadow: 0 0 0 3px rgba(108, 92, 231, 0.2) !important;
-    }}
-    
-    .stTextInput > div > div > input::placeholder,
-    .stTextArea > div > div > textarea::placeholder {{
-        color: rgba(255,255,255,0.4) !important;
-    }}
-    
-    .stSelectbox > div > div {{
-        background: rgba(20, 20, 35, 0.8) !important;
-        border: 1px solid rgba(255,255,255,0.12) !important;
-        border-radius: 10px !important;
-    }}
-    
-    .stSelectbox > div > div > div {{
-        color: #FFFFFF !important;
-    }}
-    
-    .stNumberInput > div > div > input {{
-        background: rgba(20, 20, 35, 0.8) !important;
-        border: 1px solid rgba(255,255,255,0.12) !important;
-        border-radius: 10px !important;
-        color: #FFFFFF !important;
-    }}
-    
-    /* Labels */
-    .stTextInput > label,
-    .stTextArea > label,
-    .stSelectbox > label,
-    .stNumberInput > label {{
-        color: rgba(255,255,255,0.75) !important;
-        font-weight: 500 !important;
-        font-size: 0.875rem !important;
-        margin-bottom: 0.5rem !important;
-    }}
-    
-    /* ===== BUTTONS ===== */
-    .stButton > button {{
-        background: linear-gradient(135deg, {COLORS['primary']} 0%, {COLORS['primary_dark']} 100%) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 10px !important;
-        padding: 0.75rem 1.5rem !important;
-        font-weight: 600 !important;
-        font-size: 0.9375rem !important;
-        transition: all 0.3s ease !important;
-        box-shadow: 0 4px 20px rgba(108, 92, 231, 0.4) !important;
-    }}
-    
-    .stButton > button:hover {{
-        transform: translateY(-3px) !important;
-        box-shadow: 0 8px 30px rgba(108, 92, 231, 0.5) !important;
-    }}
-    
-    .stButton > button:active {{
-        transform: translateY(0) !important;
-    }}
-    
-    /* Secondary buttons */
-    .stButton > button[kind="secondary"] {{
-        background: rgba(20, 20, 35, 0.7) !important;
-        backdrop-filter: blur(12px) !important;
-        border: 1px solid rgba(255,255,255,0.15) !important;
-        box-shadow: 0 4px 16px rgba(0,0,0,0.2) !important;
-    }}
-    
-    .stButton > button[kind="secondary"]:hover {{
-        background: rgba(30, 30, 50, 0.8) !important;
-        border-color: {COLORS['primary']} !important;
-    }}
-    
-    /* ===== TABS ===== */
-    .stTabs [data-baseweb="tab-list"] {{
-        background: rgba(15, 15, 25, 0.8);
-        backdrop-filter: blur(16px);
-        -webkit-backdrop-filter: blur(16px);
-        border-radius: 12px;
-        padding: 0.375rem;
-        gap: 0.25rem;
-        border: 1px solid rgba(255,255,255,0.1);
-    }}
-    
-    .stTabs [data-baseweb="tab"] {{
-        background: transparent;
-        border-radius: 8px;
-        color: rgba(255,255,255,0.6);
-        font-weight: 500;
-        padding: 0.625rem 1.25rem;
-    }}
-    
-    .stTabs [aria-selected="true"] {{
-        background: linear-gradient(135deg, {COLORS['primary']} 0%, {COLORS['primary_dark']} 100%) !important;
-        color: white !important;
-        box-shadow: 0 4px 12px rgba(108, 92, 231, 0.3);
-    }}
-    
-    /* ===== DIVIDER ===== */
-    hr {{
-        border: none !important;
-        height: 1px !important;
-        background: rgba(255,255,255,0.1) !important;
-        margin: 2rem 0 !important;
-    }}
-    
-    /* ===== FILE UPLOADER ===== */
-    .stFileUploader {{
-        background: rgba(15, 15, 25, 0.7);
-        backdrop-filter: blur(16px);
-        -webkit-backdrop-filter: blur(16px);
-        border: 2px dashed rgba(255,255,255,0.15);
-        border-radius: 16px;
-        padding: 2rem;
-        transition: all 0.3s ease;
-    }}
-    
-    .stFileUploader:hover {{
-        border-color: {COLORS['primary']};
-        background: rgba(108, 92, 231, 0.1);
-    }}
-    
-    .stFileUploader > div {{
-        color: rgba(255,255,255,0.7) !important;
-    }}
-    
-    /* ===== ALERTS ===== */
-    .stSuccess {{
-        background: rgba(16, 185, 129, 0.15) !important;
-        backdrop-filter: blur(12px) !important;
-        border: 1px solid rgba(16, 185, 129, 0.3) !important;
-        border-radius: 10px !important;
-    }}
-    
-    .stError {{
-        background: rgba(239, 68, 68, 0.15) !important;
-        backdrop-filter: blur(12px) !important;
-        border: 1px solid rgba(239, 68, 68, 0.3) !important;
-        border-radius: 10px !important;
-    }}
-    
-    .stWarning {{
-        background: rgba(245, 158, 11, 0.15) !important;
-        backdrop-filter: blur(12px) !important;
-        border: 1px solid rgba(245, 158, 11, 0.3) !important;
-        border-radius: 10px !important;
-    }}
-    
-    .stInfo {{
-        background: rgba(59, 130, 246, 0.15) !important;
-        backdrop-filter: blur(12px) !important;
-        border: 1px solid rgba(59, 130, 246, 0.3) !important;
-        border-radius: 10px !important;
-    }}
-    
-    /* ===== EXPANDER ===== */
-    .streamlit-expanderHeader {{
-        background: rgba(20, 20, 35, 0.8) !important;
-        backdrop-filter: blur(12px) !important;
-        border-radius: 10px !important;
-        color: #FFFFFF !important;
-        font-weight: 500 !important;
-    }}
-    
-    /* ===== MASCOT ===== */
-    .mascot {{
-        position: fixed;
-        bottom: 24px;
-        left: 24px;
-        z-index: 9999;
-        transition: transform 0.3s ease;
-    }}
-    
-    .mascot:hover {{
-        transform: scale(1.1) translateY(-6px);
-    }}
-    
-    .mascot img {{
-        height: 100px;
-        filter: drop-shadow(0 12px 32px rgba(0, 0, 0, 0.5));
-        border-radius: 50%;
-    }}
-    
-    /* ===== METRICS ===== */
-    [data-testid="stMetricValue"] {{
-        color: #FFFFFF !important;
-        font-size: 1.75rem !important;
-        font-weight: 800 !important;
-        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
-    }}
-    
-    [data-testid="stMetricLabel"] {{
-        color: rgba(255,255,255,0.5) !important;
-        font-size: 0.75rem !important;
-        font-weight: 600 !important;
-        text-transform: uppercase !important;
-        letter-spacing: 0.05em !important;
-    }}
-    
-    /* ===== COMPLETED STATE ===== */
-    .completed-box {{
-        background: rgba(16, 185, 129, 0.15);
-        backdrop-filter: blur(16px);
-        -webkit-backdrop-filter: blur(16px);
-        border: 1px solid rgba(16, 185, 129, 0.3);
-        border-radius: 16px;
-        padding: 2rem;
-        text-align: center;
-        box-shadow: 0 8px 32px rgba(16, 185, 129, 0.15);
-    }}
-    
-    .completed-icon {{
-        font-size: 3rem;
-        margin-bottom: 1rem;
-    }}
-    
-    .completed-title {{
-        font-size: 1.25rem;
-        font-weight: 700;
-        color: {COLORS['success']};
-        margin-bottom: 0.5rem;
-        text-shadow: 0 2px 8px rgba(16, 185, 129, 0.3);
-    }}
-    
-    .completed-text {{
-        color: rgba(255,255,255,0.7);
-        font-size: 0.9375rem;
-    }}
-    
-</style>
-
-<!-- Mascot -->
-<div class="mascot">
-    <img src="{MASCOT_URL}" alt="Kozy">
-</div>
-""", unsafe_allow_html=True)
-
-
-# ======================
-# Database Functions
-# ======================
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            description TEXT,
-            video_filename TEXT NOT NULL,
-            video_original_name TEXT,
-            editor_token TEXT UNIQUE NOT NULL,
-            client_token TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            view_count INTEGER DEFAULT 0
-        )
-    ''')
-    
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            id TEXT PRIMARY KEY,
-            project_id TEXT NOT NULL,
-            timestamp_seconds REAL NOT NULL,
-            text TEXT NOT NULL,
-            author_name TEXT NOT NULL,
-            author_type TEXT NOT NULL,
-            category TEXT DEFAULT 'video',
-            priority TEXT DEFAULT 'medium',
-            resolved INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (project_id) REFERENCES projects (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-
-def generate_token(length=16):
-    return hashlib.sha256(f"{uuid.uuid4()}{time.time()}".encode()).hexdigest()[:length]
-
-
-def create_project(title, description, video_file):
-    project_id = str(uuid.uuid4())
-    editor_token = generate_token(24)
-    client_token = generate_token(16)
-    
-    video_filename = f"{project_id}_{video_file.name}"
-    video_path = UPLOAD_DIR / video_filename
-    
-    with open(video_path, "wb") as f:
-        f.write(video_file.getbuffer())
-    
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    expires_at = datetime.now() + timedelta(hours=72)
-    
-    c.execute('''
-        INSERT INTO projects (id, title, description, video_filename, video_original_name, 
-                            editor_token, client_token, expires_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (project_id, title, description, video_filename, video_file.name, 
-          editor_token, client_token, expires_at))
-    
-    conn.commit()
-    conn.close()
-    
-    return project_id, editor_token, client_token
-
-
-def get_project_by_editor_token(token):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute('SELECT * FROM projects WHERE editor_token = ? AND is_active = 1', (token,))
-    row = c.fetchone()
-    conn.close()
-    return dict(row) if row else None
-
-
-def get_project_by_client_token(token):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute('SELECT * FROM projects WHERE client_token = ? AND is_active = 1', (token,))
-    row = c.fetchone()
-    if row:
-        c.execute('UPDATE projects SET view_count = view_count + 1 WHERE client_token = ?', (token,))
-        conn.commit()
-    conn.close()
-    return dict(row) if row else None
-
-
-def delete_project(project_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT video_filename FROM projects WHERE id = ?', (project_id,))
-    row = c.fetchone()
-    if row:
-        video_path = UPLOAD_DIR / row[0]
-        if video_path.exists():
-            video_path.unlink()
-    c.execute('UPDATE projects SET is_active = 0 WHERE id = ?', (project_id,))
-    conn.commit()
-    conn.close()
-
-
-def add_comment(project_id, timestamp_seconds, text, author_name, author_type, category, priority):
-    comment_id = str(uuid.uuid4())
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO comments (id, project_id, timestamp_seconds, text, author_name, 
-                            author_type, category, priority)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (comment_id, project_id, timestamp_seconds, text, author_name, author_type, category, priority))
-    conn.commit()
-    conn.close()
-    return comment_id
-
-
-def get_comments(project_id):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute('SELECT * FROM comments WHERE project_id = ? ORDER BY timestamp_seconds ASC', (project_id,))
-    rows = c.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
-
-
-def toggle_comment_resolved(comment_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('UPDATE comments SET resolved = NOT resolved WHERE id = ?', (comment_id,))
-    conn.commit()
-    conn.close()
-
-
-def mark_review_complete(project_id, client_name):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    comment_id = str(uuid.uuid4())
-    c.execute('''
-        INSERT INTO comments (id, project_id, timestamp_seconds, text, author_name, 
-                            author_type, category, priority)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (comment_id, project_id, 0, f"✅ {client_name} סיים/ה לתת משוב - אפשר להמשיך לעבוד!", 
-          client_name, "client", "video", "high"))
-    conn.commit()
-    conn.close()
-
-
-def delete_comment(comment_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('DELETE FROM comments WHERE id = ?', (comment_id,))
-    conn.commit()
-    conn.close()
-
-
-def cleanup_expired_projects():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT id, video_filename FROM projects WHERE expires_at < ? AND is_active = 1', (datetime.now(),))
-    expired = c.fetchall()
-    for project_id, video_filename in expired:
-        video_path = UPLOAD_DIR / video_filename
-        if video_path.exists():
-            video_path.unlink()
-        c.execute('UPDATE projects SET is_active = 0 WHERE id = ?', (project_id,))
-    conn.commit()
-    conn.close()
-    return len(expired)
-
-
-# ======================
-# Helper Functions
-# ======================
-def format_time(seconds):
-    mins = int(seconds // 60)
-    secs = int(seconds % 60)
-    return f"{mins:02d}:{secs:02d}"
-
-
-def get_time_remaining(expires_at):
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    remaining = expires_at - datetime.now()
-    if remaining.total_seconds() <= 0:
-        return None, "פג תוקף"
-    hours = int(remaining.total_seconds() // 3600)
-    minutes = int((remaining.total_seconds() % 3600) // 60)
-    return remaining.total_seconds(), f"{hours} שעות ו-{minutes} דקות"
-
-
-def get_base_url():
-    space_host = os.environ.get("SPACE_HOST")
-    if space_host:
-        return f"https://{space_host}"
-    if "streamlit.app" in os.environ.get("HOSTNAME", ""):
-        return "https://roy-kozy.streamlit.app"
-    try:
-        from streamlit.web.server.websocket_headers import _get_websocket_headers
-        headers = _get_websocket_headers()
-        if headers and "Host" in headers:
-            host = headers["Host"]
-            if "localhost" not in host:
-                return f"https://{host}"
-    except:
-        pass
-    return "https://roy-kozy.streamlit.app"
-
-
-# ======================
-# UI Components
-# ======================
-def render_header(project_title=None):
-    title_html = f'<div style="color: {COLORS["text_secondary"]}; font-size: 0.9375rem;">{project_title}</div>' if project_title else ''
-    st.markdown(f"""
-    <div class="kozy-header">
-        <div class="kozy-logo">
-            <img src="{LOGO_URL}" alt="Kozy">
-            <span class="kozy-logo-text">Kozy Review</span>
-        </div>
-        {title_html}
-    </div>
-    """, unsafe_allow_html=True)
-
-
-def render_timer(expires_at):
-    remaining_seconds, remaining_text = get_time_remaining(expires_at)
-    if remaining_seconds is None:
-        st.error("⏰ פג תוקף הפרויקט")
-        return False
-    
-    is_urgent = remaining_seconds < 6 * 3600
-    urgent_class = "timer-urgent" if is_urgent else ""
-    
-    st.markdown(f"""
-    <div class="timer {urgent_class}">
-        <div class="timer-label">זמן נותר</div>
-        <div class="timer-value">{remaining_text}</div>
-    </div>
-    """, unsafe_allow_html=True)
-    return True
-
-
-def render_stats(comments):
-    total = len(comments)
-    resolved = len([c for c in comments if c['resolved']])
-    high = len([c for c in comments if c['priority'] == 'high' and not c['resolved']])
-    
-    st.markdown(f"""
-    <div class="stat-grid">
-        <div class="stat-item">
-            <div class="stat-value">{total}</div>
-            <div class="stat-label">הערות</div>
-        </div>
-        <div class="stat-item">
-            <div class="stat-value" style="color: {COLORS['success']};">{resolved}</div>
-            <div class="stat-label">טופלו</div>
-        </div>
-        <div class="stat-item">
-            <div class="stat-value" style="color: {COLORS['error']};">{high}</div>
-            <div class="stat-label">דחופות</div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-
-def render_comment(comment, is_editor=False):
-    cat = CATEGORIES.get(comment['category'], CATEGORIES['video'])
-    pri = PRIORITIES.get(comment['priority'], PRIORITIES['medium'])
-    resolved_class = "resolved" if comment['resolved'] else ""
-    resolved_mark = "✓ " if comment['resolved'] else ""
-    
-    st.markdown(f"""
-    <div class="comment {resolved_class}" style="border-right-color: {cat['color']};">
-        <div class="comment-header">
-            <span class="comment-time">⏱ {format_time(comment['timestamp_seconds'])}</span>
-            <span class="comment-tag" style="background: {cat['color']}22; color: {cat['color']};">{cat['icon']} {cat['label']}</span>
-            <span class="comment-tag" style="background: {pri['bg']}; color: {pri['color']};">{pri['label']}</span>
-        </div>
-        <div class="comment-text">{resolved_mark}{comment['text']}</div>
-        <div class="comment-meta">✍️ {comment['author_name']} • {'עורך' if comment['author_type'] == 'editor' else 'לקוח'}</div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    if is_editor:
-        col1, col2 = st.columns(2)
-        with col1:
-            btn_text = "↩️ בטל" if comment['resolved'] else "✓ טופל"
-            if st.button(btn_text, key=f"r_{comment['id']}", use_container_width=True):
-                toggle_comment_resolved(comment['id'])
-                st.rerun()
-        with col2:
-            if st.button("🗑️ מחק", key=f"d_{comment['id']}", use_container_width=True):
-                delete_comment(comment['id'])
-                st.rerun()
-
-
-# ======================
-# Pages
-# ======================
-def page_home():
-    render_header()
-    
-    # Hero
-    st.markdown(f"""
-    <div class="hero">
-        <div class="hero-title">סקירת וידאו פשוטה ומקצועית</div>
-        <div class="hero-subtitle">העלה סרטון, שתף עם הלקוח, קבל משוב מדויק עם חותמות זמן. פשוט ככה.</div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    tab1, tab2 = st.tabs(["📤 העלאת פרויקט", "🔗 יש לי לינק"])
-    
-    with tab1:
-        st.markdown("### פרטי הפרויקט")
-        
-        title = st.text_input("שם הפרויקט", placeholder="לדוגמה: פרסומת חורף 2025")
-        description = st.text_area("תיאור (אופציונלי)", placeholder="הערות לגבי הסרטון...", height=80)
-        
-        st.markdown("### קובץ וידאו")
-        video_file = st.file_uploader(
-            "גרור קובץ או לחץ לבחירה",
-            type=["mp4", "mov", "webm", "avi", "mkv"],
-            help="MP4, MOV, WebM, AVI, MKV • עד 200MB"
-        )
-        
-        if video_file:
-            st.video(video_file)
-            size_mb = video_file.size / (1024*1024)
-            st.success(f"✓ {video_file.name} ({size_mb:.1f} MB)")
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        if st.button("🚀 צור פרויקט", disabled=not (title and video_file), use_container_width=True):
-            with st.spinner("מעלה..."):
-                project_id, editor_token, client_token = create_project(title, description, video_file)
-            
-            st.success("✓ הפרויקט נוצר!")
-            st.balloons()
-            
-            base_url = get_base_url()
-            client_link = f"{base_url}/?view={client_token}"
-            editor_link = f"{base_url}/?edit={editor_token}"
-            
-            st.markdown("### 🔗 הלינקים שלך")
-            
-            st.markdown(f"""
-            <div class="link-box">
-                <div class="link-box-label">לינק ללקוח (שתף אותו!)</div>
-                <code class="link-box-url">{client_link}</code>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            st.code(client_link, language=None)
-            
-            with st.expander("🔐 לינק עריכה (שמור!)"):
-                st.code(editor_link, language=None)
-            
-            st.warning("⏰ הסרטון יימחק אוטומטית בעוד 72 שעות")
-    
-    with tab2:
-        st.markdown("### הדבק את הלינק שקיבלת")
-        
-        link = st.text_input("לינק", placeholder="https://...", label_visibility="collapsed")
-        
-        if st.button("כניסה", use_container_width=True):
-            if "view=" in link:
-                token = link.split("view=")[-1].split("&")[0]
-                st.query_params["view"] = token
-                st.rerun()
-            elif "edit=" in link:
-                token = link.split("edit=")[-1].split("&")[0]
-                st.query_params["edit"] = token
-                st.rerun()
-            else:
-                st.error("לינק לא תקין")
-
-
-def page_editor(project):
-    render_header(project['title'])
-    
-    col_main, col_side = st.columns([2.5, 1])
-    
-    with col_side:
-        # Timer
-        if not render_timer(project['expires_at']):
-            return
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        # Link
-        base_url = get_base_url()
-        client_link = f"{base_url}/?view={project['client_token']}"
-        
-        st.markdown(f"""
-        <div class="link-box">
-            <div class="link-box-label">🔗 לינק ללקוח</div>
-            <code class="link-box-url" style="font-size: 0.75rem;">{client_link}</code>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        st.code(client_link, language=None)
-        
-        st.markdown(f"<p style='text-align: center; color: {COLORS['text_muted']}; font-size: 0.75rem;'>👁 נצפה {project['view_count']} פעמים</p>", unsafe_allow_html=True)
-        
-        st.markdown("---")
-        
-        # Stats
-        comments = get_comments(project['id'])
-        render_stats(comments)
-        
-        st.markdown("---")
-        
-        # Delete
-        with st.expander("⚠️ מחיקה"):
-            if st.button("🗑️ מחק פרויקט", use_container_width=True):
-                delete_project(project['id'])
-                st.query_params.clear()
-                st.rerun()
-    
-    with col_main:
-        # Video
-        video_path = UPLOAD_DIR / project['video_filename']
-        if video_path.exists():
-            st.markdown('<div class="video-wrapper">', unsafe_allow_html=True)
-            st.video(str(video_path))
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.error("קובץ לא נמצא")
-            return
-        
-        # Add comment
-        st.markdown("### 💬 הערה חדשה")
-        
-        col_min, col_sec, col_cat, col_pri = st.columns([1, 1, 2, 2])
-        
-        with col_min:
-            minutes = st.number_input("דקות", min_value=0, value=0, key="ed_min")
-        with col_sec:
-            seconds = st.number_input("שניות", min_value=0, max_value=59, value=0, key="ed_sec")
-        with col_cat:
-            category = st.selectbox(
-                "קטגוריה",
-                options=list(CATEGORIES.keys()),
-                format_func=lambda x: f"{CATEGORIES[x]['icon']} {CATEGORIES[x]['label']}"
-            )
-        with col_pri:
-            priority = st.selectbox(
-                "עדיפות",
-                options=list(PRIORITIES.keys()),
-                format_func=lambda x: PRIORITIES[x]['label']
-            )
-        
-        comment_text = st.text_area("הערה", placeholder="כתוב את ההערה...", height=80)
-        
-        if st.button("➕ הוסף", disabled=not comment_text, use_container_width=True):
-            add_comment(project['id'], minutes * 60 + seconds, comment_text, "עורך", "editor", category, priority)
-            st.rerun()
-        
-        # Comments list
-        st.markdown("---")
-        st.markdown("### 📋 הערות")
-        
-        comments = get_comments(project['id'])
-        
-        filter_opt = st.selectbox(
-            "סינון",
-            ["הכל", "ממתינות", "טופלו"],
-            label_visibility="collapsed"
-        )
-        
-        if not comments:
-            st.info("אין הערות עדיין")
-        else:
-            for c in comments:
-                if filter_opt == "ממתינות" and c['resolved']:
-                    continue
-                if filter_opt == "טופלו" and not c['resolved']:
-                    continue
-                render_comment(c, is_editor=True)
-
-
-def page_client(project):
-    render_header()
-    
-    # Welcome
-    st.markdown(f"""
-    <div class="welcome">
-        <div class="welcome-text">👋 שלום! כאן תוכל/י לצפות בסרטון ולשלוח משוב</div>
-        <div class="welcome-subtext">עצור/י את הסרטון בנקודה הרצויה ורשום/י את ההערה</div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    col_main, col_side = st.columns([3, 1])
-    
-    with col_side:
-        render_timer(project['expires_at'])
-    
-    with col_main:
-        # Video
-        video_path = UPLOAD_DIR / project['video_filename']
-        if video_path.exists():
-            st.markdown('<div class="video-wrapper">', unsafe_allow_html=True)
-            st.video(str(video_path))
-            st.markdown('</div>', unsafe_allow_html=True)
-        else:
-            st.error("הסרטון לא זמין")
-            return
-    
-    # Add feedback
-    st.markdown("---")
-    st.markdown("### 💬 הוסף משוב")
-    
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        author_name = st.text_input("השם שלך", placeholder="איך קוראים לך?")
-    
-    with col2:
-        st.markdown("**נקודת זמן**")
-        c1, c2 = st.columns(2)
-        with c1:
-            minutes = st.number_input("דקות", min_value=0, value=0, key="cl_min")
-        with c2:
-            seconds = st.number_input("שניות", min_value=0, max_value=59, value=0, key="cl_sec")
-    
-    col_cat, col_pri = st.columns(2)
-    with col_cat:
-        category = st.selectbox(
-            "קטגוריה",
-            options=list(CATEGORIES.keys()),
-            format_func=lambda x: f"{CATEGORIES[x]['icon']} {CATEGORIES[x]['label']}",
-            key="cl_cat"
-        )
-    with col_pri:
-        priority = st.selectbox(
-            "עדיפות",
-            options=list(PRIORITIES.keys()),
-            format_func=lambda x: PRIORITIES[x]['label'],
-            key="cl_pri"
-        )
-    
-    comment_text = st.text_area("המשוב שלך", placeholder="מה לשנות או לתקן?", height=100)
-    
-    if st.button("📤 שלח משוב", disabled=not (author_name and comment_text), use_container_width=True):
-        add_comment(project['id'], minutes * 60 + seconds, comment_text, author_name, "client", category, priority)
-        st.success("✓ המשוב נשלח!")
-        st.balloons()
-        st.rerun()
-    
-    # Previous comments
-    st.markdown("---")
-    st.markdown("### 📋 משובים שנשלחו")
-    
-    comments = get_comments(project['id'])
-    
-    if not comments:
-        st.info("עדיין אין משובים. היה/יי הראשון/ה! 🎉")
-    else:
-        for c in comments:
-            render_comment(c, is_editor=False)
-    
-    # Complete button
-    st.markdown("---")
-    st.markdown("### ✅ סיימת?")
-    
-    if 'review_done' not in st.session_state:
-        st.session_state.review_done = False
-    
-    if not st.session_state.review_done:
-        confirm_name = st.text_input("השם שלך לאישור", placeholder="הכנס שם...", key="confirm")
-        
-        if st.button("🎉 סיימתי - אפשר להמשיך לעבוד!", disabled=not confirm_name, use_container_width=True):
-            mark_review_complete(project['id'], confirm_name)
-            st.session_state.review_done = True
-            st.balloons()
-            st.rerun()
-    else:
-        st.markdown(f"""
-        <div class="completed-box">
-            <div class="completed-icon">✅</div>
-            <div class="completed-title">תודה רבה!</div>
-            <div class="completed-text">העורך קיבל את המשוב ויתחיל לעבוד על התיקונים.</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-
-# ======================
-# Main
-# ======================
-def main():
-    init_db()
-    cleanup_expired_projects()
-    load_css()
-    
-    params = st.query_params
-    
-    if "edit" in params:
-        project = get_project_by_editor_token(params["edit"])
-        if project:
-            page_editor(project)
-        else:
-            st.error("פרויקט לא נמצא או שפג תוקפו")
-            if st.button("🏠 חזרה"):
-                st.query_params.clear()
-                st.rerun()
-    
-    elif "view" in params:
-        project = get_project_by_client_token(params["view"])
-        if project:
-            page_client(project)
-        else:
-            st.error("הסרטון לא נמצא או שפג תוקפו")
-            st.info("ייתכן שעברו 72 שעות והסרטון נמחק אוטומטית.")
-    
-    else:
-        page_home()
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import streamlit as st
+import streamlit.components.v1 as components
+import os
+import io
+import csv
+import json
+import uuid
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+import time
+import secrets
+import atexit
+import logging
+
+import db
+import exchange
+from cache import TokenCache, VersionedCache
+from counters import ViewCounter
+from feed import ChangeFeed
+from jobs import JobQueue
+from media_server import MediaServer
+from metadata import InvalidTimestamp, VideoMetadata, snap_to_frame
+from metrics import MetricsRegistry, stats_gauges
+from profiler import RerunProfiler
+from scheduler import PeriodicTask
+from resumable import InvalidChunk, ResumableUploads, UploadNotFound, parse_metadata
+from storage import BlobStore, UploadTooLarge, backend_from_env
+from transcode import Transcoder
+from previews import PreviewGenerator, probe_duration
+import templates
+from templates import CATEGORIES, COLORS, PRIORITIES, format_time
+
+logger = logging.getLogger("kozy")
+
+# ======================
+# הגדרות בסיסיות
+# ======================
+st.set_page_config(
+    page_title="Kozy Review",
+    page_icon="https://i.postimg.cc/7LMZ1dLJ/קוזי.png",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# נתיבים
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+DB_PATH = "kozy_review.db"
+MAX_UPLOAD_MB = int(os.environ.get("KOZY_MAX_UPLOAD_MB", 200))
+
+# שרת וידאו עם תמיכה ב-Range - פעיל רק כשמוגדרת כתובת ציבורית
+MEDIA_URL = os.environ.get("KOZY_MEDIA_URL")
+MEDIA_HOST = os.environ.get("KOZY_MEDIA_HOST", "0.0.0.0")
+MEDIA_PORT = int(os.environ.get("KOZY_MEDIA_PORT", 8502))
+
+# כמה הערות מוצגות בכל עמוד
+COMMENTS_PAGE_SIZE = int(os.environ.get("KOZY_COMMENTS_PAGE_SIZE", 20))
+
+# מטמון טוקנים של לינקים - כולל דחייה של טוקנים לא מוכרים בלי לגשת ל-SQLite
+TOKEN_CACHE_TTL_SECONDS = int(os.environ.get("KOZY_TOKEN_CACHE_TTL_SECONDS", 300))
+TOKEN_NEGATIVE_TTL_SECONDS = int(os.environ.get("KOZY_TOKEN_NEGATIVE_TTL_SECONDS", 60))
+TOKEN_REFRESH_SECONDS = int(os.environ.get("KOZY_TOKEN_REFRESH_SECONDS", 30))
+
+# ספירת צפיות - נאספת בזיכרון ונכתבת במרוכז
+VIEW_FLUSH_INTERVAL_SECONDS = int(os.environ.get("KOZY_VIEW_FLUSH_INTERVAL_SECONDS", 15))
+COUNT_UNIQUE_VIEWERS = os.environ.get("KOZY_COUNT_UNIQUE_VIEWERS", "1") == "1"
+
+# עבודות רקע אחרי העלאה (קידוד proxy, תצוגות מקדימות) - תור ב-SQLite עם workers
+JOB_WORKERS = int(os.environ.get("KOZY_JOB_WORKERS", os.environ.get("KOZY_TRANSCODE_WORKERS", 2)))
+JOB_MAX_ATTEMPTS = int(os.environ.get("KOZY_JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY_SECONDS = int(os.environ.get("KOZY_JOB_RETRY_DELAY_SECONDS", 30))
+JOB_RETENTION_HOURS = int(os.environ.get("KOZY_JOB_RETENTION_HOURS", 24))
+JOB_POLL_SECONDS = float(os.environ.get("KOZY_JOB_POLL_SECONDS", 2))
+# תוקף הלינק החתום שממנו ffmpeg קורא כשהאחסון מרוחק (KOZY_STORAGE=s3)
+SOURCE_URL_TTL_SECONDS = int(os.environ.get("KOZY_SOURCE_URL_TTL_SECONDS", 6 * 3600))
+
+# עדכונים חיים בעמוד העורך - 0 מבטל
+LIVE_POLL_SECONDS = float(os.environ.get("KOZY_LIVE_POLL_SECONDS", 3)) or None
+CHANGE_RETENTION_HOURS = int(os.environ.get("KOZY_CHANGE_RETENTION_HOURS", 24))
+
+# ייבוא וייצוא הערות
+EXPORT_BATCH_SIZE = int(os.environ.get("KOZY_EXPORT_BATCH_SIZE", 500))
+MAX_IMPORT_ROWS = int(os.environ.get("KOZY_MAX_IMPORT_ROWS", 50000))
+EDL_FPS = int(os.environ.get("KOZY_EDL_FPS", exchange.DEFAULT_FPS))
+
+# תצוגה מקדימה של פריים בכרטיס הערה
+THUMB_SCALE = 0.7
+
+# ניקוי פרויקטים שפג תוקפם - רץ ברקע
+CLEANUP_INTERVAL_SECONDS = int(os.environ.get("KOZY_CLEANUP_INTERVAL_SECONDS", 300))
+CLEANUP_BATCH_SIZE = int(os.environ.get("KOZY_CLEANUP_BATCH_SIZE", 50))
+
+# מדדי ביצועים - נחשפים ב-/metrics של שרת המדיה ו/או נכתבים לקובץ JSON
+METRICS_ENABLED = os.environ.get("KOZY_METRICS", "1") == "1"
+METRICS_TOKEN = os.environ.get("KOZY_METRICS_TOKEN")
+METRICS_DUMP_PATH = os.environ.get("KOZY_METRICS_DUMP_PATH")
+METRICS_DUMP_INTERVAL_SECONDS = int(os.environ.get("KOZY_METRICS_DUMP_INTERVAL_SECONDS", 60))
+
+# העלאות גדולות בחלקים מקבילים שאפשר לחדש - דרך שרת המדיה, עוקף את מגבלת file_uploader
+RESUMABLE_UPLOADS = os.environ.get("KOZY_RESUMABLE_UPLOADS", "1") == "1"
+MAX_RESUMABLE_MB = int(os.environ.get("KOZY_MAX_RESUMABLE_MB", 20 * 1024))
+UPLOAD_CHUNK_MB = int(os.environ.get("KOZY_UPLOAD_CHUNK_MB", 8))
+UPLOAD_PARALLELISM = int(os.environ.get("KOZY_UPLOAD_PARALLELISM", 4))
+RESUMABLE_TTL_HOURS = int(os.environ.get("KOZY_RESUMABLE_TTL_HOURS", 24))
+
+# פרופיילינג לכל ריצה של הסקריפט - KOZY_PROFILE=1 לכל הריצות, או ?profile=<טוקן עורך> לסשן אחד
+PROFILE_ALL = os.environ.get("KOZY_PROFILE") == "1"
+PROFILE_DIR = Path(os.environ.get("KOZY_PROFILE_DIR", "profiles"))
+PROFILE_INTERVAL_MS = float(os.environ.get("KOZY_PROFILE_INTERVAL_MS", 5))
+PROFILE_KEEP_SLOWEST = int(os.environ.get("KOZY_PROFILE_KEEP_SLOWEST", 20))
+PROFILE_MAX_FILES = int(os.environ.get("KOZY_PROFILE_MAX_FILES", 200))
+PROFILE_FORMAT = os.environ.get("KOZY_PROFILE_FORMAT", "speedscope")
+
+
+# ======================
+# Metrics
+# ======================
+@st.cache_resource
+def get_metrics():
+    registry = MetricsRegistry(enabled=METRICS_ENABLED)
+    registry.add_collector(collect_app_stats)
+    if METRICS_DUMP_PATH:
+        task = PeriodicTask("metrics-dump", lambda: registry.dump(METRICS_DUMP_PATH), METRICS_DUMP_INTERVAL_SECONDS, run_on_stop=True).start()
+        atexit.register(task.stop)
+    return registry
+
+
+def collect_app_stats():
+    # רץ רק כשמישהו קורא את המדדים, לא בכל ריצה של הסקריפט
+    gauges = {}
+    gauges.update(stats_gauges("kozy_pool", pool.stats()))
+    gauges.update(stats_gauges("kozy_read_cache", read_cache.stats()))
+    gauges.update(stats_gauges("kozy_token_cache", token_cache.stats()))
+    gauges.update(stats_gauges("kozy_change_feed", change_feed.stats()))
+    gauges.update(stats_gauges("kozy_views", {"flushed": view_counter.flushed}))
+    gauges.update(stats_gauges("kozy_jobs", job_queue.stats()))
+    return gauges
+
+
+def serve_metrics(request, name, query, head):
+    if METRICS_TOKEN and not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        return request.send_error(401)
+    request.send_plain(200, metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8",
+                       headers={"Cache-Control": "no-store"})
+
+
+@st.cache_resource
+def get_profiler():
+    return RerunProfiler(
+        PROFILE_DIR,
+        interval=PROFILE_INTERVAL_MS / 1000,
+        keep=PROFILE_KEEP_SLOWEST,
+        max_files=PROFILE_MAX_FILES,
+        fmt=PROFILE_FORMAT
+    )
+
+
+metrics = get_metrics()
+
+# ======================
+# CSS מקצועי - Design System
+# ======================
+@metrics.timed("render")
+def load_css():
+    # הגיליון מקומפל פעם אחת ב-templates; עם שרת המדיה נשלח רק קישור לקובץ עם hash
+    media = media_server
+    if media:
+        st.markdown(templates.stylesheet_link(media.asset_url(templates.STYLESHEET_NAME)), unsafe_allow_html=True)
+    else:
+        st.markdown(templates.INLINE_STYLESHEET, unsafe_allow_html=True)
+
+
+# ======================
+# Database Functions
+# ======================
+@st.cache_resource
+def get_pool():
+    return db.ConnectionPool(DB_PATH)
+
+
+@st.cache_resource
+def get_media_server():
+    if not MEDIA_URL:
+        return None
+    secret = os.environ.get("KOZY_MEDIA_SECRET") or secrets.token_hex(32)
+    try:
+        media = MediaServer(UPLOAD_DIR, MEDIA_URL, secret, host=MEDIA_HOST, port=MEDIA_PORT)
+        media.add_asset(templates.STYLESHEET_NAME, templates.STYLESHEET, "text/css; charset=utf-8")
+        media.add_route("/export/", serve_export)
+        media.add_route("/metrics", serve_metrics)
+        if RESUMABLE_UPLOADS:
+            media.add_route("/uploads/", serve_upload, methods=("GET", "HEAD", "POST", "PATCH", "DELETE", "OPTIONS"))
+        return media.start()
+    except OSError as e:
+        # הפורט תפוס - נופלים חזרה ל-st.video הרגיל
+        logger.warning("media server disabled: %s", e)
+        return None
+
+
+@st.cache_resource
+def get_blob_store():
+    return BlobStore(UPLOAD_DIR, backend=backend_from_env(UPLOAD_DIR))
+
+
+@st.cache_resource
+def get_resumable_uploads():
+    return ResumableUploads(
+        UPLOAD_DIR / ".resumable",
+        finish_resumable_upload,
+        chunk_size=UPLOAD_CHUNK_MB * 1024 * 1024,
+        max_bytes=MAX_RESUMABLE_MB * 1024 * 1024,
+        ttl=RESUMABLE_TTL_HOURS * 3600
+    )
+
+
+@st.cache_resource
+def get_transcoder():
+    return Transcoder(get_pool(), UPLOAD_DIR)
+
+
+@st.cache_resource
+def get_previews():
+    return PreviewGenerator(UPLOAD_DIR)
+
+
+@st.cache_resource
+def get_video_metadata():
+    return VideoMetadata(get_pool())
+
+
+@st.cache_resource
+def get_job_queue():
+    transcoder = get_transcoder()
+    queue = JobQueue(
+        get_pool(),
+        workers=JOB_WORKERS,
+        poll_interval=JOB_POLL_SECONDS,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        retry_delay=JOB_RETRY_DELAY_SECONDS
+    )
+    queue.register("transcode", run_transcode_job,
+                   on_failure=lambda job, error: transcoder.failed(job.video_sha256, job.payload['rung'], error))
+    queue.register("previews", run_previews_job)
+    init_db()
+    queue.start()
+    atexit.register(queue.stop)
+    return queue
+
+
+def release_video(conn, project):
+    # רק עדכוני טבלאות בתוך הטרנזקציה - הקבצים נמחקים ב-remove_video_files אחרי ה-commit
+    filename = blob_store.release(conn, project['video_filename'])
+    if filename is None:
+        return None
+    if project['video_sha256']:
+        job_queue.discard(conn, project['video_sha256'])
+        transcoder.discard(conn, project['video_sha256'])
+        video_metadata.discard(conn, project['video_sha256'])
+    return filename, project['video_sha256']
+
+
+def remove_video_files(released):
+    for filename, video_sha256 in released:
+        try:
+            blob_store.delete(filename)
+        except Exception:
+            # אובייקט יתום עולה רק מקום באחסון - לא מפילים בגללו את המחיקה או הניקוי
+            logger.exception("deleting %s failed", filename)
+        if not video_sha256:
+            continue
+        with pool.connection() as conn:
+            reused = conn.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (video_sha256,)).fetchone()
+        if not reused:
+            transcoder.remove_files(video_sha256)
+            preview_generator.discard(video_sha256)
+
+
+@st.cache_resource
+def get_read_cache():
+    return VersionedCache()
+
+
+@metrics.timed("db")
+def load_active_tokens(after):
+    # created_at ולא rowid: ל-projects יש מפתח TEXT, ו-VACUUM רשאי למספר מחדש את ה-rowid המובלע.
+    # פרויקטים נכתבים תחת BEGIN IMMEDIATE, כך ש-created_at עולה בסדר ה-commit
+    with pool.connection() as conn:
+        return conn.execute(
+            'SELECT created_at, editor_token, client_token FROM projects WHERE is_active = 1 AND expires_at > ? AND created_at >= ?',
+            (datetime.now(), after or '')
+        ).fetchall()
+
+
+@st.cache_resource
+def get_token_cache():
+    return TokenCache(
+        get_read_cache(),
+        load_active_tokens,
+        ttl=TOKEN_CACHE_TTL_SECONDS,
+        negative_ttl=TOKEN_NEGATIVE_TTL_SECONDS,
+        refresh_interval=TOKEN_REFRESH_SECONDS
+    )
+
+
+@st.cache_resource
+def get_view_counter():
+    read_cache = get_read_cache()
+    counter = ViewCounter(
+        get_pool(),
+        unique_sessions=COUNT_UNIQUE_VIEWERS,
+        on_flush=lambda project_ids: [read_cache.bump(pid, "project") for pid in project_ids]
+    )
+    task = PeriodicTask("view-flush", counter.flush, VIEW_FLUSH_INTERVAL_SECONDS, run_on_stop=True).start()
+    atexit.register(task.stop)
+    return counter
+
+
+@st.cache_resource
+def get_change_feed():
+    read_cache = get_read_cache()
+    return ChangeFeed(
+        get_pool(),
+        poll_interval=LIVE_POLL_SECONDS or 0,
+        on_change=lambda project_id: read_cache.bump(project_id, "comments")
+    )
+
+
+def comments_changed(project_id):
+    read_cache.bump(project_id, "comments")
+    change_feed.notify(project_id)
+
+
+def get_session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+@st.cache_resource
+def init_db():
+    with get_pool().connection() as conn:
+        db.migrate(conn)
+
+
+def generate_token(length=16):
+    return hashlib.sha256(f"{uuid.uuid4()}{time.time()}".encode()).hexdigest()[:length]
+
+
+@metrics.timed("upload")
+def create_project(title, description, video_file):
+    with metrics.timer("io", "ingest"):
+        incoming_path, video_sha256, video_size = blob_store.ingest(video_file, max_bytes=MAX_UPLOAD_MB * 1024 * 1024)
+    metrics.inc("kozy_bytes_written_total", video_size, kind="upload")
+    
+    try:
+        return register_project(title, description, incoming_path, video_sha256, video_size, video_file.name)
+    finally:
+        incoming_path.unlink(missing_ok=True)
+
+
+def register_project(title, description, video_path, video_sha256, video_size, original_name):
+    # הקובץ כבר על הדיסק ומגובב - blob_store.add מאמץ אותו, או מוחק אותו כשיש כבר blob זהה
+    project_id = str(uuid.uuid4())
+    editor_token = generate_token(24)
+    client_token = generate_token(16)
+    suffix = Path(original_name).suffix
+    expires_at = datetime.now() + timedelta(hours=72)
+    
+    # קוראים רק את הכותרות של הקובץ המקומי, פעם אחת לכל תוכן - לפני שהוא עובר לאחסון
+    with metrics.timer("io", "probe"):
+        info = video_metadata.probe(video_sha256, video_path)
+    with pool.connection() as conn:
+        known = blob_store.known(conn, video_sha256)
+    with metrics.timer("io", "stage"):
+        staged = None if known else blob_store.stage(video_path, video_sha256, suffix)
+    # ה-blob כבר שמור; הפרויקט והעבודות שלו נכתבים יחד והלינקים חוזרים מיד
+    with pool.connection(immediate=True) as conn:
+        video_filename = blob_store.add(conn, video_path, video_sha256, video_size, suffix, staged=staged)
+        conn.execute('''
+            INSERT INTO projects (id, title, description, video_filename, video_original_name, 
+                                editor_token, client_token, expires_at, video_sha256, video_size_bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (project_id, title, description, video_filename, original_name, 
+              editor_token, client_token, expires_at, video_sha256, video_size))
+        if info:
+            video_metadata.store(conn, video_sha256, info)
+        else:
+            info = video_metadata.get(video_sha256, conn)
+        media_job = {"video_sha256": video_sha256, "video_filename": video_filename}
+        for rung in transcoder.plan(conn, video_sha256, source_height=info and info['height']):
+            job_queue.enqueue(conn, "transcode", {**media_job, "rung": rung['name']}, project_id=project_id, video_sha256=video_sha256)
+        if preview_generator.needed(video_sha256):
+            job_queue.enqueue(conn, "previews", media_job, project_id=project_id, video_sha256=video_sha256)
+    
+    if staged and staged != video_filename:
+        # העלאה מקבילה של אותו תוכן הקדימה אותנו - העותק שלנו מיותר
+        remove_video_files([(staged, None)])
+    job_queue.notify()
+    token_cache.add(editor_token, client_token)
+    
+    return project_id, editor_token, client_token
+
+
+def job_source(job):
+    # לינק חתום טרי בכל ניסיון - ניסיון חוזר אחרי שעות לא ייתקע על לינק שפג
+    return blob_store.source(job.payload['video_filename'], time.time() + SOURCE_URL_TTL_SECONDS)
+
+
+def job_duration(job, source):
+    info = video_metadata.get(job.video_sha256)
+    return info['duration'] if info else probe_duration(source)
+
+
+@metrics.timed("job")
+def run_transcode_job(job):
+    source = job_source(job)
+    transcoder.transcode(job.video_sha256, source, job.payload['rung'],
+                               duration=job_duration(job, source), on_progress=job.progress)
+
+
+@metrics.timed("job")
+def run_previews_job(job):
+    if preview_generator.manifest(job.video_sha256):
+        return
+    source = job_source(job)
+    preview_generator.generate(job.video_sha256, source, duration=job_duration(job, source), on_progress=job.progress)
+
+
+def is_expired(project):
+    expires_at = project['expires_at']
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    return expires_at <= datetime.now()
+
+
+@metrics.timed("db")
+def get_project_by_editor_token(token):
+    def load():
+        with pool.connection() as conn:
+            row = conn.execute('SELECT * FROM projects WHERE editor_token = ? AND is_active = 1 AND expires_at > ?', (token, datetime.now())).fetchone()
+        return dict(row) if row else None
+    
+    project = token_cache.resolve("edit", token, load, lambda p: p and p['id'])
+    if project is None:
+        return None
+    if is_expired(project):
+        token_cache.forget(("edit", token))
+        return None
+    return dict(project)
+
+
+@metrics.timed("db")
+def get_project_by_client_token(token):
+    def load():
+        with pool.connection() as conn:
+            row = conn.execute('SELECT * FROM projects WHERE client_token = ? AND is_active = 1 AND expires_at > ?', (token, datetime.now())).fetchone()
+        return dict(row) if row else None
+    
+    project = token_cache.resolve("view", token, load, lambda p: p and p['id'])
+    if project is None:
+        return None
+    if is_expired(project):
+        token_cache.forget(("view", token))
+        return None
+    view_counter.record(project['id'], get_session_id())
+    return dict(project)
+
+
+def get_view_count(project):
+    return project['view_count'] + view_counter.pending(project['id'])
+
+
+@metrics.timed("db")
+def delete_project(project_id):
+    with pool.connection(immediate=True) as conn:
+        row = conn.execute('SELECT video_filename, video_sha256, editor_token, client_token FROM projects WHERE id = ? AND is_active = 1', (project_id,)).fetchone()
+        released = None
+        if row:
+            conn.execute('UPDATE projects SET is_active = 0 WHERE id = ?', (project_id,))
+            released = release_video(conn, row)
+            conn.execute('DELETE FROM comment_changes WHERE project_id = ?', (project_id,))
+    if released:
+        remove_video_files([released])
+    read_cache.bump(project_id, "project", "comments")
+    change_feed.forget(project_id)
+    if row:
+        token_cache.forget(("edit", row['editor_token']), ("view", row['client_token']))
+
+
+@metrics.timed("db")
+def add_comment(project_id, timestamp_seconds, text, author_name, author_type, category, priority):
+    comment_id = str(uuid.uuid4())
+    with pool.connection(immediate=True) as conn:
+        info = conn.execute('''
+            SELECT m.duration, m.fps FROM projects p JOIN video_metadata m ON m.video_sha256 = p.video_sha256
+            WHERE p.id = ?
+        ''', (project_id,)).fetchone()
+        # בלי מידע על הסרטון (נכשל ה-probe) רק זמנים שליליים נדחים
+        if info:
+            timestamp_seconds = snap_to_frame(timestamp_seconds, fps=info['fps'], duration=info['duration'])
+        else:
+            timestamp_seconds = snap_to_frame(timestamp_seconds)
+        conn.execute('''
+            INSERT INTO comments (id, project_id, timestamp_seconds, text, author_name, 
+                                author_type, category, priority)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (comment_id, project_id, timestamp_seconds, text, author_name, author_type, category, priority))
+    comments_changed(project_id)
+    return comment_id
+
+
+@metrics.timed("db")
+def get_comments(project_id):
+    def load():
+        with pool.connection() as conn:
+            rows = conn.execute('SELECT * FROM comments WHERE project_id = ? ORDER BY timestamp_seconds ASC', (project_id,)).fetchall()
+        return [dict(row) for row in rows]
+    
+    # הרשימה משותפת לכל הסשנים - מחזירים עותקים
+    return [dict(c) for c in read_cache.get("comments", project_id, load)]
+
+
+@metrics.timed("db")
+def get_comments_page(project_id, resolved=None, after=None, limit=COMMENTS_PAGE_SIZE):
+    # דפדוף לפי סמן (timestamp_seconds, id) - מחזיר (הערות, הסמן לעמוד הבא או None)
+    def load():
+        query = 'SELECT * FROM comments WHERE project_id = ?'
+        params = [project_id]
+        if resolved is not None:
+            query += ' AND resolved = ?'
+            params.append(int(resolved))
+        if after is not None:
+            query += ' AND (timestamp_seconds, id) > (?, ?)'
+            params.extend(after)
+        query += ' ORDER BY timestamp_seconds ASC, id ASC LIMIT ?'
+        params.append(limit + 1)
+        with pool.connection() as conn:
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]['timestamp_seconds'], rows[-1]['id'])
+        return rows, next_cursor
+    
+    rows, next_cursor = read_cache.get("comments", project_id, load, variant=("page", resolved, after, limit))
+    return [dict(c) for c in rows], next_cursor
+
+
+def fts_query(text):
+    # כל מילה הופכת לביטוי מצוטט עם התאמת קידומת - קלט המשתמש לא מפורש כתחביר FTS5
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+@metrics.timed("db")
+def search_comments(project_id, text, resolved=None, limit=COMMENTS_PAGE_SIZE):
+    query = fts_query(text)
+    if not query:
+        return []
+    
+    def load():
+        sql = '''
+            SELECT c.*,
+                   highlight(comments_fts, 0, ?, ?) AS text_hl,
+                   highlight(comments_fts, 1, ?, ?) AS author_hl
+            FROM comments_fts
+            JOIN comments c ON c.doc_id = comments_fts.rowid
+            WHERE comments_fts MATCH ? AND comments_fts.project_id = ?
+        '''
+        markers = (templates.HIGHLIGHT_OPEN, templates.HIGHLIGHT_CLOSE) * 2
+        params = [*markers, query, project_id]
+        if resolved is not None:
+            sql += ' AND c.resolved = ?'
+            params.append(int(resolved))
+        sql += ' ORDER BY bm25(comments_fts) LIMIT ?'
+        params.append(limit)
+        with pool.connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+    
+    rows = read_cache.get("comments", project_id, load, variant=("search", query, resolved, limit))
+    return [dict(c) for c in rows]
+
+
+@metrics.timed("db")
+def get_comment_stats(project_id):
+    def load():
+        with pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT resolved, priority, category, author_type, COUNT(*) AS n
+                FROM comments WHERE project_id = ?
+                GROUP BY resolved, priority, category, author_type
+            ''', (project_id,)).fetchall()
+        
+        stats = {
+            "total": 0,
+            "resolved": 0,
+            "pending": 0,
+            "urgent": 0,
+            "by_priority": {},
+            "by_category": {},
+            "by_author_type": {},
+        }
+        for row in rows:
+            n = row['n']
+            stats["total"] += n
+            stats["resolved" if row['resolved'] else "pending"] += n
+            if row['priority'] == 'high' and not row['resolved']:
+                stats["urgent"] += n
+            for field, key in (("by_priority", 'priority'), ("by_category", 'category'), ("by_author_type", 'author_type')):
+                stats[field][row[key]] = stats[field].get(row[key], 0) + n
+        return stats
+    
+    return read_cache.get("comments", project_id, load, variant="stats")
+
+
+@metrics.timed("db")
+def toggle_comment_resolved(comment_id):
+    with pool.connection(immediate=True) as conn:
+        rows = conn.execute('UPDATE comments SET resolved = NOT resolved, version = version + 1 WHERE id = ? RETURNING project_id', (comment_id,)).fetchall()
+    for row in rows:
+        comments_changed(row['project_id'])
+
+
+@metrics.timed("db")
+def mark_review_complete(project_id, client_name):
+    comment_id = str(uuid.uuid4())
+    with pool.connection(immediate=True) as conn:
+        conn.execute('''
+            INSERT INTO comments (id, project_id, timestamp_seconds, text, author_name, 
+                                author_type, category, priority)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (comment_id, project_id, 0, f"✅ {client_name} סיים/ה לתת משוב - אפשר להמשיך לעבוד!", 
+              client_name, "client", "video", "high"))
+    comments_changed(project_id)
+
+
+@metrics.timed("db")
+def delete_comment(comment_id):
+    with pool.connection(immediate=True) as conn:
+        rows = conn.execute('DELETE FROM comments WHERE id = ? RETURNING project_id', (comment_id,)).fetchall()
+    for row in rows:
+        comments_changed(row['project_id'])
+
+
+def iter_project_comments(project_id, batch_size=EXPORT_BATCH_SIZE):
+    # קריאה באצוות לפי סמן - כל אצווה מחזיקה חיבור לרגע קצר בלבד
+    after = (-1, '')
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT * FROM comments
+                WHERE project_id = ? AND (timestamp_seconds, id) > (?, ?)
+                ORDER BY timestamp_seconds ASC, id ASC LIMIT ?
+            ''', (project_id, *after, batch_size)).fetchall()
+        for row in rows:
+            yield dict(row)
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1]['timestamp_seconds'], rows[-1]['id'])
+
+
+def export_project_comments(project, fmt):
+    options = {"title": project['title'], "fps": EDL_FPS} if fmt == "edl" else {}
+    return exchange.export_comments(iter_project_comments(project['id']), fmt, **options)
+
+
+@metrics.timed("db")
+def import_comments(project_id, records):
+    # טרנזקציה אחת עם executemany על גנרטור - שורה שגויה מבטלת את כל הייבוא
+    count = 0
+    info = None
+    
+    def rows():
+        nonlocal count
+        for record in records:
+            count += 1
+            if count > MAX_IMPORT_ROWS:
+                raise exchange.InvalidImport(f"more than {MAX_IMPORT_ROWS} rows")
+            # אותם גבולות ואותה הצמדה לפריים כמו ב-add_comment
+            try:
+                seconds = snap_to_frame(record['timestamp_seconds'], fps=info and info['fps'], duration=info and info['duration'])
+            except InvalidTimestamp as e:
+                raise exchange.InvalidImport(f"row {count}: {e}") from None
+            yield (str(uuid.uuid4()), project_id, seconds, record['text'], record['author_name'],
+                   record['author_type'], record['category'], record['priority'], record['resolved'])
+    
+    with pool.connection(immediate=True) as conn:
+        info = conn.execute('''
+            SELECT m.duration, m.fps FROM projects p JOIN video_metadata m ON m.video_sha256 = p.video_sha256
+            WHERE p.id = ?
+        ''', (project_id,)).fetchone()
+        conn.executemany('''
+            INSERT INTO comments (id, project_id, timestamp_seconds, text, author_name,
+                                author_type, category, priority, resolved)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows())
+    if count:
+        comments_changed(project_id)
+    return count
+
+
+@metrics.timed("http")
+def serve_export(request, name, query, head):
+    if not media_server.verify_signed("/export/", name, query):
+        return request.send_error(403)
+    project_id, _, fmt = name.rpartition(".")
+    if fmt not in exchange.EXPORT_FORMATS:
+        return request.send_error(404)
+    with pool.connection() as conn:
+        row = conn.execute('SELECT * FROM projects WHERE id = ? AND is_active = 1', (project_id,)).fetchone()
+    if not row:
+        return request.send_error(404)
+    filename = f"kozy-{project_id[:8]}.{exchange.EXPORT_FORMATS[fmt]['extension']}"
+    request.send_stream(
+        [] if head else export_project_comments(dict(row), fmt),
+        exchange.EXPORT_FORMATS[fmt]['content_type'],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
+
+UPLOAD_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Expose-Headers": "Location, Upload-Offset, Upload-Length, Upload-Chunk-Size, Upload-Missing, Tus-Resumable",
+    "Tus-Resumable": "1.0.0",
+    "Cache-Control": "no-store",
+}
+
+
+def finish_resumable_upload(data_path, video_sha256, video_size, meta):
+    fields = meta["fields"]
+    project_id, editor_token, client_token = register_project(
+        fields.get("title") or Path(meta["filename"]).stem, fields.get("description", ""),
+        data_path, video_sha256, video_size, meta["filename"]
+    )
+    metrics.inc("kozy_bytes_written_total", video_size, kind="resumable")
+    return {"project_id": project_id, "editor_token": editor_token, "client_token": client_token}
+
+
+@metrics.timed("http")
+def serve_upload(request, name, query, head):
+    # פרוטוקול בסגנון tus: POST יוצר, HEAD/GET מחזירים מצב, PATCH כותב חלק, DELETE מבטל
+    upload_id, _, action = name.partition("/")
+    method = request.command
+    try:
+        if method == "OPTIONS":
+            return request.send_plain(204, "", headers={
+                **UPLOAD_CORS_HEADERS,
+                "Access-Control-Allow-Methods": "GET, HEAD, POST, PATCH, DELETE, OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type, Upload-Length, Upload-Offset, Upload-Metadata, Tus-Resumable",
+                "Access-Control-Max-Age": "86400",
+            })
+        if method == "POST" and not upload_id:
+            # רק מי שקיבל מהאפליקציה לינק חתום יכול לפתוח העלאה
+            media = media_server
+            if not media.verify_signed("/uploads/", "", query):
+                return request.send_plain(403, "forbidden", headers=UPLOAD_CORS_HEADERS)
+            fields = parse_metadata(request.headers.get("Upload-Metadata"))
+            upload_id = resumable_uploads.create(
+                int(request.headers.get("Upload-Length", "")),
+                Path(fields.pop("filename", "") or "video.mp4").name,
+                title=fields.get("title", ""),
+                description=fields.get("description", "")
+            )
+            return request.send_plain(201, "", headers={
+                **UPLOAD_CORS_HEADERS,
+                "Location": f"{media.public_url}/uploads/{upload_id}",
+                "Upload-Chunk-Size": str(resumable_uploads.chunk_size),
+                "Upload-Offset": "0",
+            })
+        if method == "PATCH":
+            status = resumable_uploads.write_chunk(upload_id, int(request.headers.get("Upload-Offset", "")), request.rfile,
+                                         int(request.headers.get("Content-Length", "")))
+        elif method == "POST" and action == "finish":
+            status = resumable_uploads.retry(upload_id)
+        elif method == "DELETE":
+            resumable_uploads.cancel(upload_id)
+            return request.send_plain(204, "", headers=UPLOAD_CORS_HEADERS)
+        elif method in ("GET", "HEAD"):
+            status = resumable_uploads.status(upload_id)
+        else:
+            return request.send_plain(405, "", headers=UPLOAD_CORS_HEADERS)
+    except UploadNotFound:
+        return request.send_plain(404, "upload not found", headers=UPLOAD_CORS_HEADERS)
+    except UploadTooLarge:
+        request.close_connection = True
+        return request.send_plain(413, f"upload exceeds {MAX_RESUMABLE_MB}MB", headers=UPLOAD_CORS_HEADERS)
+    except (InvalidChunk, ValueError) as e:
+        # גוף הבקשה לא נקרא עד הסוף, אז סוגרים את החיבור
+        request.close_connection = True
+        return request.send_plain(400, str(e), headers=UPLOAD_CORS_HEADERS)
+    except (ConnectionError, TimeoutError):
+        # הלקוח התנתק באמצע חלק - החלק לא סומן והלקוח ישלח אותו שוב
+        request.close_connection = True
+        return
+    except OSError as e:
+        request.close_connection = True
+        return request.send_plain(507, str(e), headers=UPLOAD_CORS_HEADERS)
+    except Exception as e:
+        return request.send_plain(500, str(e), headers=UPLOAD_CORS_HEADERS)
+    
+    headers = {
+        **UPLOAD_CORS_HEADERS,
+        "Upload-Offset": str(status["offset"]),
+        "Upload-Length": str(status["size"]),
+        "Upload-Chunk-Size": str(status["chunk_size"]),
+        "Upload-Missing": ",".join(map(str, status["missing"][:1000])),
+    }
+    if method == "PATCH" and not status["complete"]:
+        return request.send_plain(204, "", headers=headers)
+    request.send_plain(200, json.dumps(status), content_type="application/json", headers=headers)
+
+
+@metrics.timed("db")
+def cleanup_expired_projects(batch_size=CLEANUP_BATCH_SIZE):
+    total = 0
+    while True:
+        with pool.connection(immediate=True) as conn:
+            expired = conn.execute(
+                'SELECT id, video_filename, video_sha256, editor_token, client_token FROM projects WHERE expires_at < ? AND is_active = 1 LIMIT ?',
+                (datetime.now(), batch_size)
+            ).fetchall()
+            conn.executemany('UPDATE projects SET is_active = 0 WHERE id = ?', [(row['id'],) for row in expired])
+            conn.executemany('DELETE FROM comment_changes WHERE project_id = ?', [(row['id'],) for row in expired])
+            released = [release_video(conn, row) for row in expired]
+        remove_video_files([item for item in released if item])
+        
+        for row in expired:
+            read_cache.bump(row['id'], "project", "comments")
+            change_feed.forget(row['id'])
+            token_cache.forget(("edit", row['editor_token']), ("view", row['client_token']))
+        
+        total += len(expired)
+        if len(expired) < batch_size:
+            break
+    
+    if RESUMABLE_UPLOADS:
+        resumable_uploads.purge_expired()
+    
+    if total:
+        # טוקנים מתים יוצאים ממסנן ה-Bloom רק בבנייה מחדש
+        token_cache.rebuild()
+    
+    # יומן השינויים נחוץ רק לסשנים פתוחים - מי שמפגר יותר מזה טוען את הרשימה מחדש
+    with pool.connection(immediate=True) as conn:
+        conn.execute("DELETE FROM comment_changes WHERE changed_at < datetime('now', ?)", (f"-{CHANGE_RETENTION_HOURS} hours",))
+        job_queue.prune(conn, JOB_RETENTION_HOURS)
+    return total
+
+
+@st.cache_resource
+def start_cleanup_scheduler():
+    init_db()
+    return PeriodicTask("cleanup", cleanup_expired_projects, CLEANUP_INTERVAL_SECONDS, run_at_start=True).start()
+
+
+# ======================
+# Helper Functions
+# ======================
+def get_time_remaining(expires_at):
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    remaining = expires_at - datetime.now()
+    if remaining.total_seconds() <= 0:
+        return None, "פג תוקף"
+    hours = int(remaining.total_seconds() // 3600)
+    minutes = int((remaining.total_seconds() % 3600) // 60)
+    return remaining.total_seconds(), f"{hours} שעות ו-{minutes} דקות"
+
+
+def get_base_url():
+    space_host = os.environ.get("SPACE_HOST")
+    if space_host:
+        return f"https://{space_host}"
+    if "streamlit.app" in os.environ.get("HOSTNAME", ""):
+        return "https://roy-kozy.streamlit.app"
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        headers = _get_websocket_headers()
+        if headers and "Host" in headers:
+            host = headers["Host"]
+            if "localhost" not in host:
+                return f"https://{host}"
+    except:
+        pass
+    return "https://roy-kozy.streamlit.app"
+
+
+# ======================
+# UI Components
+# ======================
+@metrics.timed("render")
+def render_header(project_title=None):
+    st.markdown(templates.header_html(project_title), unsafe_allow_html=True)
+
+
+@metrics.timed("render")
+def render_timer(expires_at):
+    remaining_seconds, remaining_text = get_time_remaining(expires_at)
+    if remaining_seconds is None:
+        st.error("⏰ פג תוקף הפרויקט")
+        return False
+    
+    is_urgent = remaining_seconds < 6 * 3600
+    st.markdown(templates.timer_html(remaining_text, urgent=is_urgent), unsafe_allow_html=True)
+    return True
+
+
+@metrics.timed("render")
+def render_video(project, key):
+    video_filename = project['video_filename']
+    # באחסון מרוחק לא שולחים HEAD בכל ריצה - שורת ה-blob מספיקה
+    if not blob_store.backend.remote and not blob_store.exists(video_filename):
+        return False
+    
+    # גרסאות proxy מוכנות - הגבוהה מביניהן כברירת מחדל, עם אפשרות לחזור למקור
+    renditions = transcoder.ready(project['video_sha256']) if project['video_sha256'] else []
+    if renditions:
+        options = [r['name'] for r in reversed(renditions)] + ["original"]
+        info = video_metadata.get(project['video_sha256'])
+        original_label = f"מקור ({info['height']}p)" if info and info['height'] else "מקור"
+        choice = st.selectbox(
+            "איכות",
+            options,
+            format_func=lambda x: original_label if x == "original" else x,
+            key=f"quality_{key}",
+            label_visibility="collapsed"
+        )
+        if choice != "original":
+            video_filename = transcoder.proxy_filename(project['video_sha256'], choice)
+    
+    media = media_server
+    expires_at = project['expires_at']
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    remote_url = blob_store.url(video_filename, expires_at.timestamp()) if video_filename == project['video_filename'] else None
+    st.markdown('<div class="video-wrapper">', unsafe_allow_html=True)
+    if remote_url:
+        st.video(remote_url)
+    elif media:
+        st.video(media.media_url(video_filename, expires_at.timestamp()))
+    else:
+        st.video(str(UPLOAD_DIR / video_filename))
+    st.markdown('</div>', unsafe_allow_html=True)
+    return True
+
+
+def timestamp_input(project, key, col_min, col_sec):
+    # גבולות לפי אורך הסרטון מהמטמון - בלי לקרוא את הקובץ בכל ריצה
+    info = video_metadata.get(project['video_sha256'])
+    duration = int(info['duration']) if info else None
+    with col_min:
+        minutes = st.number_input("דקות", min_value=0, max_value=duration // 60 if duration is not None else None,
+                                  value=0, key=f"{key}_min")
+    max_seconds = 59
+    if duration is not None and minutes >= duration // 60:
+        max_seconds = duration % 60
+        # ערך שנשאר מדקה קודמת לא יכול לחרוג מהגבול החדש
+        if st.session_state.get(f"{key}_sec", 0) > max_seconds:
+            st.session_state[f"{key}_sec"] = max_seconds
+    with col_sec:
+        seconds = st.number_input("שניות", min_value=0, max_value=max_seconds, key=f"{key}_sec",
+                                  help=f"אורך הסרטון: {format_time(info['duration'])}" if info else None)
+    return minutes * 60 + seconds
+
+
+@metrics.timed("render")
+def render_stats(stats):
+    st.markdown(templates.stats_html(stats), unsafe_allow_html=True)
+
+
+def get_preview(project):
+    media = media_server
+    if not media or not project['video_sha256']:
+        return None
+    manifest = preview_generator.manifest(project['video_sha256'])
+    if not manifest:
+        return None
+    expires_at = project['expires_at']
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    url = media.media_url(preview_generator.sprite_filename(project['video_sha256']), expires_at.timestamp())
+    return {"url": url, "manifest": manifest}
+
+
+@metrics.timed("render")
+def render_thumb(preview, timestamp_seconds):
+    if not preview:
+        return ''
+    manifest = preview['manifest']
+    x, y = preview_generator.tile(manifest, timestamp_seconds)
+    return templates.thumb_html(
+        preview['url'],
+        width=int(manifest['tile_width'] * THUMB_SCALE),
+        height=int(manifest['tile_height'] * THUMB_SCALE),
+        sheet_width=int(manifest['columns'] * manifest['tile_width'] * THUMB_SCALE),
+        x=int(x * THUMB_SCALE),
+        y=int(y * THUMB_SCALE),
+    )
+
+
+@metrics.timed("render")
+def render_comment_list(project, key, resolved=None, is_editor=False):
+    # מחסנית סמנים לכל רשימה - העמוד הנוכחי הוא האחרון
+    state_key = f"cursors_{key}_{resolved}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = [None]
+    cursors = st.session_state[state_key]
+    
+    comments, next_cursor = get_comments_page(project['id'], resolved=resolved, after=cursors[-1])
+    if not comments and len(cursors) > 1:
+        # העמוד התרוקן (למשל אחרי מחיקה) - חוזרים אחורה
+        cursors.pop()
+        st.rerun()
+    
+    preview = get_preview(project)
+    for c in comments:
+        render_comment(c, is_editor=is_editor, preview=preview)
+    
+    if len(cursors) > 1 or next_cursor:
+        col_prev, col_page, col_next = st.columns([1, 1, 1])
+        with col_prev:
+            if st.button("→ הקודם", key=f"prev_{state_key}", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col_page:
+            st.markdown(f"<p style='text-align: center; color: {COLORS['text_muted']};'>עמוד {len(cursors)}</p>", unsafe_allow_html=True)
+        with col_next:
+            if st.button("הבא ←", key=f"next_{state_key}", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor)
+                st.rerun()
+
+
+@metrics.timed("render")
+def render_comment(comment, is_editor=False, preview=None):
+    thumb = render_thumb(preview, comment['timestamp_seconds'])
+    st.markdown(templates.comment_html(comment, thumb), unsafe_allow_html=True)
+    
+    if is_editor:
+        col1, col2 = st.columns(2)
+        with col1:
+            btn_text = "↩️ בטל" if comment['resolved'] else "✓ טופל"
+            if st.button(btn_text, key=f"r_{comment['id']}", use_container_width=True):
+                toggle_comment_resolved(comment['id'])
+                st.rerun()
+        with col2:
+            if st.button("🗑️ מחק", key=f"d_{comment['id']}", use_container_width=True):
+                delete_comment(comment['id'])
+                st.rerun()
+
+
+@metrics.timed("render")
+def render_exchange(project):
+    fmt = st.selectbox(
+        "פורמט",
+        list(exchange.EXPORT_FORMATS),
+        format_func=lambda f: exchange.EXPORT_FORMATS[f]['label'],
+        key="export_fmt"
+    )
+    info = exchange.EXPORT_FORMATS[fmt]
+    media = media_server
+    if media:
+        # הקובץ נבנה תוך כדי הורדה בשרת המדיה - לא נטען לזיכרון של הסשן
+        url = media.signed_url("/export/", f"{project['id']}.{fmt}", time.time() + 3600)
+        st.link_button("⬇️ הורדה", url, use_container_width=True)
+    else:
+        if st.button("📄 הכן קובץ", use_container_width=True):
+            st.session_state.export_data = (fmt, "".join(export_project_comments(project, fmt)))
+        if st.session_state.get("export_data", (None,))[0] == fmt:
+            st.download_button(
+                "⬇️ הורדה",
+                data=st.session_state.export_data[1],
+                file_name=f"kozy-{project['id'][:8]}.{info['extension']}",
+                mime=info['content_type'],
+                use_container_width=True
+            )
+    
+    uploaded = st.file_uploader("ייבוא סמנים", type=[f['extension'] for f in exchange.EXPORT_FORMATS.values()], key="import_file")
+    if uploaded and st.button("📥 ייבא", use_container_width=True):
+        import_fmt = Path(uploaded.name).suffix.lstrip('.').lower()
+        options = {"fps": EDL_FPS} if import_fmt == "edl" else {}
+        stream = io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline="")
+        try:
+            count = import_comments(project['id'], exchange.parse_comments(stream, import_fmt, "עורך", **options))
+        except (ValueError, csv.Error) as e:
+            # InvalidImport ו-UnicodeDecodeError הם גם ValueError
+            st.error(f"הייבוא נכשל: {e}")
+        else:
+            st.success(f"✓ יובאו {count} הערות")
+
+
+# ======================
+# Pages
+# ======================
+@metrics.timed("page")
+def page_home():
+    render_header()
+    
+    # Hero
+    st.markdown(f"""
+    <div class="hero">
+        <div class="hero-title">סקירת וידאו פשוטה ומקצועית</div>
+        <div class="hero-subtitle">העלה סרטון, שתף עם הלקוח, קבל משוב מדויק עם חותמות זמן. פשוט ככה.</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    media = media_server if RESUMABLE_UPLOADS else None
+    if media:
+        tab1, tab_large, tab2 = st.tabs(["📤 העלאת פרויקט", "📦 קובץ גדול", "🔗 יש לי לינק"])
+        with tab_large:
+            st.caption(f"עד {MAX_RESUMABLE_MB // 1024}GB • העלאה במקביל שממשיכה מאיפה שנעצרה אם החיבור נקטע")
+            # תוקף מעוגל לשעה - אותו HTML בכל ריצה, כך שה-iframe לא נטען מחדש באמצע העלאה
+            expires = (int(time.time()) // 3600 + 7) * 3600
+            components.html(templates.uploader_html(
+                media.signed_url("/uploads/", "", expires),
+                get_base_url(),
+                UPLOAD_PARALLELISM,
+                MAX_RESUMABLE_MB * 1024 * 1024
+            ), height=420)
+    else:
+        tab1, tab2 = st.tabs(["📤 העלאת פרויקט", "🔗 יש לי לינק"])
+    
+    with tab1:
+        st.markdown("### פרטי הפרויקט")
+        
+        title = st.text_input("שם הפרויקט", placeholder="לדוגמה: פרסומת חורף 2025")
+        description = st.text_area("תיאור (אופציונלי)", placeholder="הערות לגבי הסרטון...", height=80)
+        
+        st.markdown("### קובץ וידאו")
+        video_file = st.file_uploader(
+            "גרור קובץ או לחץ לבחירה",
+            type=["mp4", "mov", "webm", "avi", "mkv"],
+            help=f"MP4, MOV, WebM, AVI, MKV • עד {MAX_UPLOAD_MB}MB"
+        )
+        
+        if video_file:
+            st.video(video_file)
+            size_mb = video_file.size / (1024*1024)
+            st.success(f"✓ {video_file.name} ({size_mb:.1f} MB)")
+        
+        st.markdown("<br>", unsafe_allow_html=True)
+        
+        if st.button("🚀 צור פרויקט", disabled=not (title and video_file), use_container_width=True):
+            try:
+                with st.spinner("מעלה..."):
+                    project_id, editor_token, client_token = create_project(title, description, video_file)
+            except UploadTooLarge:
+                st.error(f"הקובץ גדול מדי - עד {MAX_UPLOAD_MB}MB")
+                return
+            
+            # הלינקים נשמרים ב-session כדי שיישארו בזמן שהעיבוד ברקע מתעדכן
+            st.session_state["created_project"] = (project_id, editor_token, client_token)
+            st.balloons()
+        
+        if "created_project" in st.session_state:
+            project_id, editor_token, client_token = st.session_state["created_project"]
+            st.success("✓ הפרויקט נוצר!")
+            
+            base_url = get_base_url()
+            client_link = f"{base_url}/?view={client_token}"
+            editor_link = f"{base_url}/?edit={editor_token}"
+            
+            st.markdown("### 🔗 הלינקים שלך")
+            
+            st.markdown(f"""
+            <div class="link-box">
+                <div class="link-box-label">לינק ללקוח (שתף אותו!)</div>
+                <code class="link-box-url">{client_link}</code>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            st.code(client_link, language=None)
+            
+            with st.expander("🔐 לינק עריכה (שמור!)"):
+                st.code(editor_link, language=None)
+            
+            job_progress(project_id)
+            
+            st.warning("⏰ הסרטון יימחק אוטומטית בעוד 72 שעות")
+    
+    with tab2:
+        st.markdown("### הדבק את הלינק שקיבלת")
+        
+        link = st.text_input("לינק", placeholder="https://...", label_visibility="collapsed")
+        
+        if st.button("כניסה", use_container_width=True):
+            if "view=" in link:
+                token = link.split("view=")[-1].split("&")[0]
+                st.query_params["view"] = token
+                st.rerun()
+            elif "edit=" in link:
+                token = link.split("edit=")[-1].split("&")[0]
+                st.query_params["edit"] = token
+                st.rerun()
+            else:
+                st.error("לינק לא תקין")
+
+
+@metrics.timed("page")
+def page_editor(project):
+    render_header(project['title'])
+    
+    col_main, col_side = st.columns([2.5, 1])
+    
+    with col_side:
+        # Timer
+        if not render_timer(project['expires_at']):
+            return
+        
+        st.markdown("<br>", unsafe_allow_html=True)
+        
+        # Link
+        base_url = get_base_url()
+        client_link = f"{base_url}/?view={project['client_token']}"
+        
+        st.markdown(f"""
+        <div class="link-box">
+            <div class="link-box-label">🔗 לינק ללקוח</div>
+            <code class="link-box-url" style="font-size: 0.75rem;">{client_link}</code>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.code(client_link, language=None)
+        
+        st.markdown(f"<p style='text-align: center; color: {COLORS['text_muted']}; font-size: 0.75rem;'>👁 נצפה {get_view_count(project)} פעמים</p>", unsafe_allow_html=True)
+        
+        st.markdown("---")
+        
+        # Stats
+        live_stats(project)
+        
+        st.markdown("---")
+        
+        # Export / import
+        with st.expander("📤 ייצוא / ייבוא"):
+            render_exchange(project)
+        
+        # Delete
+        with st.expander("⚠️ מחיקה"):
+            if st.button("🗑️ מחק פרויקט", use_container_width=True):
+                delete_project(project['id'])
+                st.query_params.clear()
+                st.rerun()
+    
+    with col_main:
+        # Video
+        if not render_video(project, "editor"):
+            st.error("קובץ לא נמצא")
+            return
+        
+        # Add comment
+        st.markdown("### 💬 הערה חדשה")
+        
+        col_min, col_sec, col_cat, col_pri = st.columns([1, 1, 2, 2])
+        
+        timestamp = timestamp_input(project, "ed", col_min, col_sec)
+        with col_cat:
+            category = st.selectbox(
+                "קטגוריה",
+                options=list(CATEGORIES.keys()),
+                format_func=lambda x: f"{CATEGORIES[x]['icon']} {CATEGORIES[x]['label']}"
+            )
+        with col_pri:
+            priority = st.selectbox(
+                "עדיפות",
+                options=list(PRIORITIES.keys()),
+                format_func=lambda x: PRIORITIES[x]['label']
+            )
+        
+        comment_text = st.text_area("הערה", placeholder="כתוב את ההערה...", height=80)
+        
+        if st.button("➕ הוסף", disabled=not comment_text, use_container_width=True):
+            try:
+                add_comment(project['id'], timestamp, comment_text, "עורך", "editor", category, priority)
+            except InvalidTimestamp:
+                st.error("נקודת הזמן אחרי סוף הסרטון")
+            else:
+                st.rerun()
+        
+        # Comments list
+        st.markdown("---")
+        st.markdown("### 📋 הערות")
+        live_comments(project)
+
+
+JOB_STATUS_LABELS = {"queued": "בתור", "running": "מעבד", "done": "הושלם", "failed": "נכשל"}
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+@metrics.timed("fragment")
+def job_progress(project_id):
+    jobs = job_queue.for_project(project_id)
+    if not jobs:
+        return
+    st.markdown("### ⚙️ עיבוד ברקע")
+    st.caption("הלינקים כבר עובדים - הסרטון המקורי מוצג עד שהקידוד מסתיים")
+    for job in jobs:
+        label = f"קידוד {job['payload']['rung']}" if job['kind'] == "transcode" else "תצוגה מקדימה"
+        status = JOB_STATUS_LABELS.get(job['status'], job['status'])
+        if job['status'] == "queued" and job['attempts']:
+            status = f"{status} (ניסיון {job['attempts'] + 1} מתוך {job['max_attempts']})"
+        st.progress(job['progress'] or 0.0, text=f"{label} • {status}")
+        if job['status'] == "failed":
+            st.caption(f"⚠️ {job['error']}")
+
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+@metrics.timed("fragment")
+def live_stats(project):
+    change_feed.head(project['id'])
+    render_stats(get_comment_stats(project['id']))
+
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+@metrics.timed("fragment")
+def live_comments(project):
+    # רק הקטע הזה רץ מחדש בכל סבב - בלי שינויים כל הקריאות מגיעות מהמטמון
+    seq_key = f"feed_seq_{project['id']}"
+    feed = change_feed
+    changes = feed.since(project['id'], st.session_state.get(seq_key))
+    if changes:
+        new_comments = [row for _, op, _, row in changes if op == 'insert' and row and row['author_type'] == 'client']
+        if new_comments:
+            st.toast(f"💬 {len(new_comments)} הערות חדשות מהלקוח")
+    st.session_state[seq_key] = feed.head(project['id'])
+    
+    col_search, col_filter = st.columns([2, 1])
+    with col_search:
+        search_text = st.text_input("חיפוש", placeholder="🔍 חיפוש בהערות...", label_visibility="collapsed")
+    with col_filter:
+        filter_opt = st.selectbox(
+            "סינון",
+            ["הכל", "ממתינות", "טופלו"],
+            label_visibility="collapsed"
+        )
+    
+    resolved = {"הכל": None, "ממתינות": False, "טופלו": True}[filter_opt]
+    if not get_comment_stats(project['id'])['total']:
+        st.info("אין הערות עדיין")
+    elif search_text.strip():
+        results = search_comments(project['id'], search_text, resolved=resolved)
+        if not results:
+            st.info("לא נמצאו הערות")
+        preview = get_preview(project)
+        for c in results:
+            render_comment(c, is_editor=True, preview=preview)
+    else:
+        render_comment_list(project, "editor", resolved=resolved, is_editor=True)
+
+
+@metrics.timed("page")
+def page_client(project):
+    render_header()
+    
+    # Welcome
+    st.markdown(f"""
+    <div class="welcome">
+        <div class="welcome-text">👋 שלום! כאן תוכל/י לצפות בסרטון ולשלוח משוב</div>
+        <div class="welcome-subtext">עצור/י את הסרטון בנקודה הרצויה ורשום/י את ההערה</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col_main, col_side = st.columns([3, 1])
+    
+    with col_side:
+        render_timer(project['expires_at'])
+    
+    with col_main:
+        # Video
+        if not render_video(project, "client"):
+            st.error("הסרטון לא זמין")
+            return
+    
+    # Add feedback
+    st.markdown("---")
+    st.markdown("### 💬 הוסף משוב")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        author_name = st.text_input("השם שלך", placeholder="איך קוראים לך?")
+    
+    with col2:
+        st.markdown("**נקודת זמן**")
+        c1, c2 = st.columns(2)
+        timestamp = timestamp_input(project, "cl", c1, c2)
+    
+    col_cat, col_pri = st.columns(2)
+    with col_cat:
+        category = st.selectbox(
+            "קטגוריה",
+            options=list(CATEGORIES.keys()),
+            format_func=lambda x: f"{CATEGORIES[x]['icon']} {CATEGORIES[x]['label']}",
+            key="cl_cat"
+        )
+    with col_pri:
+        priority = st.selectbox(
+            "עדיפות",
+            options=list(PRIORITIES.keys()),
+            format_func=lambda x: PRIORITIES[x]['label'],
+            key="cl_pri"
+        )
+    
+    comment_text = st.text_area("המשוב שלך", placeholder="מה לשנות או לתקן?", height=100)
+    
+    if st.button("📤 שלח משוב", disabled=not (author_name and comment_text), use_container_width=True):
+        try:
+            add_comment(project['id'], timestamp, comment_text, author_name, "client", category, priority)
+        except InvalidTimestamp:
+            st.error("נקודת הזמן אחרי סוף הסרטון")
+        else:
+            st.success("✓ המשוב נשלח!")
+            st.balloons()
+            st.rerun()
+    
+    # Previous comments
+    st.markdown("---")
+    st.markdown("### 📋 משובים שנשלחו")
+    
+    if not get_comment_stats(project['id'])['total']:
+        st.info("עדיין אין משובים. היה/יי הראשון/ה! 🎉")
+    else:
+        render_comment_list(project, "client")
+    
+    # Complete button
+    st.markdown("---")
+    st.markdown("### ✅ סיימת?")
+    
+    if 'review_done' not in st.session_state:
+        st.session_state.review_done = False
+    
+    if not st.session_state.review_done:
+        confirm_name = st.text_input("השם שלך לאישור", placeholder="הכנס שם...", key="confirm")
+        
+        if st.button("🎉 סיימתי - אפשר להמשיך לעבוד!", disabled=not confirm_name, use_container_width=True):
+            mark_review_complete(project['id'], confirm_name)
+            st.session_state.review_done = True
+            st.balloons()
+            st.rerun()
+    else:
+        st.markdown(f"""
+        <div class="completed-box">
+            <div class="completed-icon">✅</div>
+            <div class="completed-title">תודה רבה!</div>
+            <div class="completed-text">העורך קיבל את המשוב ויתחיל לעבוד על התיקונים.</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+# ======================
+# Shared Resources
+# ======================
+# נפתרים פעם אחת בכל ריצה על ת'רד הסקריפט. ת'רדים ברקע (ניקוי, ספירת צפיות, מדדים,
+# עובדי התור ושרת המדיה) משתמשים בשמות האלה ולא בפונקציות get_*, שמחוץ לריצה
+# של streamlit מדפיסות אזהרת "missing ScriptRunContext" בכל קריאה
+pool = get_pool()
+read_cache = get_read_cache()
+token_cache = get_token_cache()
+change_feed = get_change_feed()
+view_counter = get_view_counter()
+blob_store = get_blob_store()
+transcoder = get_transcoder()
+preview_generator = get_previews()
+video_metadata = get_video_metadata()
+resumable_uploads = get_resumable_uploads() if RESUMABLE_UPLOADS else None
+job_queue = get_job_queue()
+media_server = get_media_server()
+
+
+# ======================
+# Main
+# ======================
+def main():
+    init_db()
+    start_cleanup_scheduler()
+    load_css()
+    
+    params = st.query_params
+    
+    if "edit" in params:
+        project = get_project_by_editor_token(params["edit"])
+        if project:
+            page_editor(project)
+        else:
+            st.error("פרויקט לא נמצא או שפג תוקפו")
+            if st.button("🏠 חזרה"):
+                st.query_params.clear()
+                st.rerun()
+    
+    elif "view" in params:
+        project = get_project_by_client_token(params["view"])
+        if project:
+            page_client(project)
+        else:
+            st.error("הסרטון לא נמצא או שפג תוקפו")
+            st.info("ייתכן שעברו 72 שעות והסרטון נמחק אוטומטית.")
+    
+    else:
+        page_home()
+
+
+def current_route():
+    params = st.query_params
+    if "edit" in params:
+        return "edit"
+    if "view" in params:
+        return "view"
+    return "home"
+
+
+def profile_requested():
+    if PROFILE_ALL:
+        return True
+    token = st.query_params.get("profile")
+    if not token:
+        return False
+    # רק מי שמחזיק טוקן עורך תקף יכול להפעיל פרופיילינג (גם על עמוד הלקוח)
+    init_db()
+    return get_project_by_editor_token(token) is not None
+
+
+def run():
+    if profile_requested():
+        get_profiler().run(main, current_route())
+    else:
+        main()
+
+
+if __name__ == "__main__":
+    run()
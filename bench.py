@@ -0,0 +1,287 @@
+"""Benchmarks for the data layer and HTML rendering in app.py.
+
+    python bench.py --projects 200 --comments 500 --output bench.json
+    python bench.py --compare bench.json --max-regression 0.25
+
+Runs against a throw-away SQLite database and upload dir in a temp
+directory. Background ffmpeg jobs are switched off so only the app's own
+code is measured.
+"""
+import argparse
+import gc
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+
+# ======================
+# Measurement
+# ======================
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def measure(func, iterations, setup=None, warmup=3, memory_iterations=20):
+    """Time `func` `iterations` times; `setup` runs untimed before each call.
+
+    Latencies come from perf_counter with tracing off. Peak memory comes
+    from a separate, shorter pass under tracemalloc, so its overhead does
+    not leak into the timings; allocations made by setup are excluded.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(min(memory_iterations, iterations)):
+            if setup:
+                setup()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    total = sum(samples)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / total if total else 0.0,
+        "mean_ms": total / iterations * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000,
+        "peak_kb": peak / 1024,
+    }
+
+
+# ======================
+# Fixture
+# ======================
+def quiet_logs():
+    # מחוץ ל-streamlit run כל קריאה ל-cache_resource מזהירה על ScriptRunContext חסר, והסרטון
+    # המלאכותי מכשיל את ה-probe בכל העלאה - רק רעש בתוצאות. שגיאות עדיין מודפסות.
+    # הקונפיגורציה של streamlit נקראת קודם, אחרת הקריאה שלה מחזירה את הרמה ל-info
+    from streamlit import config, logger
+
+    config.get_option("logger.level")
+    logger.set_log_level("error")
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def load_app(workdir):
+    """Import app.py with its relative paths (uploads/, the DB) inside `workdir`."""
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT))
+    quiet_logs()
+    spec = importlib.util.spec_from_file_location("kozy_app", ROOT / "app.py")
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    app.init_db()
+    app.transcoder.enabled = False
+    app.preview_generator.enabled = False
+    return app
+
+
+def seed(app, projects, comments_per_project, rng):
+    """Bulk-insert the fixture straight through SQL; returns the project rows."""
+    now = datetime.now()
+    categories = list(app.CATEGORIES)
+    priorities = list(app.PRIORITIES)
+    project_rows = []
+    with app.pool.connection() as conn:
+        for i in range(projects):
+            project_rows.append((
+                str(uuid.uuid4()), f"project {i}", "bench", f"blobs/seed/{i}.mp4", f"{i}.mp4",
+                uuid.uuid4().hex[:24], uuid.uuid4().hex[:16], now + timedelta(hours=72),
+            ))
+        conn.executemany('''
+            INSERT INTO projects (id, title, description, video_filename, video_original_name,
+                                  editor_token, client_token, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', project_rows)
+        conn.executemany('''
+            INSERT INTO comments (id, project_id, timestamp_seconds, text, author_name,
+                                  author_type, category, priority, resolved)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            (str(uuid.uuid4()), row[0], rng.uniform(0, 600), f"comment {j} on {row[1]} " * rng.randint(1, 6),
+             rng.choice(["Dana", "Ron", "עורך"]), rng.choice(["client", "editor"]),
+             rng.choice(categories), rng.choice(priorities), int(rng.random() < 0.3))
+            for row in project_rows for j in range(comments_per_project)
+        ))
+    return [{"id": row[0], "editor_token": row[5], "client_token": row[6]} for row in project_rows]
+
+
+class Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+# ======================
+# Benchmarks
+# ======================
+def run_benchmarks(app, projects, args, rng):
+    import templates
+
+    results = {}
+    project_ids = [p["id"] for p in projects]
+    hot = project_ids[0]
+    cache = app.read_cache
+    video = os.urandom(args.video_kb * 1024)
+
+    def bench(name, func, setup=None, iterations=args.iterations):
+        results[name] = measure(func, iterations, setup=setup)
+        r = results[name]
+        print(f"{name:<34} {r['ops_per_sec']:>10.1f}/s  p50 {r['p50_ms']:8.3f}ms  p95 {r['p95_ms']:8.3f}ms  "
+              f"p99 {r['p99_ms']:8.3f}ms  peak {r['peak_kb']:9.1f}KB")
+
+    bench("create_project", lambda: app.create_project("bench", "", Upload(video, "clip.mp4")),
+          iterations=max(args.iterations // 10, 10))
+    bench("get_comments (cold)", lambda: app.get_comments(hot), setup=lambda: cache.bump(hot, "comments"))
+    bench("get_comments (warm)", lambda: app.get_comments(hot))
+    bench("get_comments_page (cold)", lambda: app.get_comments_page(hot), setup=lambda: cache.bump(hot, "comments"))
+    bench("get_comment_stats (cold)", lambda: app.get_comment_stats(hot), setup=lambda: cache.bump(hot, "comments"))
+    bench("add_comment", lambda: app.add_comment(
+        rng.choice(project_ids), rng.uniform(0, 600), "bench comment", "Dana", "client", "video", "medium"))
+
+    comment_ids = [c["id"] for c in app.get_comments(hot)]
+    bench("toggle_comment_resolved", lambda: app.toggle_comment_resolved(rng.choice(comment_ids)))
+    bench("get_project_by_editor_token", lambda: app.get_project_by_editor_token(rng.choice(projects)["editor_token"]))
+    bench("get_project_by_client_token (bad)", lambda: app.get_project_by_client_token(uuid.uuid4().hex[:16]))
+
+    expiring = iter(project_ids[1:])
+
+    def expire_batch():
+        batch = [(pid,) for _, pid in zip(range(args.cleanup_batch), expiring)]
+        # expires_at נשמר בזמן מקומי (datetime.now()), כמו בקוד של האפליקציה
+        expired_at = datetime.now() - timedelta(hours=1)
+        with app.pool.connection() as conn:
+            conn.executemany("UPDATE projects SET expires_at = ? WHERE id = ?", [(expired_at, pid) for pid, in batch])
+
+    # כל קריאה (כולל חימום ומעבר הזיכרון) צורכת אצווה של פרויקטים
+    cleanup_runs = max(min(args.iterations, (len(project_ids) - 1) // args.cleanup_batch // 2 - 3), 1)
+    bench("cleanup_expired_projects", lambda: app.cleanup_expired_projects(batch_size=args.cleanup_batch),
+          setup=expire_batch, iterations=cleanup_runs)
+
+    stats = app.get_comment_stats(hot)
+    bench("render_stats", lambda: app.render_stats(stats))
+    bench("stats_html", lambda: templates.stats_html(stats))
+
+    comments = app.get_comments(hot)
+    versions = iter(range(10**9, 2 * 10**9))
+    # גרסה חדשה בכל קריאה עוקפת את ה-memo ומודדת בנייה מלאה
+    bench("comment_html (cold)", lambda: templates.comment_html({**rng.choice(comments), "version": next(versions)}))
+    bench("comment_html (memoized)", lambda: templates.comment_html(comments[0]))
+    bench("render_comment", lambda: app.render_comment(rng.choice(comments)))
+    bench("load_css", app.load_css)
+    return results
+
+
+# ======================
+# Reporting
+# ======================
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    """Print p50/p95 deltas against a previous run; returns the regressed names."""
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    regressed = []
+    print(f"\ncompared with {baseline_path}:")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before or not before["p50_ms"]:
+            continue
+        delta = current["p50_ms"] / before["p50_ms"] - 1
+        delta95 = current["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        flag = " REGRESSION" if delta > max_regression else ""
+        print(f"{name:<34} p50 {delta:+7.1%}  p95 {delta95:+7.1%}{flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=200, help="comments per project")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--video-kb", type=int, default=512, help="upload size for create_project")
+    parser.add_argument("--cleanup-batch", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file from an earlier run")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p50 slowdown with --compare")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix="kozy-bench-") as workdir:
+        cwd = os.getcwd()
+        app = load_app(workdir)
+        started = time.perf_counter()
+        projects = seed(app, args.projects, args.comments, rng)
+        seed_seconds = time.perf_counter() - started
+        print(f"seeded {args.projects} projects x {args.comments} comments in {seed_seconds:.2f}s\n")
+        try:
+            results = run_benchmarks(app, projects, args, rng)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "seed_seconds": seed_seconds,
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nwrote {args.output}")
+    if args.compare:
+        return 1 if compare(results, args.compare, args.max_regression) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
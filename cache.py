@@ -0,0 +1,278 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 2048
+
+
+# ======================
+# Versioned Read Cache
+# ======================
+class VersionedCache:
+    """In-process read cache invalidated by per-project version counters.
+
+    Writers call `bump(project_id, kind)` after committing; readers call
+    `get(kind, project_id, loader, variant=None)`. An entry is served only
+    while the version it was loaded under is still current, so every
+    session in the process sees a write on its very next read. The version
+    is sampled before loading, which means a write that races with a load
+    simply makes the stored entry stale instead of hiding the write.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._versions = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, project_id, kind):
+        with self._lock:
+            return self._versions.get((kind, project_id), 0)
+
+    def bump(self, project_id, *kinds):
+        with self._lock:
+            for kind in kinds:
+                self._versions[(kind, project_id)] = self._versions.get((kind, project_id), 0) + 1
+            self._writes += 1
+
+    def get(self, kind, project_id, loader, variant=None):
+        """Return the cached value for (kind, project_id), loading it on a miss.
+
+        `variant` separates several values that share one version counter,
+        e.g. the comment list and the comment stats of a project.
+        """
+        cache_key = (kind, project_id, variant)
+        with self._lock:
+            current = self._versions.get((kind, project_id), 0)
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == project_id and entry[1] == current:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        value = loader()
+        self._store(cache_key, project_id, current, value)
+        return value
+
+    def get_by(self, kind, key, loader, project_of, ttl=None):
+        """Like `get`, for lookups whose project is only known from the result.
+
+        The entry remembers which project it belongs to and is checked
+        against that project's version on every hit. If any write lands
+        while loading, the result is returned but not stored. With `ttl`
+        the entry is also reloaded after that many seconds.
+        """
+        cache_key = (kind, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if (entry is not None and entry[1] == self._versions.get((kind, entry[0]), 0)
+                    and (entry[3] is None or entry[3] > time.monotonic())):
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            writes = self._writes
+        value = loader()
+        project_id = project_of(value)
+        if project_id is not None:
+            with self._lock:
+                if self._writes != writes:
+                    return value
+                version = self._versions.get((kind, project_id), 0)
+            self._store(cache_key, project_id, version, value, None if ttl is None else time.monotonic() + ttl)
+        return value
+
+    def _store(self, cache_key, project_id, version, value, expires_at=None):
+        with self._lock:
+            self._entries[cache_key] = (project_id, version, value, expires_at)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+# ======================
+# Token Filter
+# ======================
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; no false negatives."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.bits = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 64)
+        self.hashes = max(int(round(self.bits / self.capacity * math.log(2))), 1)
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing: h1 + i*h2 מתוך digest אחד
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class TokenCache:
+    """Resolves edit/view tokens with as little SQLite traffic as possible.
+
+    Known tokens go through the read cache under the project's version,
+    with a TTL on top. Unknown tokens are filtered twice before a query:
+    a Bloom filter of every active token rejects random or mistyped links
+    outright, and a small negative cache with its own TTL remembers
+    (kind, token) pairs that passed the filter but resolved to nothing
+    (deleted, expired, a false positive, or a client token tried as an
+    editor token). Misses are kept per kind so one failed lookup can not
+    hide the token from the other kind.
+
+    `tokens_since(watermark)` must return (watermark, token, ...) rows for
+    active projects whose watermark is at or after the given one, or all of
+    them for None. It is used to rebuild the filter and, at most once per
+    `refresh_interval`, to pick up projects created elsewhere. The watermark
+    has to be a stable column that only grows; an implicit rowid does not
+    qualify, since VACUUM may renumber it and the refresh would then skip
+    rows. Rows at the boundary come back on the next refresh, which is
+    harmless.
+    """
+
+    def __init__(self, read_cache, tokens_since, ttl=300, negative_ttl=60, refresh_interval=30,
+                 max_negative=10_000, error_rate=0.01):
+        self.read_cache = read_cache
+        self.tokens_since = tokens_since
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_interval = refresh_interval
+        self.max_negative = max_negative
+        self.error_rate = error_rate
+        self._bloom = None
+        self._watermark = None
+        self._refreshed_at = 0.0
+        self._negative = OrderedDict()
+        self._kinds = set()
+        self._pending = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.rejected = 0
+        self.negative_hits = 0
+
+    def rebuild(self):
+        """Reload the filter from scratch, dropping tokens of inactive projects."""
+        with self._refresh_lock:
+            with self._lock:
+                self._pending = []
+            rows = self.tokens_since(None)
+            bloom = BloomFilter(max(len(rows) * 4, 1024), self.error_rate)
+            for row in rows:
+                for token in row[1:]:
+                    bloom.add(token)
+            with self._lock:
+                for token in self._pending:
+                    bloom.add(token)
+                self._pending = None
+                self._bloom = bloom
+                self._watermark = max([row[0] for row in rows], default=None)
+                self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        with self._refresh_lock:
+            with self._lock:
+                if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                    return
+                after = self._watermark
+            rows = self.tokens_since(after)
+            with self._lock:
+                if self._bloom.count + 2 * len(rows) > self._bloom.capacity:
+                    grow = True
+                else:
+                    grow = False
+                    for row in rows:
+                        for token in row[1:]:
+                            # שורות הגבול חוזרות בכל רענון - לא סופרים אותן שוב מול הקיבולת
+                            if token not in self._bloom:
+                                self._bloom.add(token)
+                    self._watermark = max([row[0] for row in rows], default=after)
+                    self._refreshed_at = time.monotonic()
+        if grow:
+            self.rebuild()
+
+    def add(self, *tokens):
+        """Register tokens of a project created in this process."""
+        if self._bloom is None:
+            self.rebuild()
+        with self._lock:
+            for token in tokens:
+                self._bloom.add(token)
+                for kind in self._kinds:
+                    self._negative.pop((kind, token), None)
+                if self._pending is not None:
+                    self._pending.append(token)
+
+    def forget(self, *keys):
+        """Mark (kind, token) pairs of a deleted or expired project as dead."""
+        with self._lock:
+            for key in keys:
+                self._remember_missing(key)
+
+    def _remember_missing(self, key):
+        self._negative[key] = time.monotonic() + self.negative_ttl
+        self._negative.move_to_end(key)
+        while len(self._negative) > self.max_negative:
+            self._negative.popitem(last=False)
+
+    def might_exist(self, token):
+        if self._bloom is None:
+            self.rebuild()
+        if token in self._bloom:
+            return True
+        self._refresh()
+        return token in self._bloom
+
+    def resolve(self, kind, token, loader, project_of):
+        if not token or not self.might_exist(token):
+            with self._lock:
+                self.rejected += 1
+            return None
+        key = (kind, token)
+        with self._lock:
+            self._kinds.add(kind)
+            expires_at = self._negative.get(key)
+            if expires_at is not None:
+                if expires_at > time.monotonic():
+                    self.negative_hits += 1
+                    return None
+                del self._negative[key]
+        value = self.read_cache.get_by("project", key, loader, project_of, ttl=self.ttl)
+        if value is None:
+            with self._lock:
+                self._remember_missing(key)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tokens": self._bloom.count if self._bloom else 0,
+                "negative_entries": len(self._negative),
+                "rejected": self.rejected,
+                "negative_hits": self.negative_hits,
+            }
@@ -0,0 +1,69 @@
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+MAX_SEEN_SESSIONS = 100_000
+
+
+# ======================
+# Write-Behind View Counter
+# ======================
+class ViewCounter:
+    """Aggregates client views in memory and writes them in batches.
+
+    `record()` only touches a dict under a lock, so the client page never
+    waits on SQLite. `flush()` applies every pending increment in a single
+    transaction. With `unique_sessions` each Streamlit session counts once
+    per project instead of once per rerun.
+    """
+
+    def __init__(self, pool, unique_sessions=True, on_flush=None):
+        self.pool = pool
+        self.unique_sessions = unique_sessions
+        self.on_flush = on_flush
+        self._pending = defaultdict(int)
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.flushed = 0
+
+    def record(self, project_id, session_id=None):
+        with self._lock:
+            if self.unique_sessions and session_id is not None:
+                key = (project_id, session_id)
+                if key in self._seen:
+                    return False
+                self._seen[key] = True
+                while len(self._seen) > MAX_SEEN_SESSIONS:
+                    self._seen.popitem(last=False)
+            self._pending[project_id] += 1
+            return True
+
+    def pending(self, project_id):
+        with self._lock:
+            return self._pending.get(project_id, 0)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(int)
+            if not batch:
+                return 0
+            try:
+                with self.pool.connection(immediate=True) as conn:
+                    conn.executemany(
+                        'UPDATE projects SET view_count = view_count + ? WHERE id = ?',
+                        [(count, project_id) for project_id, count in batch.items()]
+                    )
+            except Exception:
+                # מחזירים את הספירות לתור כדי לא לאבד צפיות
+                with self._lock:
+                    for project_id, count in batch.items():
+                        self._pending[project_id] += count
+                raise
+            self.flushed += sum(batch.values())
+            if self.on_flush:
+                self.on_flush(list(batch))
+            return len(batch)
@@ -0,0 +1,470 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# ======================
+# הגדרות SQLite
+# ======================
+DEFAULT_PRAGMAS = {
+    "journal_mode": os.environ.get("KOZY_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("KOZY_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.environ.get("KOZY_SQLITE_MMAP_SIZE", 128 * 1024 * 1024)),
+    "cache_size": int(os.environ.get("KOZY_SQLITE_CACHE_SIZE", -16000)),
+    "busy_timeout": int(os.environ.get("KOZY_SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "temp_store": os.environ.get("KOZY_SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+POOL_SIZE = int(os.environ.get("KOZY_DB_POOL_SIZE", 8))
+STATEMENT_CACHE_SIZE = int(os.environ.get("KOZY_DB_STATEMENT_CACHE", 128))
+
+
+# ======================
+# Connection Pool
+# ======================
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections shared across sessions.
+
+    Connections are opened lazily, configured once with the pragmas above and
+    then reused, so sqlite3's per-connection statement cache keeps the
+    compiled statements of the data functions warm between reruns.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, pragmas=None, cached_statements=STATEMENT_CACHE_SIZE):
+        self.db_path = str(db_path)
+        self.size = size
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "commits": 0,
+            "rollbacks": 0,
+            "write_locks": 0,
+            "lock_wait_seconds": 0.0,
+            "lock_wait_max": 0.0,
+            "busy_errors": 0,
+        }
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas["busy_timeout"] / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        started = time.perf_counter()
+        conn = self._idle.get()
+        with self._lock:
+            self._stats["waits"] += 1
+            self._stats["wait_seconds"] += time.perf_counter() - started
+        return conn
+
+    def _release(self, conn):
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, immediate=False):
+        """Check out a connection for one unit of work.
+
+        The transaction is committed when the block exits cleanly and rolled
+        back otherwise, then the connection goes back to the pool. Pass
+        `immediate=True` for every block that writes: the write lock is
+        taken up front instead of failing on upgrade, and the time spent
+        waiting for it shows up in `lock_wait_seconds`.
+        """
+        conn = self._acquire()
+        with self._lock:
+            self._stats["checkouts"] += 1
+        try:
+            if immediate:
+                # BEGIN IMMEDIATE ממתין (עד busy_timeout) לנעילת הכתיבה - זה זמן ההמתנה לנעילה
+                started = time.perf_counter()
+                conn.execute('BEGIN IMMEDIATE')
+                waited = time.perf_counter() - started
+                with self._lock:
+                    self._stats["write_locks"] += 1
+                    self._stats["lock_wait_seconds"] += waited
+                    self._stats["lock_wait_max"] = max(self._stats["lock_wait_max"], waited)
+            yield conn
+        except BaseException as e:
+            conn.rollback()
+            with self._lock:
+                self._stats["rollbacks"] += 1
+                if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+                    self._stats["busy_errors"] += 1
+            self._release(conn)
+            raise
+        else:
+            try:
+                if conn.in_transaction:
+                    conn.commit()
+                    with self._lock:
+                        self._stats["commits"] += 1
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                with self._lock:
+                    self._stats["rollbacks"] += 1
+                    if "locked" in str(e):
+                        self._stats["busy_errors"] += 1
+                raise
+            finally:
+                self._release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# ======================
+# Schema Migrations
+# ======================
+# כל מיגרציה היא (גרסה, שם, רשימת פקודות). מוסיפים רק בסוף הרשימה -
+# אסור לשנות מיגרציה שכבר רצה.
+MIGRATIONS = [
+    (1, "initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            video_filename TEXT NOT NULL,
+            video_original_name TEXT,
+            editor_token TEXT UNIQUE NOT NULL,
+            client_token TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            view_count INTEGER DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS comments (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            timestamp_seconds REAL NOT NULL,
+            text TEXT NOT NULL,
+            author_name TEXT NOT NULL,
+            author_type TEXT NOT NULL,
+            category TEXT DEFAULT 'video',
+            priority TEXT DEFAULT 'medium',
+            resolved INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )
+        ''',
+    ]),
+    (2, "lookup indexes", [
+        'CREATE INDEX IF NOT EXISTS idx_comments_project_time ON comments (project_id, timestamp_seconds)',
+        'CREATE INDEX IF NOT EXISTS idx_projects_active_expires ON projects (is_active, expires_at)',
+        'CREATE INDEX IF NOT EXISTS idx_projects_editor_token_active ON projects (editor_token) WHERE is_active = 1',
+        'CREATE INDEX IF NOT EXISTS idx_projects_client_token_active ON projects (client_token) WHERE is_active = 1',
+    ]),
+    (3, "content-addressed blobs", [
+        '''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            filename TEXT UNIQUE NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'ALTER TABLE projects ADD COLUMN video_sha256 TEXT',
+        'ALTER TABLE projects ADD COLUMN video_size_bytes INTEGER',
+    ]),
+    (4, "proxy renditions", [
+        '''
+        CREATE TABLE IF NOT EXISTS renditions (
+            video_sha256 TEXT NOT NULL,
+            name TEXT NOT NULL,
+            height INTEGER NOT NULL,
+            bitrate_kbps INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (video_sha256, name)
+        )
+        ''',
+    ]),
+    (5, "comment stats covering index", [
+        'CREATE INDEX IF NOT EXISTS idx_comments_project_stats ON comments (project_id, resolved, priority, category, author_type)',
+    ]),
+    (6, "comment keyset pagination", [
+        'CREATE INDEX IF NOT EXISTS idx_comments_project_time_id ON comments (project_id, timestamp_seconds, id)',
+        'CREATE INDEX IF NOT EXISTS idx_comments_project_resolved_time_id ON comments (project_id, resolved, timestamp_seconds, id)',
+        'DROP INDEX IF EXISTS idx_comments_project_time',
+    ]),
+    (7, "comment versions", [
+        'ALTER TABLE comments ADD COLUMN version INTEGER NOT NULL DEFAULT 0',
+    ]),
+    (8, "comment full-text search", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5 (
+            text, author_name, project_id UNINDEXED,
+            content = 'comments', content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comments_fts (rowid, text, author_name, project_id)
+            VALUES (new.rowid, new.text, new.author_name, new.project_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_delete AFTER DELETE ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text, author_name, project_id)
+            VALUES ('delete', old.rowid, old.text, old.author_name, old.project_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comments_fts_update AFTER UPDATE OF text, author_name, project_id ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text, author_name, project_id)
+            VALUES ('delete', old.rowid, old.text, old.author_name, old.project_id);
+            INSERT INTO comments_fts (rowid, text, author_name, project_id)
+            VALUES (new.rowid, new.text, new.author_name, new.project_id);
+        END
+        ''',
+        "INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')",
+    ]),
+    (9, "comment change feed", [
+        '''
+        CREATE TABLE IF NOT EXISTS comment_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id TEXT NOT NULL,
+            comment_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_comment_changes_project_seq ON comment_changes (project_id, seq)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comment_changes_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comment_changes (project_id, comment_id, op) VALUES (new.project_id, new.id, 'insert');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comment_changes_update AFTER UPDATE ON comments BEGIN
+            INSERT INTO comment_changes (project_id, comment_id, op) VALUES (new.project_id, new.id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS comment_changes_delete AFTER DELETE ON comments BEGIN
+            INSERT INTO comment_changes (project_id, comment_id, op) VALUES (old.project_id, old.id, 'delete');
+        END
+        ''',
+    ]),
+    (10, "background job queue", [
+        '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            project_id TEXT,
+            video_sha256 TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            error TEXT,
+            run_after REAL NOT NULL DEFAULT 0,
+            lease_until REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_project ON jobs (project_id)',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_video ON jobs (video_sha256)',
+    ]),
+    (11, "video metadata", [
+        '''
+        CREATE TABLE IF NOT EXISTS video_metadata (
+            video_sha256 TEXT PRIMARY KEY,
+            duration REAL NOT NULL,
+            fps REAL,
+            width INTEGER,
+            height INTEGER,
+            codec TEXT,
+            bitrate_kbps INTEGER,
+            probed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    # לטבלה עם מפתח TEXT יש rowid מובלע ש-VACUUM רשאי למספר מחדש, ואז האינדקס של
+    # comments_fts מצביע על הערות אחרות. doc_id הוא alias קבוע ל-rowid, ו-FTS נבנה עליו מחדש
+    (12, "stable comment rowids for full-text search", [
+        'DROP TRIGGER IF EXISTS comments_fts_insert',
+        'DROP TRIGGER IF EXISTS comments_fts_delete',
+        'DROP TRIGGER IF EXISTS comments_fts_update',
+        'DROP TABLE IF EXISTS comments_fts',
+        '''
+        CREATE TABLE comments_new (
+            doc_id INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            project_id TEXT NOT NULL,
+            timestamp_seconds REAL NOT NULL,
+            text TEXT NOT NULL,
+            author_name TEXT NOT NULL,
+            author_type TEXT NOT NULL,
+            category TEXT DEFAULT 'video',
+            priority TEXT DEFAULT 'medium',
+            resolved INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            version INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )
+        ''',
+        '''
+        INSERT INTO comments_new (doc_id, id, project_id, timestamp_seconds, text, author_name, author_type,
+                                  category, priority, resolved, created_at, version)
+        SELECT rowid, id, project_id, timestamp_seconds, text, author_name, author_type,
+               category, priority, resolved, created_at, version
+        FROM comments ORDER BY rowid
+        ''',
+        'DROP TABLE comments',
+        'ALTER TABLE comments_new RENAME TO comments',
+        'CREATE INDEX idx_comments_project_stats ON comments (project_id, resolved, priority, category, author_type)',
+        'CREATE INDEX idx_comments_project_time_id ON comments (project_id, timestamp_seconds, id)',
+        'CREATE INDEX idx_comments_project_resolved_time_id ON comments (project_id, resolved, timestamp_seconds, id)',
+        '''
+        CREATE TRIGGER comment_changes_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comment_changes (project_id, comment_id, op) VALUES (new.project_id, new.id, 'insert');
+        END
+        ''',
+        '''
+        CREATE TRIGGER comment_changes_update AFTER UPDATE ON comments BEGIN
+            INSERT INTO comment_changes (project_id, comment_id, op) VALUES (new.project_id, new.id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER comment_changes_delete AFTER DELETE ON comments BEGIN
+            INSERT INTO comment_changes (project_id, comment_id, op) VALUES (old.project_id, old.id, 'delete');
+        END
+        ''',
+        '''
+        CREATE VIRTUAL TABLE comments_fts USING fts5 (
+            text, author_name, project_id UNINDEXED,
+            content = 'comments', content_rowid = 'doc_id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER comments_fts_insert AFTER INSERT ON comments BEGIN
+            INSERT INTO comments_fts (rowid, text, author_name, project_id)
+            VALUES (new.doc_id, new.text, new.author_name, new.project_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER comments_fts_delete AFTER DELETE ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text, author_name, project_id)
+            VALUES ('delete', old.doc_id, old.text, old.author_name, old.project_id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER comments_fts_update AFTER UPDATE OF text, author_name, project_id ON comments BEGIN
+            INSERT INTO comments_fts (comments_fts, rowid, text, author_name, project_id)
+            VALUES ('delete', old.doc_id, old.text, old.author_name, old.project_id);
+            INSERT INTO comments_fts (rowid, text, author_name, project_id)
+            VALUES (new.doc_id, new.text, new.author_name, new.project_id);
+        END
+        ''',
+        "INSERT INTO comments_fts (comments_fts) VALUES ('rebuild')",
+    ]),
+]
+
+
+def schema_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Apply every pending migration, each one in its own transaction.
+
+    BEGIN IMMEDIATE takes the write lock before the version is re-read, so
+    two processes starting together cannot apply the same migration twice.
+    Returns the list of versions that were applied.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    for version, name, statements in sorted(migrations, key=lambda m: m[0]):
+        if version <= schema_version(conn):
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
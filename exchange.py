@@ -0,0 +1,209 @@
+import csv
+import io
+import json
+import re
+
+from templates import CATEGORIES, PRIORITIES, format_time
+
+EXPORT_FORMATS = {
+    "csv": {"label": "CSV", "extension": "csv", "content_type": "text/csv; charset=utf-8"},
+    "jsonl": {"label": "JSON Lines", "extension": "jsonl", "content_type": "application/x-ndjson; charset=utf-8"},
+    "edl": {"label": "EDL (markers)", "extension": "edl", "content_type": "text/plain; charset=utf-8"},
+}
+
+CSV_FIELDS = ["time", "timestamp_seconds", "text", "author_name", "author_type", "category", "priority", "resolved", "created_at"]
+
+# צבעי סמנים ב-EDL לפי עדיפות (שמות הצבעים של DaVinci Resolve)
+MARKER_COLORS = {"high": "ResolveColorRed", "medium": "ResolveColorYellow", "low": "ResolveColorGreen"}
+COLOR_PRIORITIES = {color: priority for priority, color in MARKER_COLORS.items()}
+
+DEFAULT_FPS = 25
+TIMECODE_RE = re.compile(r"^(\d{2}):(\d{2}):(\d{2})[:;](\d{2})$")
+EDL_EVENT_RE = re.compile(r"^\d{3,}\s+\S+\s+\S+\s+\S+\s+(\S+)\s+\S+\s+(\S+)\s+\S+\s*$")
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+# ======================
+# Time Formats
+# ======================
+def to_frames(seconds, fps=DEFAULT_FPS):
+    # הפריים שמכיל את נקודת הזמן; האפסילון מגן מפני 93137.99999
+    return int(seconds * fps + 1e-6)
+
+
+def timecode(frames, fps=DEFAULT_FPS):
+    total = frames // fps
+    return f"{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}:{frames % fps:02d}"
+
+
+def parse_time(value, fps=DEFAULT_FPS):
+    """Seconds from a number, MM:SS, HH:MM:SS or an HH:MM:SS:FF timecode."""
+    value = str(value).strip()
+    match = TIMECODE_RE.match(value)
+    if match:
+        hours, minutes, secs, frames = map(int, match.groups())
+        return hours * 3600 + minutes * 60 + secs + frames / fps
+    parts = value.split(":")
+    if not value or len(parts) > 3:
+        raise ValueError(f"bad time: {value!r}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"bad time: {value!r}")
+    return seconds
+
+
+# ======================
+# Export
+# ======================
+# כל פונקציית ייצוא מקבלת איטרטור של הערות ומחזירה גנרטור של מחרוזות,
+# כך שגם רשימות ענקיות לא נטענות לזיכרון בבת אחת.
+def export_csv(comments):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for comment in comments:
+        writer.writerow({**comment, "time": format_time(comment['timestamp_seconds']), "resolved": int(bool(comment['resolved']))})
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(comments):
+    for comment in comments:
+        record = {field: comment.get(field) for field in CSV_FIELDS if field != "time"}
+        record["time"] = format_time(comment['timestamp_seconds'])
+        record["resolved"] = bool(comment['resolved'])
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def export_edl(comments, title="Kozy Review", fps=DEFAULT_FPS, start_seconds=0):
+    """CMX3600 marker list, one single-frame event per comment.
+
+    The `|C:`/`|M:`/`|D:` comment lines are what DaVinci Resolve reads as
+    timeline markers; other NLEs import the events themselves. The author
+    also goes into a `* FROM CLIP NAME:` line so `parse_edl` can restore it.
+    """
+    yield f"TITLE: {title}\nFCM: NON-DROP FRAME\n\n"
+    for number, comment in enumerate(comments, start=1):
+        frame = to_frames(start_seconds + comment['timestamp_seconds'], fps)
+        tc_in, tc_out = timecode(frame, fps), timecode(frame + 1, fps)
+        author = " ".join(str(comment['author_name']).split()).replace("|", "/")
+        name = " ".join(f"{author}: {comment['text']}".split()).replace("|", "/")
+        color = MARKER_COLORS.get(comment['priority'], MARKER_COLORS["medium"])
+        yield (
+            f"{number:03d}  001      V     C        {tc_in} {tc_out} {tc_in} {tc_out}  \n"
+            f" |C:{color} |M:{name} |D:1\n"
+            f"* FROM CLIP NAME: {author}\n\n"
+        )
+
+
+def export_comments(comments, fmt, **options):
+    if fmt == "csv":
+        return export_csv(comments)
+    if fmt == "jsonl":
+        return export_jsonl(comments)
+    if fmt == "edl":
+        return export_edl(comments, **options)
+    raise ValueError(f"unknown export format: {fmt}")
+
+
+# ======================
+# Import
+# ======================
+def normalize(record, line, default_author):
+    """Validate one imported record into add_comment's fields."""
+    text = str(record.get("text") or "").strip()
+    if not text:
+        raise InvalidImport(f"line {line}: missing text")
+    raw_time = record.get("timestamp_seconds")
+    if raw_time in (None, ""):
+        raw_time = record.get("time")
+    try:
+        seconds = parse_time(raw_time)
+    except (TypeError, ValueError):
+        raise InvalidImport(f"line {line}: bad time {raw_time!r}") from None
+    category = record.get("category")
+    priority = record.get("priority")
+    resolved = record.get("resolved")
+    return {
+        "timestamp_seconds": seconds,
+        "text": text,
+        "author_name": str(record.get("author_name") or default_author).strip(),
+        "author_type": "client" if record.get("author_type") == "client" else "editor",
+        "category": category if category in CATEGORIES else "video",
+        "priority": priority if priority in PRIORITIES else "medium",
+        "resolved": 1 if str(resolved).strip().lower() in ("1", "true", "yes") else 0,
+    }
+
+
+def parse_csv(stream, default_author):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield normalize(record, reader.line_num, default_author)
+
+
+def parse_jsonl(stream, default_author):
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            raise InvalidImport(f"line {line}: invalid JSON") from None
+        if not isinstance(record, dict):
+            raise InvalidImport(f"line {line}: expected an object")
+        yield normalize(record, line, default_author)
+
+
+def _edl_event(event):
+    # הסמן נכתב כ-"מחבר: טקסט" - כשהמחבר ידוע מורידים אותו מהטקסט
+    author = event.get("author_name")
+    prefix = f"{author}: "
+    if author and event["text"].startswith(prefix):
+        event["text"] = event["text"][len(prefix):]
+    return event
+
+
+def parse_edl(stream, default_author, fps=DEFAULT_FPS, start_seconds=0):
+    event = None
+    for line, raw in enumerate(stream, start=1):
+        match = EDL_EVENT_RE.match(raw.strip())
+        if match:
+            if event:
+                yield normalize(_edl_event(event), event["line"], default_author)
+            try:
+                seconds = max(parse_time(match.group(2), fps) - start_seconds, 0)
+            except ValueError:
+                raise InvalidImport(f"line {line}: bad timecode {match.group(2)!r}") from None
+            event = {"timestamp_seconds": seconds, "line": line, "text": ""}
+        elif event is not None and raw.lstrip().startswith("|"):
+            for part in raw.split("|")[1:]:
+                key, _, value = part.partition(":")
+                if key == "M":
+                    event["text"] = value.strip()
+                elif key == "C":
+                    event["priority"] = COLOR_PRIORITIES.get(value.strip())
+        elif event is not None and raw.lstrip("* ").upper().startswith("COMMENT:") and not event["text"]:
+            # שורות "* COMMENT:" בסגנון Avid
+            event["text"] = raw.lstrip("* ")[len("COMMENT:"):].strip()
+        elif event is not None and raw.lstrip("* ").upper().startswith("FROM CLIP NAME:"):
+            event["author_name"] = raw.lstrip("* ")[len("FROM CLIP NAME:"):].strip()
+    if event:
+        yield normalize(_edl_event(event), event["line"], default_author)
+
+
+IMPORTERS = {"csv": parse_csv, "jsonl": parse_jsonl, "edl": parse_edl}
+
+
+def parse_comments(stream, fmt, default_author, **options):
+    """Lazily parse an uploaded text stream; raises InvalidImport on bad rows."""
+    if fmt not in IMPORTERS:
+        raise ValueError(f"unknown import format: {fmt}")
+    return IMPORTERS[fmt](stream, default_author, **options)
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+
+POLL_INTERVAL_SECONDS = 2.0
+MAX_BUFFERED_CHANGES = 500
+
+
+class _ProjectFeed:
+    __slots__ = ("lock", "head", "floor", "changes", "polled_at", "dirty")
+
+    def __init__(self, max_changes):
+        self.lock = threading.Lock()
+        self.head = None
+        self.floor = None
+        self.changes = deque(maxlen=max_changes)
+        self.polled_at = 0.0
+        self.dirty = False
+
+
+# ======================
+# Comment Change Feed
+# ======================
+class ChangeFeed:
+    """Shared, in-process view of the `comment_changes` log.
+
+    Every insert, update and delete on `comments` appends a row with a
+    monotonically increasing `seq` (see migration 9). Sessions remember the
+    last seq they rendered and ask for `since(project_id, seq)`. The feed
+    reads the log at most once per `poll_interval` per project, whatever
+    the number of watching sessions, and keeps the recent changes in
+    memory; writes made in this process call `notify()` so they show up on
+    the next poll without waiting. `on_change(project_id)` runs whenever a
+    poll finds new rows, including rows written by other processes.
+    """
+
+    def __init__(self, pool, poll_interval=POLL_INTERVAL_SECONDS, max_changes=MAX_BUFFERED_CHANGES, on_change=None):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.max_changes = max_changes
+        self.on_change = on_change
+        self._projects = {}
+        self._lock = threading.Lock()
+        self.polls = 0
+
+    def _project(self, project_id):
+        with self._lock:
+            feed = self._projects.get(project_id)
+            if feed is None:
+                feed = self._projects[project_id] = _ProjectFeed(self.max_changes)
+            return feed
+
+    def notify(self, project_id):
+        self._project(project_id).dirty = True
+
+    def forget(self, project_id):
+        with self._lock:
+            self._projects.pop(project_id, None)
+
+    def head(self, project_id):
+        """Latest seq for the project, polling the log if it is due."""
+        return self._poll(project_id).head
+
+    def since(self, project_id, seq):
+        """Changes after `seq`, oldest first, as (seq, op, comment_id, row) tuples.
+
+        `row` is the comment's current state, or None once it was deleted.
+        Returns None when `seq` is older than the buffered window; the
+        caller should then reload the full list and continue from `head()`.
+        """
+        feed = self._poll(project_id)
+        with feed.lock:
+            if seq is None or seq < feed.floor:
+                return None
+            if seq >= feed.head:
+                return []
+            return [change for change in feed.changes if change[0] > seq]
+
+    def _poll(self, project_id):
+        feed = self._project(project_id)
+        with feed.lock:
+            now = time.monotonic()
+            if feed.head is not None and not feed.dirty and now - feed.polled_at < self.poll_interval:
+                return feed
+            # הדגל מתאפס לפני הקריאה - כתיבה שמגיעה במהלכה תסמן אותו שוב
+            feed.dirty = False
+            feed.polled_at = now
+            self.polls += 1
+            with self.pool.connection() as conn:
+                if feed.head is None:
+                    row = conn.execute('SELECT MAX(seq) FROM comment_changes WHERE project_id = ?', (project_id,)).fetchone()
+                    feed.head = feed.floor = row[0] or 0
+                    return feed
+                rows = conn.execute('''
+                    SELECT ch.seq, ch.op, ch.comment_id, c.*
+                    FROM comment_changes ch
+                    LEFT JOIN comments c ON c.id = ch.comment_id
+                    WHERE ch.project_id = ? AND ch.seq > ?
+                    ORDER BY ch.seq ASC
+                ''', (project_id, feed.head)).fetchall()
+            if not rows:
+                return feed
+            for row in rows:
+                comment = {key: row[key] for key in row.keys()[3:]}
+                feed.changes.append((row['seq'], row['op'], row['comment_id'], comment if comment['id'] else None))
+            feed.head = rows[-1]['seq']
+            feed.floor = max(feed.floor, feed.changes[0][0] - 1)
+        if self.on_change:
+            self.on_change(project_id)
+        return feed
+
+    def stats(self):
+        with self._lock:
+            return {"projects": len(self._projects), "polls": self.polls}
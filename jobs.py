@@ -0,0 +1,221 @@
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 2
+POLL_INTERVAL_SECONDS = 2.0
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30
+LEASE_SECONDS = 600
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """One claimed job, as seen by its handler."""
+
+    def __init__(self, queue, row):
+        self.queue = queue
+        self.id = row['id']
+        self.kind = row['kind']
+        self.payload = json.loads(row['payload'])
+        self.project_id = row['project_id']
+        self.video_sha256 = row['video_sha256']
+        self.attempts = row['attempts']
+        self._reported_at = 0.0
+
+    def progress(self, fraction, message=None, force=False):
+        """Record progress (0..1) and renew the lease.
+
+        Writes are throttled to one per PROGRESS_INTERVAL_SECONDS. Raises
+        JobCancelled when the job row is gone, e.g. because its video was
+        deleted, so the handler can stop early.
+        """
+        now = time.monotonic()
+        if not force and now - self._reported_at < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._reported_at = now
+        with self.queue.pool.connection(immediate=True) as conn:
+            cur = conn.execute('''
+                UPDATE jobs SET progress = ?, message = ?, lease_until = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'running'
+            ''', (min(max(fraction, 0.0), 1.0), message, time.time() + self.queue.lease_seconds, self.id))
+        if cur.rowcount == 0:
+            raise JobCancelled(self.id)
+
+
+# ======================
+# Job Queue
+# ======================
+class JobQueue:
+    """Durable background work in the `jobs` table, run by worker threads.
+
+    Jobs are enqueued inside the caller's transaction, so a project and
+    the work it needs are committed together. Workers claim one job at a
+    time with BEGIN IMMEDIATE and hold it under a lease that `Job.progress`
+    renews; a job whose worker died (or whose process restarted) is picked
+    up again once the lease runs out. Failures are retried with exponential
+    backoff up to `max_attempts`, then the job is marked failed and the
+    kind's `on_failure(job, error)` runs. States: queued -> running ->
+    done | failed.
+    """
+
+    def __init__(self, pool, workers=WORKERS, poll_interval=POLL_INTERVAL_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 retry_delay=RETRY_DELAY_SECONDS, lease_seconds=LEASE_SECONDS):
+        self.pool = pool
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self._handlers = {}
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def register(self, kind, handler, on_failure=None):
+        self._handlers[kind] = (handler, on_failure)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"kozy-jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def enqueue(self, conn, kind, payload, project_id=None, video_sha256=None, max_attempts=None):
+        """Add a job inside the caller's transaction; call `notify()` after commit."""
+        cur = conn.execute('''
+            INSERT INTO jobs (kind, payload, project_id, video_sha256, max_attempts)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (kind, json.dumps(payload), project_id, video_sha256, max_attempts or self.max_attempts))
+        return cur.lastrowid
+
+    def notify(self):
+        self._wake.set()
+
+    def discard(self, conn, video_sha256):
+        """Drop a video's pending jobs; running ones stop at their next progress report."""
+        conn.execute("DELETE FROM jobs WHERE video_sha256 = ? AND status IN ('queued', 'running')", (video_sha256,))
+
+    def for_project(self, project_id):
+        with self.pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT id, kind, payload, status, attempts, max_attempts, progress, message, error
+                FROM jobs WHERE project_id = ? ORDER BY id
+            ''', (project_id,)).fetchall()
+        return [{**dict(row), "payload": json.loads(row['payload'])} for row in rows]
+
+    def prune(self, conn, older_than_hours):
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?)",
+            (f"-{older_than_hours} hours",)
+        )
+
+    def _claim(self):
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        now = time.time()
+        query = f'''
+            SELECT * FROM jobs
+            WHERE kind IN ({",".join("?" * len(kinds))})
+              AND ((status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?))
+            ORDER BY id LIMIT 1
+        '''
+        # בדיקה בלי נעילה קודם - תור ריק לא לוקח את נעילת הכתיבה בכל סבב
+        with self.pool.connection() as conn:
+            if conn.execute(query, (*kinds, now, now)).fetchone() is None:
+                return None
+        with self.pool.connection(immediate=True) as conn:
+            row = conn.execute(query, (*kinds, now, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute('''
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (now + self.lease_seconds, row['id']))
+            return Job(self, {**dict(row), "attempts": row['attempts'] + 1})
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception:
+                logger.exception("claiming a job failed")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        handler, on_failure = self._handlers[job.kind]
+        try:
+            handler(job)
+        except JobCancelled:
+            return
+        except Exception as e:
+            self._failed(job, e, on_failure)
+            return
+        with self.pool.connection(immediate=True) as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'done', progress = 1, error = NULL, lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (job.id,))
+        with self._lock:
+            self.completed += 1
+
+    def _failed(self, job, error, on_failure):
+        detail = (getattr(error, "stderr", b"") or b"")[-500:]
+        logger.error("job %s (%s) attempt %s failed: %s %s", job.id, job.kind, job.attempts, error, detail)
+        with self.pool.connection(immediate=True) as conn:
+            row = conn.execute('SELECT max_attempts FROM jobs WHERE id = ?', (job.id,)).fetchone()
+            if row is None:
+                return
+            final = job.attempts >= row['max_attempts']
+            conn.execute('''
+                UPDATE jobs SET status = ?, error = ?, run_after = ?, lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', ("failed" if final else "queued", str(error)[:500],
+                  time.time() + self.retry_delay * 2 ** (job.attempts - 1), job.id))
+        with self._lock:
+            if final:
+                self.failed += 1
+            else:
+                self.retried += 1
+        if final and on_failure:
+            try:
+                on_failure(job, error)
+            except Exception:
+                logger.exception("failure hook for job %s failed", job.id)
+
+    def stats(self):
+        with self.pool.connection() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        with self._lock:
+            return {
+                **{status: counts.get(status, 0) for status in STATUSES},
+                "completed": self.completed,
+                "failed_final": self.failed,
+                "retried": self.retried,
+            }
@@ -0,0 +1,398 @@
+"""Headless load test: concurrent editor and client sessions against app.py.
+
+    python loadtest.py --clients 16 --editors 4 --uploaders 1 --duration 60 --output load.json
+
+Starts the real Streamlit server in this process and drives it with
+headless browser sessions that speak Streamlit's websocket protocol:
+each session sends rerun requests with widget values, as the frontend
+does, and times them until the server reports the script finished.
+Editor sessions also honour the auto-rerun timers of st.fragment, so the
+live comment list is part of the load. Streamlit's AppTest runs one
+script at a time per process, so it can't produce concurrent sessions.
+File uploads can't be sent this way either, so the upload flow calls
+create_project in the server process.
+
+Because the server runs in-process, the report can include the app's
+own connection pool and read cache counters. Every write path opens its
+transaction with BEGIN IMMEDIATE, so the lock-wait figures cover the time
+all writers (page actions, view-count flushes, background jobs) spent
+queued for SQLite's write lock; reads never take it and are not counted.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import runpy
+import socket
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlencode
+
+from bench import ROOT, percentile, quiet_logs
+
+APP_PATH = ROOT / "app.py"
+
+
+# ======================
+# Recorder
+# ======================
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_examples = {}
+
+    def ok(self, action, elapsed):
+        self.samples[action].append(elapsed)
+
+    def fail(self, action, message):
+        self.errors[action] += 1
+        self.error_examples.setdefault(message, action)
+
+    def summary(self, duration):
+        actions = {}
+        for action in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples[action]
+            attempts = len(samples) + self.errors[action]
+            actions[action] = {
+                "count": len(samples),
+                "errors": self.errors[action],
+                "error_rate": self.errors[action] / attempts if attempts else 0.0,
+                "per_sec": len(samples) / duration,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "max_ms": max(samples, default=0) * 1000,
+            }
+        return actions
+
+
+class RerunFailed(Exception):
+    pass
+
+
+# ======================
+# Headless Browser Session
+# ======================
+class BrowserSession:
+    """One Streamlit websocket session, driven the way the frontend drives it."""
+
+    def __init__(self, port, query, timeout):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.query_string = urlencode(query)
+        self.timeout = timeout
+        self.ws = None
+        self.elements = {}
+        self.fragments = {}
+
+    async def __aenter__(self):
+        from tornado.websocket import websocket_connect
+
+        self.ws = await asyncio.wait_for(websocket_connect(self.url, subprotocols=["streamlit"]), self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.ws.close()
+
+    async def rerun(self, widgets=(), fragment_id=None):
+        """Send one rerun and wait for it to finish; returns the elapsed seconds.
+
+        `widgets` is a list of WidgetState protos (button triggers, text
+        values). Raises RerunFailed when the page shows an exception.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        msg.rerun_script.widget_states.widgets.extend(widgets)
+        if fragment_id:
+            msg.rerun_script.fragment_id = fragment_id
+            msg.rerun_script.is_auto_rerun = True
+        else:
+            self.elements = {}
+        exceptions = []
+        started = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        deadline = started + self.timeout
+        while True:
+            payload = await asyncio.wait_for(self.ws.read_message(), max(deadline - time.perf_counter(), 0.001))
+            if payload is None:
+                raise RerunFailed("connection closed")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(payload)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                self.elements[tuple(fwd.metadata.delta_path)] = element
+                if element.WhichOneof("type") == "exception":
+                    exceptions.append(element.exception.message)
+            elif kind == "auto_rerun":
+                self.fragments[fwd.auto_rerun.fragment_id] = fwd.auto_rerun.interval
+            elif kind == "script_finished" and fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                elapsed = time.perf_counter() - started
+                if fwd.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RerunFailed("compile error")
+                if exceptions:
+                    raise RerunFailed(exceptions[0])
+                return elapsed
+
+    def widget(self, kind, label=None, key=None):
+        """Find a widget proto by label, or by the user key embedded in its id."""
+        for element in self.elements.values():
+            if element.WhichOneof("type") != kind:
+                continue
+            proto = getattr(element, kind)
+            if label is not None and proto.label == label:
+                return proto
+            if key is not None and f"-{key}" in proto.id:
+                return proto
+        return None
+
+
+def trigger(widget_id):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    return WidgetState(id=widget_id, trigger_value=True)
+
+
+def text(widget_id, value):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    return WidgetState(id=widget_id, string_value=value)
+
+
+# ======================
+# Flows
+# ======================
+async def timed(rec, action, coro):
+    try:
+        elapsed = await coro
+    except (RerunFailed, asyncio.TimeoutError, OSError) as e:
+        rec.fail(action, f"{type(e).__name__}: {e}")
+        return False
+    rec.ok(action, elapsed)
+    return True
+
+
+async def think(rng, args):
+    if args.think_max:
+        await asyncio.sleep(rng.uniform(args.think_min, args.think_max))
+
+
+async def client_flow(rec, port, project, rng, args):
+    async with BrowserSession(port, {"view": project["client_token"]}, args.timeout) as page:
+        if not await timed(rec, "client.view", page.rerun()):
+            return
+        await think(rng, args)
+        name = page.widget("text_input", label="השם שלך")
+        note = page.widget("text_area", label="המשוב שלך")
+        send = page.widget("button", label="📤 שלח משוב")
+        if not (name and note and send):
+            rec.fail("client.feedback", "feedback form not found")
+            return
+        author = f"client-{rng.randrange(10**6)}"
+        values = [text(name.id, author), text(note.id, f"load test note {rng.random():.6f}")]
+        if not await timed(rec, "client.feedback", page.rerun(values + [trigger(send.id)])):
+            return
+        if rng.random() > args.complete_ratio:
+            return
+        await think(rng, args)
+        confirm = page.widget("text_input", key="confirm")
+        done = page.widget("button", label="🎉 סיימתי - אפשר להמשיך לעבוד!")
+        if confirm and done:
+            await timed(rec, "client.complete", page.rerun([text(confirm.id, author), trigger(done.id)]))
+
+
+async def editor_flow(rec, port, project, rng, args):
+    async with BrowserSession(port, {"edit": project["editor_token"]}, args.timeout) as page:
+        if not await timed(rec, "editor.view", page.rerun()):
+            return
+        for _ in range(args.editor_actions):
+            await think(rng, args)
+            if args.fragments and page.fragments and rng.random() < 0.5:
+                # כמו הדפדפן - ריצה חוזרת של ה-fragment החי בלבד
+                fragment_id = rng.choice(list(page.fragments))
+                await timed(rec, "editor.live_tick", page.rerun(fragment_id=fragment_id))
+                continue
+            if rng.random() < args.delete_ratio:
+                action, button = "editor.delete", page.widget("button", key="d_")
+            else:
+                action, button = "editor.resolve", page.widget("button", key="r_")
+            if button is None:
+                return
+            if not await timed(rec, action, page.rerun([trigger(button.id)])):
+                return
+
+
+async def upload_flow(rec, port, app, projects, rng, args, video):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        project_id, editor_token, client_token = await loop.run_in_executor(
+            None, app["create_project"], "load test", "", Upload(video, "clip.mp4"))
+    except Exception as e:
+        rec.fail("home.upload", f"{type(e).__name__}: {e}")
+    else:
+        rec.ok("home.upload", time.perf_counter() - started)
+        projects.append({"id": project_id, "editor_token": editor_token, "client_token": client_token})
+    await think(rng, args)
+    async with BrowserSession(port, {}, args.timeout) as page:
+        await timed(rec, "home.view", page.rerun())
+
+
+async def user(role, rec, port, app, projects, args, deadline, seed, video):
+    rng = random.Random(seed)
+    flows = {"client": client_flow, "editor": editor_flow}
+    while time.monotonic() < deadline:
+        try:
+            if role == "upload":
+                await upload_flow(rec, port, app, projects, rng, args, video)
+            else:
+                await flows[role](rec, port, rng.choice(projects), rng, args)
+        except (asyncio.TimeoutError, OSError) as e:
+            rec.fail(f"{role}.connect", f"{type(e).__name__}: {e}")
+            await asyncio.sleep(0.5)
+
+
+# ======================
+# Runner
+# ======================
+class Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_app(media_jobs):
+    """Run app.py once as __main__ so cache_resource keys match the server's sessions."""
+    sys.path.insert(0, str(ROOT))
+    quiet_logs()
+    app = runpy.run_path(str(APP_PATH), run_name="__main__")
+    if not media_jobs:
+        app["transcoder"].enabled = False
+        app["preview_generator"].enabled = False
+    return app
+
+
+async def run(args, app, projects, video):
+    from streamlit import config
+    from streamlit.web.server import Server
+
+    port = free_port()
+    for name, value in {
+        "server.port": port,
+        "server.address": "127.0.0.1",
+        "server.headless": True,
+        "server.fileWatcherType": "none",
+        "browser.gatherUsageStats": False,
+        # בלי הפניות למטמון ההודעות של הדפדפן - כל הודעה מגיעה במלואה
+        "global.minCachedMessageSize": 1 << 40,
+    }.items():
+        config.set_option(name, value)
+    server = Server(str(APP_PATH), is_hello=False)
+    await server.start()
+
+    pool = app["get_pool"]()
+    before = pool.stats()
+    rec = Recorder()
+    roles = ["client"] * args.clients + ["editor"] * args.editors + ["upload"] * args.uploaders
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        user(role, rec, port, app, projects, args, deadline, args.seed + i, video)
+        for i, role in enumerate(roles)
+    ))
+    elapsed = time.monotonic() - started
+    after = pool.stats()
+    server.stop()
+    # ממתינים לסיום הסשנים כדי שריצות סקריפט פתוחות לא ייפלו על לולאה סגורה
+    await server.stopped
+    return rec, roles, elapsed, before, after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--editors", type=int, default=2)
+    parser.add_argument("--uploaders", type=int, default=1)
+    parser.add_argument("--projects", type=int, default=5, help="projects created before the run")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think-min", type=float, default=0.1)
+    parser.add_argument("--think-max", type=float, default=0.5)
+    parser.add_argument("--editor-actions", type=int, default=5, help="actions per editor visit")
+    parser.add_argument("--delete-ratio", type=float, default=0.2)
+    parser.add_argument("--complete-ratio", type=float, default=0.1)
+    parser.add_argument("--no-fragments", dest="fragments", action="store_false", help="don't replay live fragment ticks")
+    parser.add_argument("--video-kb", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=30, help="per-rerun timeout in seconds")
+    parser.add_argument("--media-jobs", action="store_true", help="keep ffmpeg transcodes and previews on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="kozy-load-") as workdir:
+        os.chdir(workdir)
+        try:
+            app = load_app(args.media_jobs)
+            video = os.urandom(args.video_kb * 1024)
+            projects = []
+            for i in range(args.projects):
+                project_id, editor_token, client_token = app["create_project"](f"load {i}", "", Upload(video, "clip.mp4"))
+                projects.append({"id": project_id, "editor_token": editor_token, "client_token": client_token})
+            rec, roles, elapsed, before, after = asyncio.run(run(args, app, projects, video))
+            cache = app["get_read_cache"]().stats()
+        finally:
+            os.chdir(cwd)
+
+    actions = rec.summary(elapsed)
+    total = sum(a["count"] for a in actions.values())
+    errors = sum(a["errors"] for a in actions.values())
+    sqlite = {
+        key: after[key] - before[key]
+        for key in ("checkouts", "waits", "wait_seconds", "commits", "rollbacks", "write_locks", "lock_wait_seconds", "busy_errors")
+    }
+    sqlite["lock_wait_max"] = after["lock_wait_max"]
+    report = {
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "sessions": len(roles),
+        "elapsed_seconds": elapsed,
+        "actions_per_sec": total / elapsed,
+        "error_rate": errors / (total + errors) if total + errors else 0.0,
+        "actions": actions,
+        "sqlite": sqlite,
+        "read_cache": cache,
+        "error_examples": dict(list(rec.error_examples.items())[:10]),
+    }
+
+    print(f"{len(roles)} sessions for {elapsed:.1f}s: {report['actions_per_sec']:.1f} actions/s, "
+          f"error rate {report['error_rate']:.2%}\n")
+    for name, a in actions.items():
+        print(f"{name:<18} {a['count']:>6} ok {a['errors']:>4} err  p50 {a['p50_ms']:8.1f}ms  "
+              f"p95 {a['p95_ms']:8.1f}ms  p99 {a['p99_ms']:8.1f}ms  max {a['max_ms']:8.1f}ms")
+    print(f"\nsqlite: {sqlite['write_locks']} BEGIN IMMEDIATE, {sqlite['lock_wait_seconds']:.3f}s waiting for the lock, "
+          f"max {sqlite['lock_wait_max'] * 1000:.1f}ms, {sqlite['busy_errors']} busy errors; "
+          f"pool checkout waits {sqlite['waits']} ({sqlite['wait_seconds']:.3f}s)")
+    print(f"read cache hit ratio {cache['hit_ratio']:.1%}")
+    for message, action in report["error_examples"].items():
+        print(f"error in {action}: {message}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nwrote {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
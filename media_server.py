@@ -0,0 +1,293 @@
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+mimetypes.add_type("video/x-matroska", ".mkv")
+mimetypes.add_type("video/webm", ".webm")
+mimetypes.add_type("video/quicktime", ".mov")
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+# ======================
+# Signed URLs
+# ======================
+def sign(secret, path, expires):
+    message = f"{path}:{int(expires)}".encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()[:32]
+
+
+def verify(secret, path, expires, signature):
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign(secret, path, expires), signature or "")
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single `bytes=` range, or None.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+# ======================
+# HTTP Handler
+# ======================
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    server_version = "KozyMedia/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_HEAD(self):
+        self._dispatch(head=True)
+
+    def do_GET(self):
+        self._dispatch(head=False)
+
+    def do_POST(self):
+        self._dispatch(head=False)
+
+    def do_PATCH(self):
+        self._dispatch(head=False)
+
+    def do_DELETE(self):
+        self._dispatch(head=False)
+
+    def do_OPTIONS(self):
+        self._dispatch(head=False)
+
+    def _dispatch(self, head):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        for prefix, handler, methods in self.server.routes:
+            if path.startswith(prefix):
+                if self.command not in methods:
+                    # גוף בקשה שלא נקרא ישבש את הבקשה הבאה על אותו חיבור
+                    self.close_connection = True
+                    return self.send_plain(405, "", headers={"Allow": ", ".join(methods)})
+                return handler(self, path[len(prefix):], query, head)
+        self.send_error(404)
+
+    def send_plain(self, status, body, content_type="text/plain; charset=utf-8", headers=None):
+        body = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_stream(self, chunks, content_type, headers=None):
+        """Send an iterable of str/bytes with chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        try:
+            for chunk in chunks:
+                chunk = chunk.encode() if isinstance(chunk, str) else chunk
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception:
+            # הכותרות כבר נשלחו - אין דרך לדווח שגיאה מלבד לנתק
+            logger.exception("stream to %s failed", self.address_string())
+            self.close_connection = True
+
+    def send_file(self, file_path, head=False, cache_control="private, max-age=3600"):
+        try:
+            f = open(file_path, "rb")
+        except OSError:
+            return self.send_error(404)
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+            if self._not_modified(etag, stat.st_mtime):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            status = 200
+            range_header = self.headers.get("Range")
+            if range_header and size and self._if_range_matches(etag, stat.st_mtime):
+                try:
+                    byte_range = parse_range(range_header, size)
+                except ValueError:
+                    return self.send_plain(416, "", headers={"Content-Range": f"bytes */{size}"})
+                if byte_range:
+                    start, end = byte_range
+                    status = 206
+
+            length = end - start + 1 if size else 0
+            content_type = mimetypes.guess_type(str(file_path))[0] or "application/octet-stream"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Cache-Control", cache_control)
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            if head or not length:
+                return
+            self.wfile.flush()
+            try:
+                # socket.sendfile משתמש ב-os.sendfile כשאפשר ונופל חזרה ל-send
+                self.connection.sendfile(f, offset=start, count=length)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _if_range_matches(self, etag, mtime):
+        if_range = self.headers.get("If-Range")
+        if not if_range:
+            return True
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            return if_range == etag
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_range).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+
+# ======================
+# Server
+# ======================
+class MediaServer:
+    """Side-car HTTP server for video playback next to Streamlit.
+
+    Files under `root` are served at /media/<relative path> with Range,
+    ETag and Last-Modified support, streamed with sendfile. Every URL is
+    HMAC-signed with an expiry, so only links handed out by the app work.
+    Other modules can mount extra handlers with `add_route`.
+    """
+
+    def __init__(self, root, public_url, secret, host="0.0.0.0", port=8502):
+        self.root = Path(root).resolve()
+        self.public_url = public_url.rstrip("/")
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.httpd = ThreadingHTTPServer((host, port), MediaRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.routes = []
+        self.assets = {}
+        self.add_route("/media/", self._serve_media)
+        self.add_route("/assets/", self._serve_asset)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="kozy-media", daemon=True)
+
+    def add_route(self, prefix, handler, methods=("GET", "HEAD")):
+        self.httpd.routes.append((prefix, handler, tuple(methods)))
+        self.httpd.routes.sort(key=lambda route: len(route[0]), reverse=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def media_url(self, filename, expires):
+        expires = int(expires)
+        signature = sign(self.secret, filename, expires)
+        return f"{self.public_url}/media/{quote(filename)}?e={expires}&s={signature}"
+
+    def signed_url(self, prefix, name, expires):
+        """Signed link to a handler mounted with `add_route(prefix, ...)`."""
+        expires = int(expires)
+        signature = sign(self.secret, prefix + name, expires)
+        return f"{self.public_url}{prefix}{quote(name)}?e={expires}&s={signature}"
+
+    def verify_signed(self, prefix, name, query):
+        return verify(self.secret, prefix + name, query.get("e"), query.get("s"))
+
+    def add_asset(self, name, body, content_type):
+        """Publish an immutable in-memory asset; `name` should carry a content hash."""
+        body = body.encode() if isinstance(body, str) else body
+        self.assets[name] = (body, content_type, f'"{hashlib.sha256(body).hexdigest()[:16]}"')
+        return self.asset_url(name)
+
+    def asset_url(self, name):
+        return f"{self.public_url}/assets/{quote(name)}"
+
+    def _serve_asset(self, request, name, query, head):
+        if name not in self.assets:
+            return request.send_error(404)
+        body, content_type, etag = self.assets[name]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Access-Control-Allow-Origin": "*",
+        }
+        if request.headers.get("If-None-Match") == etag:
+            return request.send_plain(304, b"", headers=headers)
+        request.send_plain(200, body, content_type=content_type, headers=headers)
+
+    def _serve_media(self, request, filename, query, head):
+        if not verify(self.secret, filename, query.get("e"), query.get("s")):
+            return request.send_error(403)
+        file_path = (self.root / filename).resolve()
+        if self.root not in file_path.parents or not file_path.is_file():
+            return request.send_error(404)
+        request.send_file(file_path, head=head)
@@ -0,0 +1,255 @@
+import json
+import logging
+import math
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT_SECONDS = 30
+
+# שמות הקודקים כמו ש-ffprobe מחזיר אותם, כדי ששני המסלולים ייתנו אותו ערך
+MP4_CODECS = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"vp08": "vp8", b"vp09": "vp9", b"av01": "av1",
+    b"mp4v": "mpeg4", b"apcn": "prores", b"apch": "prores", b"apcs": "prores", b"ap4h": "prores",
+}
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class ProbeError(ValueError):
+    pass
+
+
+class InvalidTimestamp(ValueError):
+    pass
+
+
+# ======================
+# Probing
+# ======================
+def probe_ffprobe(src, timeout=PROBE_TIMEOUT_SECONDS):
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "format=duration,bit_rate:stream=codec_name,width,height,avg_frame_rate,r_frame_rate,duration",
+        "-of", "json", str(src),
+    ], check=True, capture_output=True, text=True, timeout=timeout)
+    info = json.loads(result.stdout)
+    if not isinstance(info, dict):
+        raise ProbeError(f"unexpected ffprobe output for {src}")
+    fmt = info.get("format", {})
+    streams = info.get("streams") or []
+    if not streams:
+        raise ProbeError(f"no video stream in {src}")
+    stream = streams[0]
+    duration = _number(fmt.get("duration")) or _number(stream.get("duration"))
+    if not duration:
+        raise ProbeError(f"unknown duration for {src}")
+    bit_rate = _number(fmt.get("bit_rate"))
+    return {
+        "duration": duration,
+        "fps": _rate(stream.get("avg_frame_rate")) or _rate(stream.get("r_frame_rate")),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "codec": stream.get("codec_name"),
+        "bitrate_kbps": round(bit_rate / 1000) if bit_rate else None,
+    }
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate(value):
+    # "30000/1001" -> 29.97; "0/0" כשאין נתון
+    num, _, den = (value or "").partition("/")
+    num, den = _number(num), _number(den or 1)
+    return num / den if num and den else None
+
+
+def _boxes(f, start, end):
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header[:8])
+        body = offset + 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            body = offset + 16
+        elif size == 0:
+            size = end - offset
+        if size < body - offset:
+            raise ProbeError(f"corrupt {kind!r} box at {offset}")
+        yield kind, body, offset + size
+        offset += size
+
+
+def _full_box(f, body, v0, v1):
+    # version 0 ו-1 שונים ברוחב השדות (32 מול 64 ביט)
+    f.seek(body)
+    version = f.read(4)[0]
+    fmt = v1 if version == 1 else v0
+    return struct.unpack(fmt, f.read(struct.calcsize(fmt)))
+
+
+def probe_mp4(path):
+    """Read duration, fps, size and codec from an MP4/MOV header without ffprobe.
+
+    Only the box headers and the video track's sample tables are read;
+    `mdat` is skipped with a seek, so the cost does not depend on the file
+    size even when `moov` sits at the end.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        moov = next(((body, end) for kind, body, end in _boxes(f, 0, size) if kind == b"moov"), None)
+        if moov is None:
+            raise ProbeError(f"no moov box in {path}")
+        duration = None
+        video = None
+
+        def walk(start, end, track):
+            nonlocal duration, video
+            for kind, body, box_end in _boxes(f, start, end):
+                if kind == b"mvhd":
+                    timescale, length = _full_box(f, body, ">8xII", ">16xIQ")
+                    duration = length / timescale if timescale else None
+                elif kind == b"trak":
+                    track = {}
+                    walk(body, box_end, track)
+                    if track.get("video") and video is None:
+                        video = track
+                elif kind in MP4_CONTAINERS:
+                    walk(body, box_end, track)
+                elif kind == b"tkhd":
+                    f.seek(box_end - 8)
+                    width, height = struct.unpack(">II", f.read(8))
+                    track["width"], track["height"] = width >> 16, height >> 16
+                elif kind == b"mdhd":
+                    timescale, length = _full_box(f, body, ">8xII", ">16xIQ")
+                    track["duration"] = length / timescale if timescale else None
+                elif kind == b"hdlr":
+                    # ב-MOV יש גם hdlr של data handler בתוך minf - לא דורסים
+                    f.seek(body + 8)
+                    if f.read(4) == b"vide":
+                        track["video"] = True
+                elif kind == b"stsd":
+                    f.seek(body + 12)
+                    track["codec"] = f.read(4)
+                elif kind == b"stts":
+                    f.seek(body + 4)
+                    count, = struct.unpack(">I", f.read(4))
+                    track["frames"] = sum(
+                        struct.unpack(">II", f.read(8))[0] for _ in range(count)
+                    )
+
+        walk(*moov, None)
+    if video is None:
+        raise ProbeError(f"no video track in {path}")
+    duration = duration or video.get("duration")
+    if not duration:
+        raise ProbeError(f"unknown duration for {path}")
+    track_duration = video.get("duration") or duration
+    fourcc = video.get("codec", b"")
+    return {
+        "duration": duration,
+        "fps": round(video["frames"] / track_duration, 6) if video.get("frames") else None,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "codec": MP4_CODECS.get(fourcc, fourcc.decode("latin-1").strip() or None),
+        "bitrate_kbps": round(size * 8 / duration / 1000),
+    }
+
+
+def probe(src):
+    """Video metadata: ffprobe when installed, otherwise the MP4/MOV header parser."""
+    if not shutil.which("ffprobe"):
+        return probe_mp4(src)
+    try:
+        return probe_ffprobe(src)
+    except (ValueError, subprocess.SubprocessError) as e:
+        try:
+            return probe_mp4(src)
+        except (OSError, ValueError, struct.error):
+            raise e from None
+
+
+def snap_to_frame(seconds, fps=None, duration=None):
+    """Check `seconds` against the video and move it to the nearest frame start.
+
+    Raises InvalidTimestamp for negative times and times past the end.
+    """
+    if seconds < 0 or (duration is not None and seconds > duration):
+        raise InvalidTimestamp(f"timestamp {seconds} is outside the video (0-{duration})")
+    if not fps:
+        return seconds
+    frame = round(seconds * fps)
+    if duration is not None:
+        # הפריים האחרון מתחיל לפני סוף הסרטון
+        frame = min(frame, max(math.ceil(duration * fps) - 1, 0))
+    return round(frame / fps, 6)
+
+
+# ======================
+# Metadata Cache
+# ======================
+class VideoMetadata:
+    """Probe results per video content hash, in the `video_metadata` table.
+
+    Videos are probed once at ingest; deduplicated uploads reuse the row.
+    Rows never change for a given hash, so reads are kept in memory after
+    the first lookup and pages can bound inputs on every rerun for free.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, video_sha256, conn=None):
+        """Cached metadata row; pass `conn` when already holding a pool connection."""
+        if not video_sha256:
+            return None
+        with self._lock:
+            if video_sha256 in self._cache:
+                return self._cache[video_sha256]
+        # חיבור שני מהמאגר בזמן שהקורא מחזיק אחד יכול לחכות לנצח כשהמאגר מלא
+        with nullcontext(conn) if conn is not None else self.pool.connection() as conn:
+            row = conn.execute('SELECT * FROM video_metadata WHERE video_sha256 = ?', (video_sha256,)).fetchone()
+        info = dict(row) if row else None
+        if info is not None:
+            # שורה חסרה לא נשמרת במטמון - היא עשויה להיכתב בהעלאה הבאה
+            with self._lock:
+                self._cache[video_sha256] = info
+        return info
+
+    def probe(self, video_sha256, path):
+        """Probe `path` unless this hash is already known; None when known or unreadable."""
+        if self.get(video_sha256) is not None:
+            return None
+        try:
+            return probe(path)
+        except (OSError, ValueError, struct.error, subprocess.SubprocessError) as e:
+            logger.warning("probing %s failed: %s", video_sha256, e)
+            return None
+
+    def store(self, conn, video_sha256, info):
+        conn.execute('''
+            INSERT OR REPLACE INTO video_metadata (video_sha256, duration, fps, width, height, codec, bitrate_kbps)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (video_sha256, info['duration'], info['fps'], info['width'], info['height'], info['codec'], info['bitrate_kbps']))
+
+    def discard(self, conn, video_sha256):
+        conn.execute('DELETE FROM video_metadata WHERE video_sha256 = ?', (video_sha256,))
+        with self._lock:
+            self._cache.pop(video_sha256, None)
@@ -0,0 +1,221 @@
+import bisect
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# גבולות ה-buckets בשניות - מ-0.1ms (פגיעה במטמון) ועד 10 שניות (העלאה גדולה)
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count", "lock")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+
+# ======================
+# Metrics Registry
+# ======================
+class MetricsRegistry:
+    """In-process counters and latency histograms, rendered for Prometheus.
+
+    `timed(layer)` wraps a function (or, via `timer`, a block) and records
+    its wall time under `kozy_call_seconds{layer, func}`; exceptions are
+    also counted in `kozy_call_errors_total`. The hot path is two
+    perf_counter calls, one bisect and one short lock, so it stays on in
+    production; `enabled=False` turns the decorator into a no-op. Gauges
+    come from collectors, callables returning `{(name, labels): value}`
+    that run only when metrics are read.
+    """
+
+    def __init__(self, enabled=True, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram(self.buckets))
+        return hist
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def timed(self, layer):
+        """Decorator recording latency and errors for every call."""
+        def decorate(func):
+            if not self.enabled:
+                return func
+            hist = self.histogram("kozy_call_seconds", layer=layer, func=func.__name__)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    self.inc("kozy_call_errors_total", layer=layer, func=func.__name__)
+                    raise
+                finally:
+                    # גם st.rerun/st.stop (שאינם Exception) נמדדים, אבל לא נספרים כשגיאה
+                    hist.observe(time.perf_counter() - started)
+            return wrapper
+        return decorate
+
+    @contextmanager
+    def timer(self, layer, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("kozy_call_errors_total", layer=layer, func=name)
+            raise
+        finally:
+            self.histogram("kozy_call_seconds", layer=layer, func=name).observe(time.perf_counter() - started)
+
+    def _gauges(self):
+        gauges = {}
+        for collector in self._collectors:
+            try:
+                gauges.update(collector())
+            except Exception as e:
+                gauges[("kozy_collector_errors", (("error", type(e).__name__),))] = 1
+        return gauges
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        seen = set()
+        for (name, labels), hist in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            counts, total, count = hist.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', repr(float(bound))),))} {cumulative}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total!r}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for (name, labels), value in sorted(self._gauges().items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_label_text(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """The same data as plain JSON-friendly dicts, with p50/p95/p99 per histogram."""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+        calls = []
+        for (name, labels), hist in histograms:
+            counts, total, count = hist.snapshot()
+            calls.append({
+                "metric": name,
+                **dict(labels),
+                "count": count,
+                "sum_seconds": total,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                **{f"p{pct}_ms": self._quantile(counts, count, pct / 100) * 1000 for pct in (50, 95, 99)},
+            })
+        return {
+            "created_at": time.time(),
+            "calls": sorted(calls, key=lambda call: -call["sum_seconds"]),
+            "counters": [{"metric": name, **dict(labels), "value": value} for (name, labels), value in counters],
+            "gauges": [{"metric": name, **dict(labels), "value": value} for (name, labels), value in self._gauges().items()],
+        }
+
+    def _quantile(self, counts, count, q):
+        # הערכה ברמת ה-bucket: הגבול העליון של ה-bucket שמכיל את האחוזון
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def dump(self, path):
+        """Write `snapshot()` to `path` atomically (for the periodic JSON dump)."""
+        path = os.fspath(path)
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".metrics-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as out:
+                json.dump(self.snapshot(), out, indent=2)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def stats_gauges(prefix, stats, **labels):
+    """Turn a component's `stats()` dict into collector output."""
+    label_items = tuple(sorted(labels.items()))
+    return {
+        (f"{prefix}_{key}", label_items): value
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
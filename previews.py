@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SPRITE_COLUMNS = 10
+SPRITE_FRAMES = 100
+TILE_WIDTH = 160
+TILE_HEIGHT = 90
+
+
+def probe_duration(src):
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", str(src),
+    ], check=True, capture_output=True, text=True)
+    return float(result.stdout.strip())
+
+
+# ======================
+# Sprite Sheets
+# ======================
+class PreviewGenerator:
+    """Builds a sprite sheet of thumbnails for each video.
+
+    Comment cards show the tile nearest their timestamp (see `tile`).
+
+    Output lives in previews/<sha256>/ and is keyed by content hash, so
+    deduplicated uploads share it and a finished sheet is never rebuilt.
+    Frames are extracted one at a time with input seeking and kept on disk,
+    which makes an interrupted run resume from the last frame written.
+    `generate` runs as a background job (see jobs.JobQueue).
+    """
+
+    def __init__(self, upload_dir, frames=SPRITE_FRAMES, columns=SPRITE_COLUMNS):
+        self.root = Path(upload_dir) / "previews"
+        self.frames = frames
+        self.columns = columns
+        self.enabled = shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+    def output_dir(self, video_sha256):
+        return self.root / video_sha256
+
+    def sprite_filename(self, video_sha256):
+        return f"previews/{video_sha256}/sprite.jpg"
+
+    def needed(self, video_sha256):
+        return self.enabled and not self.manifest(video_sha256)
+
+    def generate(self, video_sha256, src_path, duration=None, on_progress=None):
+        out_dir = self.output_dir(video_sha256)
+        frames_dir = out_dir / "frames"
+        frames_dir.mkdir(parents=True, exist_ok=True)
+
+        duration = duration or probe_duration(src_path)
+        count = max(1, min(self.frames, int(duration)))
+        interval = duration / count
+
+        for i in range(count):
+            frame_path = frames_dir / f"frame_{i:04d}.jpg"
+            if frame_path.exists():
+                continue
+            tmp = frames_dir / f"frame_{i:04d}.part.jpg"
+            subprocess.run([
+                "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                "-ss", f"{i * interval + interval / 2:.3f}", "-i", str(src_path),
+                "-frames:v", "1",
+                "-vf", f"scale={TILE_WIDTH}:{TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+                       f"pad={TILE_WIDTH}:{TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2",
+                "-q:v", "5", str(tmp),
+            ], check=True, capture_output=True)
+            os.replace(tmp, frame_path)
+            if on_progress:
+                on_progress((i + 1) / (count + 1))
+
+        columns = min(self.columns, count)
+        rows = -(-count // columns)
+        sprite_tmp = out_dir / "sprite.part.jpg"
+        subprocess.run([
+            "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+            "-framerate", "1", "-i", str(frames_dir / "frame_%04d.jpg"),
+            "-vf", f"tile={columns}x{rows}", "-frames:v", "1", "-q:v", "4",
+            str(sprite_tmp),
+        ], check=True, capture_output=True)
+        os.replace(sprite_tmp, out_dir / "sprite.jpg")
+
+        manifest = {
+            "count": count,
+            "columns": columns,
+            "rows": rows,
+            "interval": interval,
+            "duration": duration,
+            "tile_width": TILE_WIDTH,
+            "tile_height": TILE_HEIGHT,
+        }
+        # המניפסט נכתב אחרון - קיומו מסמן שהגיליון מוכן
+        tmp = out_dir / "sprite.json.part"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, out_dir / "sprite.json")
+        shutil.rmtree(frames_dir, ignore_errors=True)
+        return manifest
+
+    def _tile_origin(self, manifest, index):
+        return (index % manifest["columns"]) * manifest["tile_width"], (index // manifest["columns"]) * manifest["tile_height"]
+
+    def manifest(self, video_sha256):
+        try:
+            return json.loads((self.output_dir(video_sha256) / "sprite.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def tile(self, manifest, timestamp_seconds):
+        """Return (x, y) of the sprite tile covering `timestamp_seconds`."""
+        index = min(int(timestamp_seconds // manifest["interval"]), manifest["count"] - 1)
+        return self._tile_origin(manifest, max(index, 0))
+
+    def discard(self, video_sha256):
+        shutil.rmtree(self.output_dir(video_sha256), ignore_errors=True)
@@ -0,0 +1,208 @@
+import heapq
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+KEEP_SLOWEST = 20
+MAX_PROFILE_FILES = 200
+FORMATS = ("speedscope", "collapsed")
+
+
+# ======================
+# Sampling
+# ======================
+class _Sampler(threading.Thread):
+    """Samples one thread's Python stack every `interval` seconds.
+
+    Each stack is weighted by the wall time since the previous sample, so
+    the totals add up to the run's duration even when the sampler waits
+    for the GIL longer than `interval`.
+    """
+
+    def __init__(self, target_ident, interval):
+        super().__init__(name="kozy-profiler", daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_frame_files = {__file__}
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            frame = sys._current_frames().get(self.target_ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename not in own_frame_files:
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[tuple(stack)] += elapsed
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profile:
+    __slots__ = ("route", "started_at", "duration", "samples", "stacks")
+
+    def __init__(self, route, started_at, duration, samples, stacks):
+        self.route = route
+        self.started_at = started_at
+        self.duration = duration
+        self.samples = samples
+        self.stacks = stacks
+
+    def collapsed(self):
+        """Brendan Gregg's folded format: `frame;frame;frame value` per line, in microseconds."""
+        lines = []
+        for stack, seconds in self.stacks.most_common():
+            frames = ";".join(f"{name} ({Path(filename).name}:{line})" for name, filename, line in stack)
+            lines.append(f"{frames} {round(seconds * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self):
+        """A speedscope "sampled" profile (https://www.speedscope.app/file-format-schema.json)."""
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, seconds in self.stacks.items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": filename, "line": line})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(seconds)
+        name = f"{self.route} rerun {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at))}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "kozy-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+# ======================
+# Per-Rerun Profiler
+# ======================
+class RerunProfiler:
+    """Wraps a script run in a sampling profiler and keeps the results.
+
+    A background thread reads the script thread's stack from
+    `sys._current_frames()` every `interval` seconds, so the script itself
+    runs uninstrumented and the cost does not grow with the number of
+    calls. Each run is written to `directory` in `fmt` (speedscope JSON or
+    collapsed stacks for flamegraph.pl); only the newest `max_files` are
+    kept. `slowest.json` holds the `keep` slowest runs seen since start,
+    with their route and profile file.
+    """
+
+    def __init__(self, directory, interval=SAMPLE_INTERVAL_SECONDS, keep=KEEP_SLOWEST,
+                 max_files=MAX_PROFILE_FILES, fmt="speedscope"):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown profile format: {fmt}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.keep = keep
+        self.max_files = max_files
+        self.fmt = fmt
+        self._slowest = []
+        self._files = []
+        self._lock = threading.Lock()
+        self.runs = 0
+
+    def run(self, func, route):
+        """Call `func()` under the profiler; exceptions (including st.rerun) propagate."""
+        sampler = _Sampler(threading.get_ident(), self.interval)
+        started_at = time.time()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            return func()
+        finally:
+            duration = time.perf_counter() - started
+            sampler.stop()
+            try:
+                self.record(Profile(route, started_at, duration, sampler.samples, sampler.stacks))
+            except OSError:
+                # דיסק מלא או תיקייה לא נגישה לא צריכים להפיל את העמוד
+                logger.exception("profile not saved")
+
+    def record(self, profile):
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(profile.started_at))
+        suffix = ".speedscope.json" if self.fmt == "speedscope" else ".folded"
+        path = self.directory / f"{stamp}-{int(profile.duration * 1000):06d}ms-{profile.route}-{os.urandom(3).hex()}{suffix}"
+        if self.fmt == "speedscope":
+            path.write_text(json.dumps(profile.speedscope()))
+        else:
+            path.write_text(profile.collapsed())
+
+        entry = {
+            "duration_ms": round(profile.duration * 1000, 1),
+            "route": profile.route,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(profile.started_at)),
+            "samples": profile.samples,
+            "file": path.name,
+        }
+        with self._lock:
+            self.runs += 1
+            self._files.append(path)
+            # קבצים של ריצות מהרשימה האיטית לא נמחקים - בשבילם שומרים את הרשימה
+            protected = {item[2]["file"] for item in self._slowest}
+            while len(self._files) > self.max_files:
+                old = self._files.pop(0)
+                if old.name not in protected:
+                    old.unlink(missing_ok=True)
+            item = (profile.duration, self.runs, entry)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, item)
+            elif profile.duration > self._slowest[0][0]:
+                dropped = heapq.heappushpop(self._slowest, item)[2]["file"]
+                if dropped not in {p.name for p in self._files}:
+                    (self.directory / dropped).unlink(missing_ok=True)
+            else:
+                return entry
+            self._write_summary()
+        return entry
+
+    def slowest(self):
+        with self._lock:
+            return [item[2] for item in sorted(self._slowest, reverse=True)]
+
+    def _write_summary(self):
+        summary = {
+            "runs": self.runs,
+            "slowest": [item[2] for item in sorted(self._slowest, reverse=True)],
+        }
+        tmp = self.directory / ".slowest.json.tmp"
+        tmp.write_text(json.dumps(summary, indent=2))
+        os.replace(tmp, self.directory / "slowest.json")
@@ -0,0 +1,309 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from storage import UploadTooLarge
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8 * 1024 * 1024
+READ_BUFFER_SIZE = 1024 * 1024
+UPLOAD_TTL_SECONDS = 24 * 3600
+
+
+class UploadNotFound(LookupError):
+    pass
+
+
+class InvalidChunk(ValueError):
+    pass
+
+
+def parse_metadata(header):
+    """Decode a tus `Upload-Metadata` header: comma-separated `key base64(value)` pairs."""
+    fields = {}
+    for pair in (header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            fields[key] = base64.b64decode(value, validate=True).decode() if value else ""
+        except (ValueError, UnicodeDecodeError):
+            raise InvalidChunk(f"bad Upload-Metadata value for {key}") from None
+    return fields
+
+
+class _Upload:
+    __slots__ = ("id", "dir", "meta", "chunks", "lock", "hash_lock", "hasher", "hashed", "finalizing")
+
+    def __init__(self, upload_id, directory, meta, chunks):
+        self.id = upload_id
+        self.dir = directory
+        self.meta = meta
+        self.chunks = chunks
+        self.lock = threading.Lock()
+        self.hash_lock = threading.Lock()
+        self.hasher = hashlib.sha256()
+        self.hashed = 0
+        self.finalizing = False
+
+    @property
+    def size(self):
+        return self.meta["size"]
+
+    @property
+    def chunk_size(self):
+        return self.meta["chunk_size"]
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def contiguous(self):
+        """Bytes received without gaps from the start (tus' Upload-Offset)."""
+        index = self.chunks.find(0)
+        return self.size if index == -1 else index * self.chunk_size
+
+    def missing(self):
+        return [index for index, done in enumerate(self.chunks) if not done]
+
+
+# ======================
+# Resumable Uploads
+# ======================
+class ResumableUploads:
+    """Chunked, resumable uploads that survive dropped connections and restarts.
+
+    A tus-like protocol over plain HTTP (see `serve_upload` in app.py): the
+    client declares the total size up front, then sends fixed-size chunks
+    at chunk-aligned offsets, in any order and in parallel. Each upload
+    lives under `root/<id>/`: `data` is preallocated to the full size and
+    chunks are written straight to their offset with pwrite, so there is
+    no assembly step; `chunks` holds one byte per chunk and is only set
+    after the chunk's data is synced, so a restart resumes from what is
+    really on disk. The SHA-256 is computed over the contiguous prefix as
+    it grows, while those pages are still cached, and once every chunk is
+    in, `on_complete(data_path, sha256, size, meta)` turns the file into a
+    project and its return value is stored as the upload's result.
+    """
+
+    def __init__(self, root, on_complete, chunk_size=CHUNK_SIZE, max_bytes=None, ttl=UPLOAD_TTL_SECONDS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.on_complete = on_complete
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def create(self, size, filename, **fields):
+        if size <= 0:
+            raise InvalidChunk("upload length must be positive")
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise UploadTooLarge(f"upload exceeds {self.max_bytes} bytes")
+        if shutil.disk_usage(self.root).free < size:
+            raise OSError("not enough free disk space for this upload")
+        upload_id = uuid.uuid4().hex
+        directory = self.root / upload_id
+        directory.mkdir()
+        meta = {
+            "id": upload_id,
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "filename": filename,
+            "fields": fields,
+            "created_at": time.time(),
+            "result": None,
+            "error": None,
+        }
+        count = -(-size // self.chunk_size)
+        with open(directory / "data", "wb") as f:
+            # מקצים את כל הקובץ מראש - בלי פרגמנטציה ועם כישלון מיידי כשאין מקום
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+        (directory / "chunks").write_bytes(bytes(count))
+        self._write_meta(directory, meta)
+        upload = _Upload(upload_id, directory, meta, bytearray(count))
+        with self._lock:
+            self._uploads[upload_id] = upload
+        return upload_id
+
+    def _write_meta(self, directory, meta):
+        tmp = directory / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, directory / "meta.json")
+
+    def _get(self, upload_id):
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                return upload
+            # אחרי הפעלה מחדש - טוענים את המצב מהדיסק
+            if not upload_id.isalnum():
+                raise UploadNotFound(upload_id)
+            directory = self.root / upload_id
+            try:
+                meta = json.loads((directory / "meta.json").read_text())
+                chunks = bytearray((directory / "chunks").read_bytes()) if meta["result"] is None else bytearray()
+            except (FileNotFoundError, ValueError):
+                raise UploadNotFound(upload_id) from None
+            upload = self._uploads[upload_id] = _Upload(upload_id, directory, meta, chunks)
+            return upload
+
+    def status(self, upload_id):
+        upload = self._get(upload_id)
+        meta = upload.meta
+        done = meta["result"] is not None
+        return {
+            "size": meta["size"],
+            "chunk_size": meta["chunk_size"],
+            "offset": meta["size"] if done else upload.contiguous(),
+            "missing": [] if done else upload.missing(),
+            "complete": done,
+            "result": meta["result"],
+            "error": meta["error"],
+        }
+
+    def write_chunk(self, upload_id, offset, stream, length):
+        """Copy `length` bytes from `stream` to `offset`; returns the status.
+
+        Once the last missing chunk lands, the upload is finalized in this
+        call and the status carries `on_complete`'s result.
+        """
+        upload = self._get(upload_id)
+        if upload.meta["result"] is not None:
+            return self.status(upload_id)
+        if offset % upload.chunk_size or not 0 <= offset < upload.size:
+            raise InvalidChunk(f"offset {offset} is not a chunk boundary")
+        index = offset // upload.chunk_size
+        if length != upload.chunk_length(index):
+            raise InvalidChunk(f"chunk {index} must be {upload.chunk_length(index)} bytes, got {length}")
+
+        if upload.chunks[index]:
+            # חלק שכבר נשמר (וייתכן שכבר גובב) לא נכתב שוב - רק מרוקנים את הבקשה
+            self._drain(stream, length)
+            return self.status(upload_id)
+        try:
+            fd = os.open(upload.dir / "data", os.O_WRONLY)
+        except FileNotFoundError:
+            raise UploadNotFound(upload_id) from None
+        try:
+            buffer = bytearray(min(READ_BUFFER_SIZE, length))
+            view = memoryview(buffer)
+            written = 0
+            while written < length:
+                n = stream.readinto(view[:min(len(buffer), length - written)])
+                if not n:
+                    raise ConnectionResetError(f"connection closed after {written} of {length} bytes")
+                # pwrite לא משנה את מיקום הקובץ, כך שחלקים מקבילים לא מפריעים זה לזה
+                os.pwrite(fd, view[:n], offset + written)
+                written += n
+            if hasattr(os, "fdatasync"):
+                os.fdatasync(fd)
+            else:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        with upload.lock:
+            upload.chunks[index] = 1
+            with open(upload.dir / "chunks", "r+b") as f:
+                os.pwrite(f.fileno(), b"\x01", index)
+            complete = upload.chunks.find(0) == -1 and not upload.finalizing
+            if complete:
+                upload.finalizing = True
+        if upload.hash_lock.acquire(blocking=False):
+            try:
+                self._advance_hash(upload)
+            finally:
+                upload.hash_lock.release()
+        if complete:
+            self._finalize(upload)
+        return self.status(upload_id)
+
+    def _drain(self, stream, length):
+        buffer = bytearray(min(READ_BUFFER_SIZE, length))
+        while length > 0:
+            n = stream.readinto(memoryview(buffer)[:min(len(buffer), length)])
+            if not n:
+                return
+            length -= n
+
+    def _advance_hash(self, upload):
+        # מגבבים את הרצף מההתחלה כל עוד הוא גדל - הקריאה חוזרת מה-page cache
+        if upload.hashed >= len(upload.chunks) or not upload.chunks[upload.hashed]:
+            return
+        with open(upload.dir / "data", "rb", buffering=0) as f:
+            while upload.hashed < len(upload.chunks) and upload.chunks[upload.hashed]:
+                start = upload.hashed * upload.chunk_size
+                end = start + upload.chunk_length(upload.hashed)
+                while start < end:
+                    data = os.pread(f.fileno(), min(READ_BUFFER_SIZE, end - start), start)
+                    if not data:
+                        raise OSError("upload data is shorter than expected")
+                    upload.hasher.update(data)
+                    start += len(data)
+                upload.hashed += 1
+
+    def _finalize(self, upload):
+        with upload.hash_lock:
+            self._advance_hash(upload)
+        sha256 = upload.hasher.hexdigest()
+        try:
+            result = self.on_complete(upload.dir / "data", sha256, upload.size, upload.meta)
+        except Exception as e:
+            logger.exception("finishing upload %s failed", upload.id)
+            upload.meta["error"] = str(e)
+            upload.finalizing = False
+            self._write_meta(upload.dir, upload.meta)
+            raise
+        upload.meta["result"] = result
+        upload.meta["error"] = None
+        self._write_meta(upload.dir, upload.meta)
+        for name in ("data", "chunks"):
+            (upload.dir / name).unlink(missing_ok=True)
+        upload.chunks = bytearray()
+
+    def retry(self, upload_id):
+        """Run `on_complete` again for a fully received upload whose first attempt failed."""
+        upload = self._get(upload_id)
+        with upload.lock:
+            ready = upload.meta["result"] is None and upload.chunks.find(0) == -1 and not upload.finalizing
+            if ready:
+                upload.finalizing = True
+        if ready:
+            self._finalize(upload)
+        return self.status(upload_id)
+
+    def cancel(self, upload_id):
+        upload = self._get(upload_id)
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        shutil.rmtree(upload.dir, ignore_errors=True)
+
+    def purge_expired(self):
+        """Delete uploads (finished or not) older than the TTL; returns how many."""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for directory in self.root.iterdir():
+            try:
+                created_at = json.loads((directory / "meta.json").read_text())["created_at"]
+            except (OSError, ValueError, KeyError):
+                # תיקייה בלי meta (יצירה שנקטעה) - לפי זמן השינוי
+                created_at = directory.stat().st_mtime if directory.exists() else time.time()
+            if created_at < cutoff:
+                try:
+                    self.cancel(directory.name)
+                except UploadNotFound:
+                    shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        return removed
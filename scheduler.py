@@ -0,0 +1,58 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# ======================
+# Background Tasks
+# ======================
+class PeriodicTask:
+    """Runs a callable on a daemon thread every `interval` seconds.
+
+    Exceptions are logged and swallowed so one bad run does not stop the
+    schedule. With `run_at_start` the first run happens right away instead
+    of after one interval. `stop()` wakes the thread immediately and, when
+    `run_on_stop` is set, gives the task one last run (used for flushing on
+    shutdown).
+    """
+
+    def __init__(self, name, func, interval, run_at_start=False, run_on_stop=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.run_at_start = run_at_start
+        self.run_on_stop = run_on_stop
+        self.runs = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"kozy-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run_once(self):
+        try:
+            self.func()
+        except Exception:
+            self.failures += 1
+            logger.exception("background task %s failed", self.name)
+        finally:
+            self.runs += 1
+
+    def _loop(self):
+        if self.run_at_start:
+            self._run_once()
+        while not self._stop.wait(self.interval):
+            self._run_once()
+        if self.run_on_stop:
+            self._run_once()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
@@ -0,0 +1,266 @@
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+UPLOAD_CONCURRENCY = 8
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+# ======================
+# Streaming Ingest
+# ======================
+def ingest_stream(src, dest_path, max_bytes=None, chunk_size=CHUNK_SIZE):
+    """Copy a readable binary stream to `dest_path` in fixed-size chunks.
+
+    The bytes land in a temp file next to the destination and are renamed
+    into place only once complete, so readers never see a partial video.
+    Returns (sha256 hex digest, byte count). Raises UploadTooLarge as soon
+    as more than `max_bytes` have been read.
+    """
+    dest_path = Path(dest_path)
+    if hasattr(src, "seek") and (not hasattr(src, "seekable") or src.seekable()):
+        src.seek(0)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=dest_path.parent, prefix=".ingest-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(f"upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_name, dest_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return digest.hexdigest(), size
+
+
+# ======================
+# Storage Backends
+# ======================
+class LocalBackend:
+    """Objects as plain files under `root`; keys are relative paths."""
+
+    remote = False
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def local_path(self, key):
+        return self.root / key
+
+    def put(self, key, src_path):
+        """Move `src_path` into place. The source is consumed."""
+        target = self.local_path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src_path, target)
+
+    def stat(self, key):
+        try:
+            st = os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return {"size": st.st_size, "mtime": st.st_mtime}
+
+    def delete(self, key):
+        self.local_path(key).unlink(missing_ok=True)
+
+    def url(self, key, expires):
+        return None
+
+
+class S3Backend:
+    """Objects in an S3-compatible bucket (AWS, MinIO, R2, ...).
+
+    Large files go up as a parallel multipart upload through boto3's
+    transfer manager. Reads never pass through the app: `url()` hands out
+    presigned links, so browsers and ffmpeg make their own range requests
+    straight to the bucket. boto3 is only needed when this backend is
+    selected.
+    """
+
+    remote = True
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, region=None,
+                 multipart_threshold=MULTIPART_THRESHOLD, multipart_chunk_size=MULTIPART_CHUNK_SIZE,
+                 max_concurrency=UPLOAD_CONCURRENCY):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("S3 storage requires boto3 (pip install boto3)") from e
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunk_size,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        self._client_error = ClientError
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def local_path(self, key):
+        return None
+
+    def put(self, key, src_path):
+        """Upload `src_path`; the source is left for the caller to remove."""
+        self.client.upload_file(str(src_path), self.bucket, self._key(key), Config=self.transfer_config)
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": head["ContentLength"], "mtime": head["LastModified"].timestamp(), "etag": head.get("ETag")}
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def url(self, key, expires):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=max(int(expires - time.time()), 1),
+        )
+
+
+def backend_from_env(root, environ=os.environ):
+    """Build the backend selected by KOZY_STORAGE (`local` or `s3`)."""
+    kind = environ.get("KOZY_STORAGE", "local")
+    if kind == "local":
+        return LocalBackend(root)
+    if kind == "s3":
+        return S3Backend(
+            environ["KOZY_S3_BUCKET"],
+            prefix=environ.get("KOZY_S3_PREFIX", ""),
+            endpoint_url=environ.get("KOZY_S3_ENDPOINT_URL"),
+            region=environ.get("KOZY_S3_REGION"),
+            multipart_threshold=int(environ.get("KOZY_S3_MULTIPART_MB", MULTIPART_THRESHOLD // (1024 * 1024))) * 1024 * 1024,
+            max_concurrency=int(environ.get("KOZY_S3_UPLOAD_CONCURRENCY", UPLOAD_CONCURRENCY)),
+        )
+    raise ValueError(f"unknown storage backend: {kind}")
+
+
+# ======================
+# Content-Addressed Blobs
+# ======================
+class BlobStore:
+    """Deduplicated video storage keyed by SHA-256.
+
+    Blob objects live at `blobs/<aa>/<sha256><suffix>` in the storage
+    backend and are reference counted in the `blobs` table, so identical
+    uploads share one object. Uploads are first ingested into a local
+    incoming directory under `root` to hash them. `add` and `release` take
+    an open connection and must run inside the caller's write transaction;
+    with a remote backend, call `stage` first so the upload itself happens
+    before the write lock is taken. `release` only updates the table and
+    returns the key to `delete` after commit, so a rollback never leaves a
+    row without its object and no network call runs under the lock. Every
+    new blob gets a fresh key, which makes that late delete safe even when
+    the same content is uploaded again in between.
+    """
+
+    def __init__(self, root, backend=None):
+        self.root = Path(root)
+        self.backend = backend or LocalBackend(self.root)
+        self.incoming = self.root / "blobs" / ".incoming"
+        self.incoming.mkdir(parents=True, exist_ok=True)
+
+    def relative_name(self, sha256, suffix):
+        return f"blobs/{sha256[:2]}/{sha256}-{uuid.uuid4().hex[:12]}{suffix.lower()}"
+
+    def path(self, filename):
+        """Local file for `filename`, or None when the backend is remote."""
+        return self.backend.local_path(filename)
+
+    def exists(self, filename):
+        return self.backend.stat(filename) is not None
+
+    def source(self, filename, expires):
+        """Something ffmpeg can read: a local path or a presigned URL."""
+        return self.backend.local_path(filename) or self.backend.url(filename, expires)
+
+    def url(self, filename, expires):
+        return self.backend.url(filename, expires)
+
+    def ingest(self, src, max_bytes=None):
+        incoming_path = self.incoming / uuid.uuid4().hex
+        sha256, size = ingest_stream(src, incoming_path, max_bytes=max_bytes)
+        return incoming_path, sha256, size
+
+    def known(self, conn, sha256):
+        return conn.execute('SELECT 1 FROM blobs WHERE sha256 = ?', (sha256,)).fetchone() is not None
+
+    def stage(self, incoming_path, sha256, suffix=""):
+        """Upload a new blob to a remote backend ahead of `add`; returns its key or None.
+
+        Skip it when the blob is already `known`; if that blob is released
+        before `add`, `add` uploads under the lock instead.
+        """
+        if not self.backend.remote:
+            return None
+        filename = self.relative_name(sha256, suffix)
+        self.backend.put(filename, incoming_path)
+        return filename
+
+    def add(self, conn, incoming_path, sha256, size, suffix="", staged=None):
+        """Adopt an ingested (or staged) file, or reuse the blob that already exists.
+
+        When a concurrent upload of the same content won, the returned key
+        differs from `staged`, and the caller deletes `staged` after commit.
+        """
+        filename = staged or self.relative_name(sha256, suffix)
+        # ה-upsert הוא פקודת הכתיבה הראשונה, כך שנעילת הכתיבה נלקחת לפני הבדיקה
+        conn.execute('''
+            INSERT INTO blobs (sha256, filename, size_bytes, refcount) VALUES (?, ?, ?, 1)
+            ON CONFLICT (sha256) DO UPDATE SET refcount = refcount + 1
+        ''', (sha256, filename, size))
+        row = conn.execute('SELECT filename FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+        if row['filename'] == filename and not staged:
+            # blob חדש שלא הועלה מראש - מקומי, או שה-blob שראה stage שוחרר בינתיים
+            self.backend.put(filename, incoming_path)
+        Path(incoming_path).unlink(missing_ok=True)
+        return row['filename']
+
+    def release(self, conn, filename):
+        """Drop one reference; returns the key to `delete` after commit, or None while still shared."""
+        cur = conn.execute('UPDATE blobs SET refcount = refcount - 1 WHERE filename = ?', (filename,))
+        if cur.rowcount == 0:
+            # קבצים מלפני מאגר ה-blobs - שייכים לפרויקט אחד בלבד
+            return filename
+        row = conn.execute('SELECT sha256, refcount FROM blobs WHERE filename = ?', (filename,)).fetchone()
+        if row['refcount'] > 0:
+            return None
+        conn.execute('DELETE FROM blobs WHERE sha256 = ?', (row['sha256'],))
+        return filename
+
+    def delete(self, filename):
+        self.backend.delete(filename)
@@ -0,0 +1,179 @@
+"""Round-trip check of the S3 storage backend against a real bucket.
+
+    KOZY_STORAGE=s3 KOZY_S3_BUCKET=kozy KOZY_S3_ENDPOINT_URL=http://127.0.0.1:9000 \\
+    AWS_ACCESS_KEY_ID=... AWS_SECRET_ACCESS_KEY=... python storagecheck.py --create-bucket
+
+Meant for a local S3-compatible stand-in (MinIO, or `moto_server`), but
+works against any bucket: every object goes under a fresh
+`storagecheck-<id>/` prefix and is deleted again. Covers the single-object
+and multipart upload paths, stat() on missing keys, presigned ranged
+reads, and the BlobStore stage/add/release/delete cycle on a throw-away
+SQLite database, including a rolled-back release. Exits non-zero when a
+check fails; without KOZY_STORAGE=s3 it does nothing.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+import db
+from storage import BlobStore, S3Backend
+
+# הגודל המינימלי של חלק ב-multipart של S3 הוא 5MB
+PART_SIZE = 5 * 1024 * 1024
+
+
+class Checks:
+    def __init__(self):
+        self.failed = 0
+
+    def __call__(self, name, ok, detail=""):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}{f' ({detail})' if detail and not ok else ''}")
+        if not ok:
+            self.failed += 1
+
+
+def make_backend(environ, prefix):
+    return S3Backend(
+        environ["KOZY_S3_BUCKET"],
+        prefix=prefix,
+        endpoint_url=environ.get("KOZY_S3_ENDPOINT_URL"),
+        region=environ.get("KOZY_S3_REGION"),
+        multipart_threshold=PART_SIZE,
+        multipart_chunk_size=PART_SIZE,
+    )
+
+
+def write_file(path, size):
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+
+
+def ranged_get(url, start, end):
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-{end}"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status, response.read()
+
+
+# ======================
+# Checks
+# ======================
+def check_backend(check, backend, workdir):
+    check("stat on a missing key returns None", backend.stat(f"missing/{uuid.uuid4().hex}") is None)
+
+    small = workdir / "small.bin"
+    write_file(small, 256 * 1024)
+    backend.put("objects/small.bin", small)
+    stat = backend.stat("objects/small.bin")
+    check("single-object put", stat is not None and stat["size"] == 256 * 1024, stat)
+    check("put leaves the source file", small.exists())
+
+    large = workdir / "large.bin"
+    write_file(large, 2 * PART_SIZE + 1024)
+    backend.put("objects/large.bin", large)
+    stat = backend.stat("objects/large.bin")
+    # ETag של העלאת multipart מסתיים ב-"-<מספר חלקים>"
+    check("multipart put", stat is not None and stat["size"] == 2 * PART_SIZE + 1024
+          and str(stat.get("etag", "")).strip('"').endswith("-3"), stat)
+
+    status, body = ranged_get(backend.url("objects/large.bin", time.time() + 300), PART_SIZE - 10, PART_SIZE + 9)
+    with open(large, "rb") as f:
+        f.seek(PART_SIZE - 10)
+        expected = f.read(20)
+    check("presigned ranged GET", status == 206 and body == expected, status)
+
+    for key in ("objects/small.bin", "objects/large.bin"):
+        backend.delete(key)
+    check("delete removes the objects", backend.stat("objects/small.bin") is None and backend.stat("objects/large.bin") is None)
+    backend.delete("objects/small.bin")
+    check("deleting a missing key is a no-op", True)
+
+
+def check_blob_store(check, backend, workdir):
+    conn = sqlite3.connect(workdir / "check.db", isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    db.migrate(conn)
+    blobs = BlobStore(workdir / "uploads", backend=backend)
+
+    def ingest(data):
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            return blobs.ingest(f)
+
+    data = os.urandom(64 * 1024)
+    path, sha256, size = ingest(data)
+    staged = blobs.stage(path, sha256, ".MP4")
+    check("stage uploads before the transaction", staged is not None and blobs.exists(staged), staged)
+    conn.execute("BEGIN IMMEDIATE")
+    first = blobs.add(conn, path, sha256, size, ".mp4", staged=staged)
+    conn.execute("COMMIT")
+    check("add adopts the staged key", first == staged and not path.exists())
+
+    path, sha256, size = ingest(data)
+    check("known detects the duplicate", blobs.known(conn, sha256))
+    conn.execute("BEGIN IMMEDIATE")
+    second = blobs.add(conn, path, sha256, size, ".mp4")
+    conn.execute("COMMIT")
+    refcount = conn.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()[0]
+    check("duplicate shares the object", second == first and refcount == 2, refcount)
+
+    conn.execute("BEGIN IMMEDIATE")
+    check("release keeps a shared blob", blobs.release(conn, first) is None)
+    conn.execute("COMMIT")
+
+    conn.execute("BEGIN IMMEDIATE")
+    released = blobs.release(conn, first)
+    conn.execute("ROLLBACK")
+    row = conn.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+    check("rolled-back release keeps row and object", released == first and row is not None and blobs.exists(first))
+
+    conn.execute("BEGIN IMMEDIATE")
+    released = blobs.release(conn, first)
+    conn.execute("COMMIT")
+    check("last release returns the key, object still there", released == first and blobs.exists(first))
+    blobs.delete(released)
+    check("delete after commit removes the object", not blobs.exists(first))
+
+    path, sha256, size = ingest(data)
+    staged = blobs.stage(path, sha256, ".mp4")
+    conn.execute("BEGIN IMMEDIATE")
+    third = blobs.add(conn, path, sha256, size, ".mp4", staged=staged)
+    conn.execute("COMMIT")
+    check("re-upload gets a new key", third != first and blobs.exists(third))
+    conn.execute("BEGIN IMMEDIATE")
+    blobs.delete(blobs.release(conn, third))
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--create-bucket", action="store_true", help="create KOZY_S3_BUCKET first if it is missing")
+    args = parser.parse_args(argv)
+
+    if os.environ.get("KOZY_STORAGE") != "s3" or not os.environ.get("KOZY_S3_BUCKET"):
+        print("set KOZY_STORAGE=s3 and KOZY_S3_BUCKET (plus KOZY_S3_ENDPOINT_URL for MinIO/moto) to run", file=sys.stderr)
+        return 2
+    prefix = f"{os.environ.get('KOZY_S3_PREFIX', '').strip('/')}/storagecheck-{uuid.uuid4().hex[:8]}".lstrip("/")
+    backend = make_backend(os.environ, prefix)
+    if args.create_bucket:
+        try:
+            backend.client.head_bucket(Bucket=backend.bucket)
+        except backend._client_error:
+            backend.client.create_bucket(Bucket=backend.bucket)
+
+    check = Checks()
+    with tempfile.TemporaryDirectory(prefix="kozy-storagecheck-") as workdir:
+        check_backend(check, backend, Path(workdir))
+        check_blob_store(check, backend, Path(workdir))
+    print(f"\n{check.failed} failed" if check.failed else "\nall checks passed")
+    return 1 if check.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
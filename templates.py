@@ -0,0 +1,978 @@
+import hashlib
+import html
+import json
+import threading
+from collections import OrderedDict
+from string import Template
+
+# תמונות
+LOGO_URL = "https://i.postimg.cc/7LMZ1dLJ/קוזי.png"
+MASCOT_URL = "https://i.postimg.cc/fbjR7pb0/רועי.png"
+BG_IMAGE_URL = "https://i.postimg.cc/pTGtWyzv/Whats-App-Image-2026-01-21-at-01-16-53.jpg"
+
+
+# ======================
+# עיצוב - Design System
+# ======================
+
+# צבעים - פלטה מינימליסטית ומקצועית
+COLORS = {
+    # Primary - כחול-סגול עמוק ומקצועי
+    "primary": "#6C5CE7",
+    "primary_light": "#A29BFE",
+    "primary_dark": "#5541D7",
+    
+    # Neutral - גווני אפור
+    "bg_dark": "#0D0D12",
+    "bg_card": "#16161D",
+    "bg_elevated": "#1E1E28",
+    "border": "#2A2A36",
+    "text_primary": "#FFFFFF",
+    "text_secondary": "#9CA3AF",
+    "text_muted": "#6B7280",
+    
+    # Accent
+    "success": "#10B981",
+    "warning": "#F59E0B",
+    "error": "#EF4444",
+    "info": "#3B82F6",
+}
+
+# קטגוריות - צבעים מותאמים
+CATEGORIES = {
+    "video": {"label": "וידאו", "icon": "🎬", "color": "#818CF8"},
+    "image": {"label": "תמונה", "icon": "🖼️", "color": "#C084FC"},
+    "effect": {"label": "אפקט", "icon": "✨", "color": "#FBBF24"},
+    "subtitles": {"label": "כתוביות", "icon": "💬", "color": "#34D399"},
+    "transition": {"label": "מעבר", "icon": "🔄", "color": "#FB923C"},
+    "music": {"label": "מוזיקה", "icon": "🎵", "color": "#F472B6"},
+    "sound": {"label": "סאונד", "icon": "🔊", "color": "#60A5FA"},
+    "ai": {"label": "AI", "icon": "🤖", "color": "#22D3EE"},
+    "bug": {"label": "באג", "icon": "🐛", "color": "#F87171"},
+}
+
+PRIORITIES = {
+    "low": {"label": "נמוכה", "color": "#10B981", "bg": "rgba(16, 185, 129, 0.15)"},
+    "medium": {"label": "בינונית", "color": "#F59E0B", "bg": "rgba(245, 158, 11, 0.15)"},
+    "high": {"label": "גבוהה", "color": "#EF4444", "bg": "rgba(239, 68, 68, 0.15)"},
+}
+
+
+# ======================
+# Stylesheet - compiled once at import
+# ======================
+STYLESHEET_SOURCE = Template("""    /* ===== RESET & BASE ===== */
+    @import url('https://fonts.googleapis.com/css2?family=Heebo:wght@300;400;500;600;700;800;900&display=swap');
+    
+    * {
+        font-family: 'Heebo', -apple-system, BlinkMacSystemFont, sans-serif !important;
+        box-sizing: border-box;
+    }
+    
+    /* Main app container with background */
+    .stApp {
+        direction: rtl;
+        background-color: #0a0a0f;
+        background-image: url('${bg_image_url}');
+        background-size: cover;
+        background-position: center;
+        background-repeat: no-repeat;
+        background-attachment: fixed;
+    }
+    
+    /* Dark overlay for 45% opacity effect */
+    .stApp > div:first-child {
+        background: rgba(10, 10, 15, 0.55);
+        min-height: 100vh;
+    }
+    
+    [data-testid="stAppViewContainer"] {
+        background: rgba(10, 10, 15, 0.55);
+    }
+    
+    [data-testid="stHeader"] {
+        background: transparent;
+    }
+    
+    /* Hide Streamlit branding */
+    #MainMenu, footer, header {visibility: hidden;}
+    .stDeployButton {display: none;}
+    
+    /* ===== TYPOGRAPHY ===== */
+    h1 {
+        font-size: 2.5rem !important;
+        font-weight: 800 !important;
+        color: #FFFFFF !important;
+        letter-spacing: -0.02em !important;
+        margin-bottom: 0.5rem !important;
+        text-shadow: 0 2px 10px rgba(0,0,0,0.5);
+    }
+    
+    h2 {
+        font-size: 1.5rem !important;
+        font-weight: 700 !important;
+        color: #FFFFFF !important;
+        letter-spacing: -0.01em !important;
+        text-shadow: 0 2px 8px rgba(0,0,0,0.4);
+    }
+    
+    h3 {
+        font-size: 1.125rem !important;
+        font-weight: 600 !important;
+        color: #FFFFFF !important;
+        text-shadow: 0 1px 6px rgba(0,0,0,0.3);
+    }
+    
+    p, span, div {
+        color: rgba(255,255,255,0.85);
+        line-height: 1.6;
+    }
+    
+    /* ===== LAYOUT ===== */
+    .block-container {
+        padding: 2rem 3rem !important;
+        max-width: 1400px !important;
+    }
+    
+    /* ===== HEADER ===== */
+    .kozy-header {
+        display: flex;
+        align-items: center;
+        justify-content: space-between;
+        padding: 1.25rem 2rem;
+        background: rgba(15, 15, 25, 0.85);
+        backdrop-filter: blur(20px);
+        -webkit-backdrop-filter: blur(20px);
+        border: 1px solid rgba(255,255,255,0.1);
+        border-radius: 16px;
+        margin-bottom: 2rem;
+        box-shadow: 0 8px 32px rgba(0,0,0,0.3);
+    }
+    
+    .kozy-logo {
+        display: flex;
+        align-items: center;
+        gap: 1rem;
+    }
+    
+    .kozy-logo img {
+        height: 48px;
+        object-fit: contain;
+    }
+    
+    .kozy-logo-text {
+        font-size: 1.5rem;
+        font-weight: 800;
+        color: #FFFFFF;
+        letter-spacing: -0.02em;
+        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
+    }
+    
+    /* ===== HERO SECTION ===== */
+    .hero {
+        text-align: center;
+        padding: 4rem 2rem;
+        margin-bottom: 2rem;
+        background: rgba(15, 15, 25, 0.6);
+        backdrop-filter: blur(10px);
+        -webkit-backdrop-filter: blur(10px);
+        border-radius: 24px;
+        border: 1px solid rgba(255,255,255,0.08);
+    }
+    
+    .hero-title {
+        font-size: 3rem;
+        font-weight: 900;
+        color: #FFFFFF;
+        margin-bottom: 1rem;
+        letter-spacing: -0.03em;
+        text-shadow: 0 4px 20px rgba(0,0,0,0.5);
+    }
+    
+    .hero-subtitle {
+        font-size: 1.25rem;
+        color: rgba(255,255,255,0.75);
+        max-width: 500px;
+        margin: 0 auto;
+        line-height: 1.7;
+    }
+    
+    /* ===== CARDS - Glass Morphism ===== */
+    .card {
+        background: rgba(15, 15, 25, 0.75);
+        backdrop-filter: blur(16px);
+        -webkit-backdrop-filter: blur(16px);
+        border: 1px solid rgba(255,255,255,0.1);
+        border-radius: 16px;
+        padding: 1.5rem;
+        transition: all 0.3s ease;
+        box-shadow: 0 8px 32px rgba(0,0,0,0.2);
+    }
+    
+    .card:hover {
+        border-color: rgba(108, 92, 231, 0.5);
+        box-shadow: 0 12px 40px rgba(108, 92, 231, 0.15);
+        transform: translateY(-2px);
+    }
+    
+    .card-elevated {
+        background: rgba(20, 20, 35, 0.8);
+        backdrop-filter: blur(20px);
+        -webkit-backdrop-filter: blur(20px);
+        border: 1px solid rgba(255,255,255,0.1);
+        border-radius: 20px;
+        padding: 2rem;
+        box-shadow: 0 12px 40px rgba(0,0,0,0.25);
+    }
+    
+    /* ===== VIDEO CONTAINER ===== */
+    .video-wrapper {
+        background: #000;
+        border-radius: 16px;
+        overflow: hidden;
+        box-shadow: 0 25px 60px -12px rgba(0, 0, 0, 0.6);
+        margin-bottom: 1.5rem;
+        border: 1px solid rgba(255,255,255,0.1);
+    }
+    
+    .video-wrapper video {
+        width: 100%;
+        display: block;
+    }
+    
+    /* ===== TIMER ===== */
+    .timer {
+        background: rgba(20, 20, 35, 0.85);
+        backdrop-filter: blur(16px);
+        -webkit-backdrop-filter: blur(16px);
+        border: 1px solid rgba(255,255,255,0.1);
+        border-radius: 16px;
+        padding: 1.5rem;
+        text-align: center;
+        box-shadow: 0 8px 32px rgba(0,0,0,0.2);
+    }
+    
+    .timer-label {
+        font-size: 0.75rem;
+        font-weight: 600;
+        color: rgba(255,255,255,0.5);
+        text-transform: uppercase;
+        letter-spacing: 0.05em;
+        margin-bottom: 0.5rem;
+    }
+    
+    .timer-value {
+        font-size: 1.75rem;
+        font-weight: 800;
+        color: ${warning};
+        text-shadow: 0 2px 10px rgba(245, 158, 11, 0.3);
+    }
+    
+    .timer-urgent .timer-value {
+        color: ${error};
+        animation: pulse 1.5s ease-in-out infinite;
+        text-shadow: 0 2px 10px rgba(239, 68, 68, 0.4);
+    }
+    
+    @keyframes pulse {
+        0%, 100% { opacity: 1; }
+        50% { opacity: 0.6; }
+    }
+    
+    /* ===== STATS ===== */
+    .stat-grid {
+        display: grid;
+        grid-template-columns: repeat(3, 1fr);
+        gap: 1rem;
+        margin-bottom: 1.5rem;
+    }
+    
+    .stat-item {
+        background: rgba(20, 20, 35, 0.8);
+        backdrop-filter: blur(12px);
+        -webkit-backdrop-filter: blur(12px);
+        border: 1px solid rgba(255,255,255,0.1);
+        border-radius: 12px;
+        padding: 1rem;
+        text-align: center;
+        box-shadow: 0 4px 16px rgba(0,0,0,0.15);
+    }
+    
+    .stat-value {
+        font-size: 2rem;
+        font-weight: 800;
+        color: #FFFFFF;
+        line-height: 1;
+        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
+    }
+    
+    .stat-label {
+        font-size: 0.75rem;
+        font-weight: 500;
+        color: rgba(255,255,255,0.5);
+        margin-top: 0.25rem;
+    }
+    
+    /* ===== LINK BOX ===== */
+    .link-box {
+        background: rgba(108, 92, 231, 0.15);
+        backdrop-filter: blur(12px);
+        -webkit-backdrop-filter: blur(12px);
+        border: 1px dashed rgba(108, 92, 231, 0.5);
+        border-radius: 12px;
+        padding: 1.25rem;
+        text-align: center;
+    }
+    
+    .link-box-label {
+        font-size: 0.75rem;
+        font-weight: 600;
+        color: rgba(255,255,255,0.6);
+        margin-bottom: 0.75rem;
+    }
+    
+    .link-box-url {
+        background: rgba(0,0,0,0.4);
+        color: ${primary_light};
+        padding: 0.75rem 1rem;
+        border-radius: 8px;
+        font-size: 0.875rem;
+        font-family: 'Monaco', monospace !important;
+        word-break: break-all;
+        display: block;
+    }
+    
+    /* ===== COMMENTS ===== */
+    .comment {
+        background: rgba(20, 20, 35, 0.75);
+        backdrop-filter: blur(12px);
+        -webkit-backdrop-filter: blur(12px);
+        border: 1px solid rgba(255,255,255,0.08);
+        border-radius: 12px;
+        padding: 1.25rem;
+        margin-bottom: 1rem;
+        border-right: 3px solid ${primary};
+        transition: all 0.3s ease;
+        box-shadow: 0 4px 20px rgba(0,0,0,0.15);
+    }
+    
+    .comment:hover {
+        background: rgba(25, 25, 45, 0.85);
+        border-color: rgba(255,255,255,0.15);
+        transform: translateX(-4px);
+    }
+    
+    .comment.resolved {
+        opacity: 0.5;
+        border-right-color: rgba(255,255,255,0.2);
+    }
+    
+    .comment-header {
+        display: flex;
+        align-items: center;
+        gap: 0.75rem;
+        flex-wrap: wrap;
+        margin-bottom: 0.75rem;
+    }
+    
+    .comment-time {
+        background: linear-gradient(135deg, ${primary} 0%, ${primary_dark} 100%);
+        color: white;
+        padding: 0.25rem 0.75rem;
+        border-radius: 6px;
+        font-size: 0.8125rem;
+        font-weight: 600;
+        font-family: 'Monaco', monospace !important;
+        box-shadow: 0 2px 8px rgba(108, 92, 231, 0.3);
+    }
+    
+    .comment-thumb {
+        display: inline-block;
+        flex-shrink: 0;
+        border-radius: 6px;
+        border: 1px solid rgba(255,255,255,0.12);
+        background-repeat: no-repeat;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+    }
+    
+    .comment-tag {
+        padding: 0.25rem 0.625rem;
+        border-radius: 6px;
+        font-size: 0.75rem;
+        font-weight: 600;
+        backdrop-filter: blur(8px);
+    }
+    
+    .comment-text {
+        color: #FFFFFF;
+        font-size: 0.9375rem;
+        line-height: 1.6;
+        margin-bottom: 0.75rem;
+    }
+    
+    .comment mark {
+        background: ${primary}66;
+        color: #FFFFFF;
+        border-radius: 3px;
+        padding: 0 0.125rem;
+    }
+    
+    .comment-meta {
+        font-size: 0.75rem;
+        color: rgba(255,255,255,0.5);
+    }
+    
+    /* ===== WELCOME BOX (Client) ===== */
+    .welcome {
+        background: rgba(108, 92, 231, 0.12);
+        backdrop-filter: blur(16px);
+        -webkit-backdrop-filter: blur(16px);
+        border: 1px solid rgba(108, 92, 231, 0.25);
+        border-radius: 16px;
+        padding: 1.5rem 2rem;
+        text-align: center;
+        margin-bottom: 2rem;
+        box-shadow: 0 8px 32px rgba(108, 92, 231, 0.1);
+    }
+    
+    .welcome-text {
+        font-size: 1.125rem;
+        font-weight: 600;
+        color: #FFFFFF;
+        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
+    }
+    
+    .welcome-subtext {
+        font-size: 0.875rem;
+        color: rgba(255,255,255,0.7);
+        margin-top: 0.5rem;
+    }
+    
+    /* ===== FORM INPUTS ===== */
+    .stTextInput > div > div > input,
+    .stTextArea > div > div > textarea {
+        background: rgba(20, 20, 35, 0.8) !important;
+        backdrop-filter: blur(12px) !important;
+        border: 1px solid rgba(255,255,255,0.12) !important;
+        border-radius: 10px !important;
+        color: #FFFFFF !important;
+        font-size: 0.9375rem !important;
+        padding: 0.75rem 1rem !important;
+    }
+    
+    .stTextInput > div > div > input:focus,
+    .stTextArea > div > div > textarea:focus {
+        border-color: ${primary} !important;
+        box-shadow: 0 0 0 3px rgba(108, 92, 231, 0.2) !important;
+    }
+    
+    .stTextInput > div > div > input::placeholder,
+    .stTextArea > div > div > textarea::placeholder {
+        color: rgba(255,255,255,0.4) !important;
+    }
+    
+    .stSelectbox > div > div {
+        background: rgba(20, 20, 35, 0.8) !important;
+        border: 1px solid rgba(255,255,255,0.12) !important;
+        border-radius: 10px !important;
+    }
+    
+    .stSelectbox > div > div > div {
+        color: #FFFFFF !important;
+    }
+    
+    .stNumberInput > div > div > input {
+        background: rgba(20, 20, 35, 0.8) !important;
+        border: 1px solid rgba(255,255,255,0.12) !important;
+        border-radius: 10px !important;
+        color: #FFFFFF !important;
+    }
+    
+    /* Labels */
+    .stTextInput > label,
+    .stTextArea > label,
+    .stSelectbox > label,
+    .stNumberInput > label {
+        color: rgba(255,255,255,0.75) !important;
+        font-weight: 500 !important;
+        font-size: 0.875rem !important;
+        margin-bottom: 0.5rem !important;
+    }
+    
+    /* ===== BUTTONS ===== */
+    .stButton > button {
+        background: linear-gradient(135deg, ${primary} 0%, ${primary_dark} 100%) !important;
+        color: white !important;
+        border: none !important;
+        border-radius: 10px !important;
+        padding: 0.75rem 1.5rem !important;
+        font-weight: 600 !important;
+        font-size: 0.9375rem !important;
+        transition: all 0.3s ease !important;
+        box-shadow: 0 4px 20px rgba(108, 92, 231, 0.4) !important;
+    }
+    
+    .stButton > button:hover {
+        transform: translateY(-3px) !important;
+        box-shadow: 0 8px 30px rgba(108, 92, 231, 0.5) !important;
+    }
+    
+    .stButton > button:active {
+        transform: translateY(0) !important;
+    }
+    
+    /* Secondary buttons */
+    .stButton > button[kind="secondary"] {
+        background: rgba(20, 20, 35, 0.7) !important;
+        backdrop-filter: blur(12px) !important;
+        border: 1px solid rgba(255,255,255,0.15) !important;
+        box-shadow: 0 4px 16px rgba(0,0,0,0.2) !important;
+    }
+    
+    .stButton > button[kind="secondary"]:hover {
+        background: rgba(30, 30, 50, 0.8) !important;
+        border-color: ${primary} !important;
+    }
+    
+    /* ===== TABS ===== */
+    .stTabs [data-baseweb="tab-list"] {
+        background: rgba(15, 15, 25, 0.8);
+        backdrop-filter: blur(16px);
+        -webkit-backdrop-filter: blur(16px);
+        border-radius: 12px;
+        padding: 0.375rem;
+        gap: 0.25rem;
+        border: 1px solid rgba(255,255,255,0.1);
+    }
+    
+    .stTabs [data-baseweb="tab"] {
+        background: transparent;
+        border-radius: 8px;
+        color: rgba(255,255,255,0.6);
+        font-weight: 500;
+        padding: 0.625rem 1.25rem;
+    }
+    
+    .stTabs [aria-selected="true"] {
+        background: linear-gradient(135deg, ${primary} 0%, ${primary_dark} 100%) !important;
+        color: white !important;
+        box-shadow: 0 4px 12px rgba(108, 92, 231, 0.3);
+    }
+    
+    /* ===== DIVIDER ===== */
+    hr {
+        border: none !important;
+        height: 1px !important;
+        background: rgba(255,255,255,0.1) !important;
+        margin: 2rem 0 !important;
+    }
+    
+    /* ===== FILE UPLOADER ===== */
+    .stFileUploader {
+        background: rgba(15, 15, 25, 0.7);
+        backdrop-filter: blur(16px);
+        -webkit-backdrop-filter: blur(16px);
+        border: 2px dashed rgba(255,255,255,0.15);
+        border-radius: 16px;
+        padding: 2rem;
+        transition: all 0.3s ease;
+    }
+    
+    .stFileUploader:hover {
+        border-color: ${primary};
+        background: rgba(108, 92, 231, 0.1);
+    }
+    
+    .stFileUploader > div {
+        color: rgba(255,255,255,0.7) !important;
+    }
+    
+    /* ===== ALERTS ===== */
+    .stSuccess {
+        background: rgba(16, 185, 129, 0.15) !important;
+        backdrop-filter: blur(12px) !important;
+        border: 1px solid rgba(16, 185, 129, 0.3) !important;
+        border-radius: 10px !important;
+    }
+    
+    .stError {
+        background: rgba(239, 68, 68, 0.15) !important;
+        backdrop-filter: blur(12px) !important;
+        border: 1px solid rgba(239, 68, 68, 0.3) !important;
+        border-radius: 10px !important;
+    }
+    
+    .stWarning {
+        background: rgba(245, 158, 11, 0.15) !important;
+        backdrop-filter: blur(12px) !important;
+        border: 1px solid rgba(245, 158, 11, 0.3) !important;
+        border-radius: 10px !important;
+    }
+    
+    .stInfo {
+        background: rgba(59, 130, 246, 0.15) !important;
+        backdrop-filter: blur(12px) !important;
+        border: 1px solid rgba(59, 130, 246, 0.3) !important;
+        border-radius: 10px !important;
+    }
+    
+    /* ===== EXPANDER ===== */
+    .streamlit-expanderHeader {
+        background: rgba(20, 20, 35, 0.8) !important;
+        backdrop-filter: blur(12px) !important;
+        border-radius: 10px !important;
+        color: #FFFFFF !important;
+        font-weight: 500 !important;
+    }
+    
+    /* ===== MASCOT ===== */
+    .mascot {
+        position: fixed;
+        bottom: 24px;
+        left: 24px;
+        z-index: 9999;
+        transition: transform 0.3s ease;
+    }
+    
+    .mascot:hover {
+        transform: scale(1.1) translateY(-6px);
+    }
+    
+    .mascot img {
+        height: 100px;
+        filter: drop-shadow(0 12px 32px rgba(0, 0, 0, 0.5));
+        border-radius: 50%;
+    }
+    
+    /* ===== METRICS ===== */
+    [data-testid="stMetricValue"] {
+        color: #FFFFFF !important;
+        font-size: 1.75rem !important;
+        font-weight: 800 !important;
+        text-shadow: 0 2px 8px rgba(0,0,0,0.3);
+    }
+    
+    [data-testid="stMetricLabel"] {
+        color: rgba(255,255,255,0.5) !important;
+        font-size: 0.75rem !important;
+        font-weight: 600 !important;
+        text-transform: uppercase !important;
+        letter-spacing: 0.05em !important;
+    }
+    
+    /* ===== COMPLETED STATE ===== */
+    .completed-box {
+        background: rgba(16, 185, 129, 0.15);
+        backdrop-filter: blur(16px);
+        -webkit-backdrop-filter: blur(16px);
+        border: 1px solid rgba(16, 185, 129, 0.3);
+        border-radius: 16px;
+        padding: 2rem;
+        text-align: center;
+        box-shadow: 0 8px 32px rgba(16, 185, 129, 0.15);
+    }
+    
+    .completed-icon {
+        font-size: 3rem;
+        margin-bottom: 1rem;
+    }
+    
+    .completed-title {
+        font-size: 1.25rem;
+        font-weight: 700;
+        color: ${success};
+        margin-bottom: 0.5rem;
+        text-shadow: 0 2px 8px rgba(16, 185, 129, 0.3);
+    }
+    
+    .completed-text {
+        color: rgba(255,255,255,0.7);
+        font-size: 0.9375rem;
+    }
+""")
+
+STYLESHEET = STYLESHEET_SOURCE.substitute(COLORS, bg_image_url=BG_IMAGE_URL)
+STYLESHEET_HASH = hashlib.sha256(STYLESHEET.encode()).hexdigest()[:12]
+STYLESHEET_NAME = f"kozy.{STYLESHEET_HASH}.css"
+
+MASCOT_HTML = f'''<div class="mascot">
+<img src="{MASCOT_URL}" alt="Kozy">
+</div>'''
+
+INLINE_STYLESHEET = f"<style>\n{STYLESHEET}</style>\n{MASCOT_HTML}"
+
+
+def stylesheet_link(url):
+    return f'<link rel="stylesheet" href="{html.escape(url)}">\n{MASCOT_HTML}'
+
+
+# ======================
+# Fragments
+# ======================
+# תבניות בלי שורות ריקות - שורה ריקה סוגרת בלוק HTML ב-markdown
+HEADER = Template(f'''<div class="kozy-header">
+<div class="kozy-logo">
+<img src="{LOGO_URL}" alt="Kozy">
+<span class="kozy-logo-text">Kozy Review</span>
+</div>
+$title_html
+</div>''')
+
+HEADER_TITLE = Template(f'<div style="color: {COLORS["text_secondary"]}; font-size: 0.9375rem;">$title</div>')
+
+TIMER = Template('''<div class="timer $urgent_class">
+<div class="timer-label">זמן נותר</div>
+<div class="timer-value">$remaining_text</div>
+</div>''')
+
+STATS = Template(f'''<div class="stat-grid">
+<div class="stat-item">
+<div class="stat-value">$total</div>
+<div class="stat-label">הערות</div>
+</div>
+<div class="stat-item">
+<div class="stat-value" style="color: {COLORS['success']};">$resolved</div>
+<div class="stat-label">טופלו</div>
+</div>
+<div class="stat-item">
+<div class="stat-value" style="color: {COLORS['error']};">$urgent</div>
+<div class="stat-label">דחופות</div>
+</div>
+</div>''')
+
+COMMENT = Template('''<div class="comment $resolved_class" style="border-right-color: $color;">
+<div class="comment-header">$thumb_html<span class="comment-time">⏱ $time</span>$category_tag$priority_tag</div>
+<div class="comment-text">$resolved_mark$text</div>
+<div class="comment-meta">✍️ $author_name • $author_label</div>
+</div>''')
+
+THUMB = Template('<span class="comment-thumb" style="width: ${width}px; height: ${height}px; '
+                 'background-image: url(\'$url\'); background-size: ${sheet_width}px auto; '
+                 'background-position: -${x}px -${y}px;"></span>')
+
+CATEGORY_TAGS = {
+    key: f'<span class="comment-tag" style="background: {cat["color"]}22; color: {cat["color"]};">{cat["icon"]} {cat["label"]}</span>'
+    for key, cat in CATEGORIES.items()
+}
+
+PRIORITY_TAGS = {
+    key: f'<span class="comment-tag" style="background: {pri["bg"]}; color: {pri["color"]};">{pri["label"]}</span>'
+    for key, pri in PRIORITIES.items()
+}
+
+AUTHOR_LABELS = {"editor": "עורך", "client": "לקוח"}
+
+
+def format_time(seconds):
+    mins = int(seconds // 60)
+    secs = int(seconds % 60)
+    return f"{mins:02d}:{secs:02d}"
+
+
+def header_html(project_title=None):
+    title_html = HEADER_TITLE.substitute(title=html.escape(project_title)) if project_title else ''
+    return HEADER.substitute(title_html=title_html)
+
+
+def timer_html(remaining_text, urgent=False):
+    return TIMER.substitute(urgent_class="timer-urgent" if urgent else "", remaining_text=remaining_text)
+
+
+def stats_html(stats):
+    return STATS.substitute(total=stats['total'], resolved=stats['resolved'], urgent=stats['urgent'])
+
+
+def thumb_html(url, width, height, sheet_width, x, y):
+    return THUMB.substitute(url=html.escape(url), width=width, height=height, sheet_width=sheet_width, x=x, y=y)
+
+
+class FragmentCache:
+    """Bounded LRU of rendered HTML fragments shared by all sessions."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+comment_fragments = FragmentCache()
+
+
+# סימוני הדגשה של FTS5 - תווים שלא יופיעו בטקסט, מוחלפים ב-<mark> אחרי ה-escape
+HIGHLIGHT_OPEN = "\x02"
+HIGHLIGHT_CLOSE = "\x03"
+
+
+def highlighted(value):
+    return html.escape(value).replace(HIGHLIGHT_OPEN, "<mark>").replace(HIGHLIGHT_CLOSE, "</mark>")
+
+
+def comment_html(comment, thumb=''):
+    """Card HTML for one comment, memoized by (id, version, thumbnail).
+
+    Comment rows only change through writes that bump `version`, so the
+    key is enough to know the cached HTML is still right. Search results
+    carry `text_hl`/`author_hl` with FTS5 highlight markers, which are
+    rendered as <mark> and bypass the cache.
+    """
+    if 'text_hl' in comment:
+        return _build_comment(comment, thumb, highlighted(comment['text_hl']), highlighted(comment['author_hl']))
+
+    def build():
+        return _build_comment(comment, thumb, html.escape(comment['text']), html.escape(comment['author_name']))
+
+    return comment_fragments.get((comment['id'], comment.get('version', 0), thumb), build)
+
+
+def _build_comment(comment, thumb, text, author_name):
+    cat = CATEGORIES.get(comment['category'], CATEGORIES['video'])
+    return COMMENT.substitute(
+        resolved_class="resolved" if comment['resolved'] else "",
+        color=cat['color'],
+        thumb_html=thumb,
+        time=format_time(comment['timestamp_seconds']),
+        category_tag=CATEGORY_TAGS.get(comment['category'], CATEGORY_TAGS['video']),
+        priority_tag=PRIORITY_TAGS.get(comment['priority'], PRIORITY_TAGS['medium']),
+        resolved_mark="✓ " if comment['resolved'] else "",
+        text=text,
+        author_name=author_name,
+        author_label=AUTHOR_LABELS.get(comment['author_type'], AUTHOR_LABELS['client']),
+    )
+
+
+# ======================
+# Resumable Uploader
+# ======================
+# רכיב HTML עצמאי (iframe) - מעלה בחלקים מקבילים ישירות לשרת המדיה וממשיך מאיפה שנעצר
+UPLOADER = Template('''<div dir="rtl" style="font-family: system-ui, sans-serif; color: $text_primary;">
+<input id="title" placeholder="שם הפרויקט" style="width: 100%; box-sizing: border-box; margin-bottom: 8px; padding: 10px; background: $bg_elevated; color: $text_primary; border: 1px solid $border; border-radius: 8px;">
+<textarea id="description" placeholder="תיאור (אופציונלי)" rows="2" style="width: 100%; box-sizing: border-box; margin-bottom: 8px; padding: 10px; background: $bg_elevated; color: $text_primary; border: 1px solid $border; border-radius: 8px;"></textarea>
+<input id="file" type="file" accept="video/*,.mov,.mkv,.avi" style="margin-bottom: 8px; color: $text_secondary;">
+<button id="start" style="width: 100%; padding: 10px; background: $primary; color: #fff; border: 0; border-radius: 8px; cursor: pointer;">🚀 העלה וצור פרויקט</button>
+<div style="margin-top: 10px; height: 8px; background: $bg_elevated; border-radius: 4px; overflow: hidden;"><div id="bar" style="height: 100%; width: 0; background: $success;"></div></div>
+<div id="status" style="margin-top: 8px; color: $text_secondary; font-size: 0.875rem;"></div>
+<div id="links" style="display: none; margin-top: 10px;">
+<div style="color: $text_secondary; font-size: 0.8125rem;">לינק ללקוח (שתף אותו!)</div>
+<code id="client" style="display: block; padding: 8px; background: $bg_elevated; border-radius: 6px; user-select: all; direction: ltr;"></code>
+<div style="color: $text_secondary; font-size: 0.8125rem; margin-top: 8px;">🔐 לינק עריכה (שמור!)</div>
+<code id="editor" style="display: block; padding: 8px; background: $bg_elevated; border-radius: 6px; user-select: all; direction: ltr;"></code>
+</div>
+</div>
+<script>
+const CREATE_URL = $create_url, BASE_URL = $base_url, PARALLEL = $parallel, MAX_BYTES = $max_bytes;
+const el = (id) => document.getElementById(id);
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+const b64 = (text) => btoa(unescape(encodeURIComponent(text)));
+const say = (text) => { el("status").textContent = text; };
+
+async function json(response) {
+  if (!response.ok) throw new Error((await response.text()) || response.status);
+  return response.json();
+}
+
+async function sendChunk(url, file, start, end) {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await fetch(url, {
+        method: "PATCH",
+        headers: {"Upload-Offset": String(start), "Content-Type": "application/offset+octet-stream", "Tus-Resumable": "1.0.0"},
+        body: file.slice(start, end),
+      });
+      if (response.status === 200) return (await response.json()).result;
+      if (response.status === 204) return null;
+      if (response.status < 500) throw Object.assign(new Error(await response.text()), {fatal: true});
+      throw new Error("server error " + response.status);
+    } catch (error) {
+      // ניתוק רשת - מנסים שוב עם המתנה הולכת וגדלה; החלקים שכבר נשמרו לא נשלחים שוב
+      if (error.fatal || attempt >= 6) throw error;
+      say("החיבור נקטע, מנסה שוב...");
+      await sleep(1000 * 2 ** attempt);
+    }
+  }
+}
+
+async function upload() {
+  const file = el("file").files[0];
+  const title = el("title").value.trim();
+  if (!file || !title) return say("צריך שם פרויקט וקובץ");
+  if (file.size > MAX_BYTES) return say("הקובץ גדול מדי");
+  el("start").disabled = true;
+  const key = "kozy-upload:" + [file.name, file.size, file.lastModified].join(":");
+  let url = localStorage.getItem(key), status = null;
+  if (url) {
+    const response = await fetch(url);
+    if (response.ok) status = await response.json(); else url = null;
+  }
+  if (!url) {
+    const response = await fetch(CREATE_URL, {method: "POST", headers: {
+      "Upload-Length": String(file.size),
+      "Upload-Metadata": ["filename " + b64(file.name), "title " + b64(title), "description " + b64(el("description").value)].join(","),
+      "Tus-Resumable": "1.0.0",
+    }});
+    if (response.status !== 201) throw new Error((await response.text()) || response.status);
+    url = response.headers.get("Location");
+    localStorage.setItem(key, url);
+    status = await json(await fetch(url));
+  }
+  let result = status.result;
+  const queue = status.missing.slice();
+  let sent = file.size - queue.reduce((total, index) => total + Math.min(status.chunk_size, file.size - index * status.chunk_size), 0);
+  const progress = () => {
+    el("bar").style.width = (100 * sent / file.size).toFixed(1) + "%";
+    say("מעלה... " + (sent / 1048576).toFixed(0) + " / " + (file.size / 1048576).toFixed(0) + " MB");
+  };
+  progress();
+  async function worker() {
+    while (queue.length) {
+      const index = queue.shift(), start = index * status.chunk_size, end = Math.min(file.size, start + status.chunk_size);
+      result = (await sendChunk(url, file, start, end)) || result;
+      sent += end - start;
+      progress();
+    }
+  }
+  await Promise.all(Array.from({length: PARALLEL}, worker));
+  if (!result) {
+    say("מסיים...");
+    status = await json(await fetch(url));
+    if (!status.complete) status = await json(await fetch(url + "/finish", {method: "POST"}));
+    result = status.result;
+  }
+  localStorage.removeItem(key);
+  el("bar").style.width = "100%";
+  say("✓ הפרויקט נוצר! הסרטון יימחק אוטומטית בעוד 72 שעות");
+  el("client").textContent = BASE_URL + "/?view=" + result.client_token;
+  el("editor").textContent = BASE_URL + "/?edit=" + result.editor_token;
+  el("links").style.display = "block";
+}
+
+el("start").addEventListener("click", () => upload().catch((error) => {
+  say("ההעלאה נכשלה: " + error.message + " - אפשר לבחור את אותו קובץ שוב כדי להמשיך");
+  el("start").disabled = false;
+}));
+</script>''')
+
+
+def uploader_html(create_url, base_url, parallel, max_bytes):
+    return UPLOADER.substitute(
+        COLORS,
+        create_url=json.dumps(create_url),
+        base_url=json.dumps(base_url),
+        parallel=int(parallel),
+        max_bytes=int(max_bytes),
+    )
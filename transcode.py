@@ -0,0 +1,155 @@
+import logging
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# סולם איכויות - מהנמוכה לגבוהה, כדי שהראשונה תהיה מוכנה הכי מהר
+LADDER = [
+    {"name": "360p", "height": 360, "video_kbps": 600, "audio_kbps": 64},
+    {"name": "540p", "height": 540, "video_kbps": 1200, "audio_kbps": 96},
+    {"name": "720p", "height": 720, "video_kbps": 2500, "audio_kbps": 128},
+]
+
+# פריים מפתח כל שתי שניות לפי זמן ולא לפי מספר פריימים, כדי שקפיצה לחותמת זמן תהיה מדויקת בכל קצב
+KEYFRAME_SECONDS = 2
+
+
+def ffmpeg_available():
+    return shutil.which("ffmpeg") is not None
+
+
+# ======================
+# Encoding
+# ======================
+def run_with_progress(command, duration=None, on_progress=None):
+    """Run ffmpeg with `-progress pipe:1`, reporting the fraction encoded.
+
+    Raises CalledProcessError like `subprocess.run(check=True)`.
+    """
+    if not (duration and on_progress):
+        subprocess.run(command, check=True, capture_output=True)
+        return
+    command = command[:1] + ["-progress", "pipe:1", "-nostats"] + command[1:]
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+        for line in proc.stdout:
+            key, _, value = line.strip().partition("=")
+            # out_time_us (ו-out_time_ms, שלמרות שמו גם הוא במיקרו-שניות)
+            if key == "out_time_us" and value.isdigit():
+                on_progress(min(int(value) / 1e6 / duration, 1.0))
+        stderr = proc.stderr.read()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command, stderr=stderr.encode())
+
+
+def transcode_rendition(src, out_dir, rung, duration=None, on_progress=None):
+    """Encode one rung of the ladder into a faststart MP4.
+
+    With the source `duration`, `on_progress(fraction)` follows the
+    encode. Returns the rung name.
+    """
+    out_dir = Path(out_dir) / rung["name"]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    mp4_tmp = out_dir / "proxy.part.mp4"
+    run_with_progress([
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", str(src),
+        "-vf", f"scale=-2:'min({rung['height']},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main", "-pix_fmt", "yuv420p",
+        "-b:v", f"{rung['video_kbps']}k", "-maxrate", f"{int(rung['video_kbps'] * 1.5)}k",
+        "-bufsize", f"{rung['video_kbps'] * 2}k",
+        "-force_key_frames", f"expr:gte(t,n_forced*{KEYFRAME_SECONDS})",
+        "-c:a", "aac", "-b:a", f"{rung['audio_kbps']}k", "-ac", "2",
+        "-movflags", "+faststart",
+        str(mp4_tmp),
+    ], duration, on_progress)
+    os.replace(mp4_tmp, out_dir / "proxy.mp4")
+    return rung["name"]
+
+
+# ======================
+# Transcoder
+# ======================
+class Transcoder:
+    """Builds proxy renditions for uploaded videos.
+
+    Renditions are keyed by the blob's SHA-256, so deduplicated uploads
+    share them. Their state lives in the `renditions` table
+    (pending -> processing -> ready | failed). `plan` records the missing
+    rungs inside the upload transaction; the caller queues one job per
+    rung, and the job runs `transcode` (see jobs.JobQueue).
+    """
+
+    def __init__(self, pool, upload_dir, ladder=LADDER):
+        self.pool = pool
+        self.root = Path(upload_dir) / "renditions"
+        self.ladder = ladder
+        self.enabled = ffmpeg_available()
+
+    def output_dir(self, video_sha256):
+        return self.root / video_sha256
+
+    def plan(self, conn, video_sha256, source_height=None):
+        """Record every rung that has no rendition yet and return those rungs.
+
+        Rungs taller than `source_height` are skipped: they would only
+        upscale the original.
+        """
+        if not self.enabled:
+            return []
+        queued = []
+        for rung in self.ladder:
+            if source_height and rung["height"] > source_height:
+                continue
+            cur = conn.execute(
+                'INSERT OR IGNORE INTO renditions (video_sha256, name, height, bitrate_kbps) VALUES (?, ?, ?, ?)',
+                (video_sha256, rung["name"], rung["height"], rung["video_kbps"] + rung["audio_kbps"])
+            )
+            if cur.rowcount:
+                queued.append(rung)
+        return queued
+
+    def transcode(self, video_sha256, src, name, duration=None, on_progress=None):
+        """Encode one planned rung; returns False when the video was deleted meanwhile."""
+        rung = next(r for r in self.ladder if r["name"] == name)
+        if not self._set_status(video_sha256, name, "processing"):
+            return False
+        transcode_rendition(src, self.output_dir(video_sha256), rung, duration, on_progress)
+        if not self._set_status(video_sha256, name, "ready"):
+            # הסרטון נמחק בזמן הקידוד
+            shutil.rmtree(self.output_dir(video_sha256), ignore_errors=True)
+            return False
+        return True
+
+    def failed(self, video_sha256, name, error):
+        logger.error("transcode %s/%s failed: %s", video_sha256[:12], name, error)
+        self._set_status(video_sha256, name, "failed", str(error)[:500])
+
+    def _set_status(self, video_sha256, name, status, error=None):
+        with self.pool.connection(immediate=True) as conn:
+            cur = conn.execute(
+                'UPDATE renditions SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP WHERE video_sha256 = ? AND name = ?',
+                (status, error, video_sha256, name)
+            )
+            return cur.rowcount > 0
+
+    def ready(self, video_sha256):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM renditions WHERE video_sha256 = ? AND status = 'ready' ORDER BY height ASC",
+                (video_sha256,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def proxy_filename(self, video_sha256, name):
+        return f"renditions/{video_sha256}/{name}/proxy.mp4"
+
+    def discard(self, conn, video_sha256):
+        """Forget a video's renditions; call inside the blob release transaction."""
+        conn.execute('DELETE FROM renditions WHERE video_sha256 = ?', (video_sha256,))
+
+    def remove_files(self, video_sha256):
+        """Delete a discarded video's output; call after the release commits."""
+        shutil.rmtree(self.output_dir(video_sha256), ignore_errors=True)